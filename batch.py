@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import time
+from typing import Any, AsyncIterator, Dict
+
+from wait_conditions import parse_wait_spec
+
+logger = logging.getLogger(__name__)
+
+BATCH_FIELDS = ('title', 'url', 'text', 'html', 'screenshot')
+DEFAULT_BATCH_FIELDS = ['title', 'url']
+DEFAULT_URL_TIMEOUT = 30.0
+MAX_BATCH_URLS = 1000
+MAX_RETRIES = 5
+MAX_SELECTORS = 20
+# Texts returned per selector
+MAX_SELECTED = 50
+
+# Collects title, final URL, the text of each selector's matches and optionally the page
+# text in one call. Arguments: selectors, include page text.
+EXTRACT_SCRIPT = """
+var selectors = arguments[0];
+var result = {title: document.title, url: location.href, selected: {}};
+for (var i = 0; i < selectors.length; i++) {
+    var texts = [];
+    try {
+        var nodes = document.querySelectorAll(selectors[i]);
+        for (var j = 0; j < nodes.length && j < %d; j++) {
+            texts.push((nodes[j].innerText || nodes[j].textContent || '').trim());
+        }
+    } catch (e) {
+        texts = null;
+    }
+    result.selected[selectors[i]] = texts;
+}
+if (arguments[1]) {
+    result.text = document.body ? document.body.innerText : '';
+}
+return result;
+""" % MAX_SELECTED
+
+
+def parse_batch_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Validate a batch job request.
+
+    Args:
+        job: Dictionary with urls and optional extract, selectors, concurrency, timeout, retries and wait
+
+    Returns:
+        Normalized job dictionary
+
+    Raises:
+        ValueError: For missing URLs, unknown fields or out-of-range settings
+    """
+    urls = job.get('urls')
+    if not isinstance(urls, list) or not urls or not all(isinstance(url, str) and url for url in urls):
+        raise ValueError("urls must be a non-empty list of URLs")
+    if len(urls) > MAX_BATCH_URLS:
+        raise ValueError(f"At most {MAX_BATCH_URLS} URLs per batch")
+
+    fields = job.get('extract') or list(DEFAULT_BATCH_FIELDS)
+    unknown = [field for field in fields if field not in BATCH_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown extract fields: {', '.join(unknown)}. Supported: {', '.join(BATCH_FIELDS)}")
+
+    selectors = job.get('selectors') or []
+    if not isinstance(selectors, list) or len(selectors) > MAX_SELECTORS:
+        raise ValueError(f"selectors must be a list of at most {MAX_SELECTORS} CSS selectors")
+
+    timeout = float(job.get('timeout', DEFAULT_URL_TIMEOUT))
+    retries = int(job.get('retries', 1))
+    if timeout <= 0 or not 0 <= retries <= MAX_RETRIES:
+        raise ValueError(f"timeout must be positive and retries between 0 and {MAX_RETRIES}")
+
+    # Defaults to one worker per ready batch browser
+    concurrency = job.get('concurrency')
+    if concurrency is not None:
+        concurrency = int(concurrency)
+        if concurrency < 1:
+            raise ValueError("concurrency must be a positive integer")
+
+    return {
+        'urls': urls,
+        'fields': list(fields),
+        'selectors': selectors,
+        'concurrency': concurrency,
+        'timeout': timeout,
+        'retries': retries,
+        'wait': parse_wait_spec(job.get('wait'))
+    }
+
+
+class BatchRunner:
+    """
+    Runs batch navigation and extraction jobs on the pool's batch browsers.
+
+    Each URL is handled by one browser checked out from the pool for the whole attempt
+    sequence, so a job with N browsers processes N URLs at a time. Results are yielded
+    as soon as each URL completes, not in input order; every result carries the URL's
+    index in the request. A URL that fails or times out is retried (on the next free
+    browser) up to the job's retry count.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    async def run(self, job: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Process a job from parse_batch_job(), yielding one result per URL and a final summary.
+        """
+        started = time.monotonic()
+        capacity = max(1, self.pool.batch_capacity())
+        concurrency = min(job['concurrency'] or capacity, capacity, len(job['urls']))
+        pending: asyncio.Queue = asyncio.Queue()
+        for index, url in enumerate(job['urls']):
+            pending.put_nowait((index, url))
+        results: asyncio.Queue = asyncio.Queue()
+
+        async def worker():
+            while True:
+                try:
+                    index, url = pending.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                # The whole checkout / attempts / checkin sequence runs in one thread, so a
+                # cancelled job never returns a browser to the pool while it is still in use
+                result = await asyncio.to_thread(self._process, index, url, job)
+                await results.put(result)
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        succeeded = 0
+        try:
+            for _ in range(len(job['urls'])):
+                result = await results.get()
+                if result['status'] == 'success':
+                    succeeded += 1
+                yield result
+        finally:
+            for task in workers:
+                task.cancel()
+
+        elapsed = time.monotonic() - started
+        yield {
+            'done': True,
+            'total': len(job['urls']),
+            'succeeded': succeeded,
+            'failed': len(job['urls']) - succeeded,
+            'concurrency': concurrency,
+            'elapsed': round(elapsed, 3),
+            'urls_per_second': round(len(job['urls']) / elapsed, 2) if elapsed else None
+        }
+
+    def _process(self, index: int, url: str, job: Dict[str, Any]) -> Dict[str, Any]:
+        started = time.monotonic()
+        result: Dict[str, Any] = {'status': 'error', 'message': 'No browser available'}
+        attempts = 0
+        while attempts <= job['retries']:
+            attempts += 1
+            browser = self.pool.checkout(timeout=job['timeout'])
+            if browser is None:
+                continue
+            try:
+                result = browser.extract_page(url, job['fields'], job['selectors'], job['timeout'], job['wait'])
+                result['browser'] = self.pool.browsers.index(browser)
+            except Exception as e:
+                logger.error(f"Batch error for {url}: {str(e)}")
+                result = {'status': 'error', 'message': str(e)}
+            finally:
+                self.pool.checkin(browser)
+            if result['status'] == 'success':
+                break
+            if attempts <= job['retries']:
+                time.sleep(min(0.5 * attempts, 2.0))
+        return {'index': index, 'request_url': url, 'attempts': attempts,
+                'elapsed': round(time.monotonic() - started, 3), **result}
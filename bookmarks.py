@@ -0,0 +1,183 @@
+import bisect
+import re
+from typing import Dict, List, Optional, Any, Iterable, Set
+from urllib.parse import urlsplit, urlunsplit
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical form used as the bookmark key.
+
+    Lowercases scheme and host, drops default ports, the fragment and a bare trailing
+    slash, so 'HTTPS://Example.com:443/' and 'https://example.com' are the same bookmark.
+    """
+    if not url:
+        return url
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url.strip()
+    if not parts.scheme or not parts.netloc:
+        return url.strip()
+
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    netloc = host if port is None or _DEFAULT_PORTS.get(scheme) == port else f"{host}:{port}"
+    if parts.username:
+        netloc = f"{parts.username}@{netloc}"
+    path = parts.path if parts.path not in ('', '/') else ''
+    return urlunsplit((scheme, netloc, path, parts.query, ''))
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lowercase alphanumeric tokens of a title or URL."""
+    return _TOKEN_RE.findall(text.lower()) if text else []
+
+
+class BookmarkIndex:
+    """
+    In-memory bookmark collection indexed for constant-time lookups and search.
+
+    Bookmarks are keyed by normalized URL, with a secondary index per folder and an
+    inverted token index over titles and URLs. The sorted token list supports prefix
+    matching with a binary search, so searches do not scan every bookmark.
+    """
+
+    def __init__(self, bookmarks: Iterable[Dict[str, Any]] = ()):
+        self._by_url: Dict[str, Dict[str, Any]] = {}
+        self._by_folder: Dict[Optional[str], Dict[str, None]] = {}
+        self._postings: Dict[str, Set[str]] = {}
+        self._sorted_tokens: List[str] = []
+        for bookmark in bookmarks:
+            self.add(bookmark)
+
+    def __len__(self) -> int:
+        return len(self._by_url)
+
+    def __iter__(self):
+        return iter(self._by_url.values())
+
+    def contains(self, url: str) -> bool:
+        return normalize_url(url) in self._by_url
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        return self._by_url.get(normalize_url(url))
+
+    def all(self) -> List[Dict[str, Any]]:
+        return list(self._by_url.values())
+
+    def in_folder(self, folder: Optional[str]) -> List[Dict[str, Any]]:
+        return [self._by_url[key] for key in self._by_folder.get(folder, ())]
+
+    def folders(self) -> List[str]:
+        return [folder for folder in self._by_folder if folder is not None]
+
+    def add(self, bookmark: Dict[str, Any]) -> bool:
+        """
+        Add a bookmark.
+
+        Returns:
+            False if a bookmark for the same normalized URL already exists
+        """
+        key = normalize_url(bookmark['url'])
+        if key in self._by_url:
+            return False
+        self._by_url[key] = bookmark
+        self._by_folder.setdefault(bookmark.get('folder'), {})[key] = None
+        for token in self._bookmark_tokens(bookmark):
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = set()
+                bisect.insort(self._sorted_tokens, token)
+            postings.add(key)
+        return True
+
+    def remove(self, url: str) -> Optional[Dict[str, Any]]:
+        """
+        Remove the bookmark for a URL.
+
+        Returns:
+            The removed bookmark, or None if it was not bookmarked
+        """
+        key = normalize_url(url)
+        bookmark = self._by_url.pop(key, None)
+        if bookmark is None:
+            return None
+
+        folder = bookmark.get('folder')
+        members = self._by_folder.get(folder)
+        if members is not None:
+            members.pop(key, None)
+            if not members:
+                del self._by_folder[folder]
+
+        for token in self._bookmark_tokens(bookmark):
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.discard(key)
+            if not postings:
+                del self._postings[token]
+                position = bisect.bisect_left(self._sorted_tokens, token)
+                if position < len(self._sorted_tokens) and self._sorted_tokens[position] == token:
+                    del self._sorted_tokens[position]
+        return bookmark
+
+    def search(self, query: str, folder: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Search bookmarks by title and URL.
+
+        Every query token must match a token of the bookmark exactly or as a prefix.
+        Results with exact token matches and title matches rank first, then newer ones.
+
+        Args:
+            query: Free text query
+            folder: Optional folder to restrict the search to
+            limit: Maximum number of results
+
+        Returns:
+            List of matching bookmarks
+        """
+        query_tokens = tokenize(query)
+        if not query_tokens:
+            bookmarks = self.in_folder(folder) if folder else self.all()
+            return sorted(bookmarks, key=lambda b: b.get('created') or 0, reverse=True)[:limit]
+
+        candidates = None
+        for token in query_tokens:
+            matches = self._prefix_matches(token)
+            candidates = matches if candidates is None else candidates & matches
+            if not candidates:
+                return []
+
+        if folder:
+            candidates = {key for key in candidates if key in self._by_folder.get(folder, ())}
+
+        def rank(key):
+            bookmark = self._by_url[key]
+            title_tokens = set(tokenize(bookmark.get('title')))
+            exact = sum(1 for token in query_tokens if key in self._postings.get(token, ()))
+            in_title = sum(1 for token in query_tokens if any(t.startswith(token) for t in title_tokens))
+            return (exact, in_title, bookmark.get('created') or 0)
+
+        ranked = sorted(candidates, key=rank, reverse=True)
+        return [self._by_url[key] for key in ranked[:limit]]
+
+    def _prefix_matches(self, prefix: str) -> Set[str]:
+        matches = set()
+        position = bisect.bisect_left(self._sorted_tokens, prefix)
+        while position < len(self._sorted_tokens) and self._sorted_tokens[position].startswith(prefix):
+            matches |= self._postings[self._sorted_tokens[position]]
+            position += 1
+        return matches
+
+    @staticmethod
+    def _bookmark_tokens(bookmark: Dict[str, Any]) -> Set[str]:
+        return set(tokenize(bookmark.get('title'))) | set(tokenize(bookmark.get('url')))
@@ -1,12 +1,18 @@
+import time
+
+# Measured so the startup breakdown can report how long the heavy imports took
+_IMPORT_STARTED = time.perf_counter()
+
 import base64
 import io
-import time
 import threading
 import logging
 import os
-import json
 import tempfile
+from collections import deque
+from itertools import islice
 from typing import Dict, Optional, Any, List, Tuple
+from urllib.parse import urlsplit
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
@@ -19,33 +25,109 @@ from selenium.webdriver.support import expected_conditions as EC
 
 # Import the BrowserPageElement class
 from browser_element import BrowserPageElement
+from driver_cache import DriverResolver
+from cdp_events import CDPEventLog, enable_performance_logging
+from lite_mode import LiteMode
+from bookmarks import BookmarkIndex
+from dom_diff import DOM_DIFF_SCRIPT
+from dom_snapshot import compact_snapshot, SNAPSHOT_FILTERS, SNAPSHOT_STYLES
+from capture import (
+    page_size, tile_offsets, capture_tile, decode_tile, StreamingPNGWriter,
+    print_to_pdf_stream, read_stream, DEFAULT_TILE_HEIGHT
+)
+from form_fill import (
+    FORM_DISCOVERY_SCRIPT, FORM_FILL_SCRIPT, FORM_SIGNATURE_SCRIPT, AUTOCOMPLETE_TYPES, INPUT_TYPES, MIN_FIELD_SCORE, field_keywords
+)
+from batch import EXTRACT_SCRIPT
+from wait_conditions import PageWaiter, NetworkActivity, parse_wait_spec
+from cookie_jar import CookieIndex, to_cookie_param
+from engine import create_engine
+
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_STARTED
 
 logger = logging.getLogger(__name__)
 
+# Runs a list of wrapped scripts with their own arguments, isolating exceptions per item
+BATCH_SCRIPT_TEMPLATE = """
+var args = arguments[0];
+var stopOnError = arguments[1];
+var functions = [
+/*FUNCTIONS*/
+];
+var results = [];
+for (var i = 0; i < functions.length; i++) {
+    try {
+        results.push({status: 'success', result: functions[i].apply(null, args[i])});
+    } catch (e) {
+        results.push({status: 'error', message: String(e && e.message || e)});
+        if (stopOnError) {
+            break;
+        }
+    }
+}
+return results;
+"""
+
+# Finds the items of a batch that do not compile; null for items that do (or when eval is blocked by CSP)
+SYNTAX_CHECK_SCRIPT = """
+return arguments[0].map(function(source) {
+    try {
+        new Function(source);
+        return null;
+    } catch (e) {
+        return e instanceof SyntaxError ? String(e.message) : null;
+    }
+});
+"""
+
 class HeadlessBrowser:
-    def __init__(self, user_data_dir=None):
+    def __init__(self, user_data_dir=None, offline=False, driver_cache_dir=None, auto_start=True,
+                 store=None, namespace="default", history_limit=1000, proxy_server=None,
+                 engine="selenium", screenshot_format="png", screenshot_quality=70):
         self.driver = None
         self.is_running = False
+        self.is_starting = False
         self.current_url = "about:blank"
         self.lock = threading.Lock()
         self.last_screenshot_time = 0
         self.last_screenshot = None  # Cache the last screenshot
-        self.history = []  # Navigation history
+        self.last_screenshot_format = "png"  # Image format of last_screenshot (placeholders are PNG)
+        self.engine_name = engine  # 'selenium' or 'playwright', the engine that captures live frames
+        self.engine = None  # BrowserEngine on this browser's Chrome
+        self.screenshot_format = screenshot_format  # 'png' or 'jpeg' for live frames
+        self.screenshot_quality = screenshot_quality  # JPEG quality for live frames
+        self.history = deque(maxlen=history_limit)  # Back/forward navigation stack, bounded
         self.history_position = -1  # Current position in history
-        self.bookmarks = []  # List of bookmarks
-        self.cookies = {}  # Dictionary to store cookies
+        self.history_limit = history_limit  # Also caps the persistent visit log
+        self._visits_since_prune = 0
+        self.bookmarks = BookmarkIndex()  # Bookmarks indexed by normalized URL, folder and token
+        self.cookies = CookieIndex()  # Browser cookies indexed by domain and path
+        self._cookies_dirty = True  # Set when Network events show cookies may have changed
+        self._cookies_synced_at = 0
         self.form_data = {}  # Dictionary to store common form data
+        self.autofill_mappings = {}  # (domain, form signature) -> learned {'fields': {selector: type}, 'types': [...]}
         self.page = None  # BrowserPageElement instance
         self.user_data_dir = user_data_dir
+        self.proxy_server = proxy_server  # host:port of the shared HTTP cache proxy, if any
+        self.store = store  # PersistentStore for bookmarks and form data; None keeps them in memory only
+        self.namespace = namespace  # Key separating this session's data from other sessions in the store
+        self.driver_resolver = DriverResolver(cache_dir=driver_cache_dir, offline=offline)
+        self.startup_timings = {}  # Seconds spent in each startup phase
+        self.events = None  # CDPEventLog reading Network events from the performance log
+        self.lite_mode = LiteMode()
+        self.network = NetworkActivity()  # In-flight requests, for network idle waits
+        self.waiter = None  # PageWaiter for the wait conditions actions can ask for
         
         # Load stored data
         self.load_persistent_data()
         
-        # Initialize browser
-        self.setup_driver()
+        # Initialize browser (callers that start it in the background pass auto_start=False)
+        if auto_start:
+            self.setup_driver()
 
     def setup_driver(self):
         """Initialize the Selenium WebDriver with Chrome in headless mode."""
+        self.is_starting = True
         try:
             chrome_options = Options()
             chrome_options.add_argument("--headless=new")
@@ -63,28 +145,79 @@ class HeadlessBrowser:
             if self.user_data_dir:
                 chrome_options.add_argument(f"--user-data-dir={self.user_data_dir}")
             
-            # Use webdriver manager to handle driver version compatibility
-            from selenium.webdriver.chrome.service import Service
+            # Route traffic through the local proxy (shared cache, blocklists), including loopback origins
+            if self.proxy_server:
+                chrome_options.add_argument(f"--proxy-server=http://{self.proxy_server}")
+                chrome_options.add_argument("--proxy-bypass-list=<-loopback>")
+            
+            # Record CDP Network events so they can be read back through the performance log
+            enable_performance_logging(chrome_options)
+            
+            timings = {'import': IMPORT_SECONDS}
+            
+            # Resolve driver and browser binaries (cached on disk after the first launch)
+            started = time.perf_counter()
+            resolution = self.driver_resolver.resolve()
+            timings['driver_resolution'] = time.perf_counter() - started
             
+            started = time.perf_counter()
             try:
-                from webdriver_manager.chrome import ChromeDriverManager
-                service = Service(ChromeDriverManager().install())
-            except Exception as e:
-                logger.warning(f"Could not use webdriver_manager: {str(e)}")
-                service = Service()  # Use default service if webdriver_manager fails
+                self.driver = self._launch_chrome(chrome_options, resolution)
+            except WebDriverException:
+                if resolution.get('source') != 'cache':
+                    raise
+                # The cached driver may no longer match the installed Chrome; resolve again once
+                logger.warning("Launch with cached driver failed, re-resolving driver")
+                self.driver_resolver.invalidate()
+                resolution = self.driver_resolver.resolve()
+                self.driver = self._launch_chrome(chrome_options, resolution)
+            timings['chrome_launch'] = time.perf_counter() - started
             
-            self.driver = webdriver.Chrome(service=service, options=chrome_options)
             self.driver.set_page_load_timeout(30)  # Set page load timeout
-            self.is_running = True
+            
+            # First paint: load the blank page and capture the first frame, which also seeds the screenshot cache
+            started = time.perf_counter()
             self.driver.get("about:blank")
+            self.last_screenshot = base64.b64encode(self.driver.get_screenshot_as_png()).decode('utf-8')
+            self.last_screenshot_time = time.time()
+            timings['first_paint'] = time.perf_counter() - started
             
             # Initialize the page element handler
             self.page = BrowserPageElement(self.driver)
             
+            # Network event accounting (lite mode settings may have been chosen before startup)
+            self.events = CDPEventLog(self.driver)
+            self.lite_mode.attach(self.events)
+            self.events.subscribe('Network.responseReceivedExtraInfo', self._on_response_headers)
+            self.events.subscribe('Network.responseReceived', self._on_response_headers)
+            self.events.subscribe('Network.requestWillBeSent', self._on_request_sent)
+            self.network.attach(self.events)
+            self.waiter = PageWaiter(self.driver, self.events, self.network)
+            
+            # Live frames are captured through the configured engine; Playwright attaches to this Chrome over CDP
+            started = time.perf_counter()
+            try:
+                self.engine = create_engine(self.engine_name, self.driver, self.waiter)
+            except Exception as e:
+                logger.warning(f"Could not start the {self.engine_name} engine, capturing with selenium: {str(e)}")
+                self.engine = create_engine("selenium", self.driver, self.waiter)
+            timings['engine'] = time.perf_counter() - started
+            
+            self.startup_timings = timings
+            logger.info(
+                "Startup timings: " + ", ".join(f"{phase}={seconds:.3f}s" for phase, seconds in timings.items()) +
+                f" (driver source: {resolution.get('source')})"
+            )
+            
+            if self.lite_mode.enabled:
+                self._apply_blocked_urls()
+            
             # Add about:blank to history
             self.history.append("about:blank")
             self.history_position = 0
             
+            # Only mark the browser usable once everything above is in place
+            self.is_running = True
             logger.info("Headless browser initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize headless browser: {str(e)}")
@@ -92,41 +225,53 @@ class HeadlessBrowser:
             # Fallback to a simple placeholder if browser cannot be initialized
             self.is_running = False
             logger.info("Using fallback mode (screenshot-only)")
+        finally:
+            self.is_starting = False
+
+    def _launch_chrome(self, chrome_options, resolution):
+        """Start Chrome with the resolved driver and browser binaries."""
+        if resolution.get('browser_binary'):
+            chrome_options.binary_location = resolution['browser_binary']
+        
+        self.driver_resolver.require_driver(resolution)
+        if resolution.get('driver_path'):
+            service = Service(resolution['driver_path'])
+        else:
+            service = Service()  # Fall back to Selenium's own driver discovery
+        
+        return webdriver.Chrome(service=service, options=chrome_options)
 
     def load_persistent_data(self):
-        """Load bookmarks, cookies, and form data from disk."""
+        """Load bookmarks and form data from the persistent store."""
+        if not self.store:
+            return
         try:
-            # Load bookmarks
-            if os.path.exists("bookmarks.json"):
-                with open("bookmarks.json", "r") as f:
-                    self.bookmarks = json.load(f)
+            # Pick up bookmarks.json / form_data.json left by older versions in the working directory
+            self.store.import_legacy_json(self.namespace, os.getcwd())
             
-            # Load form data
-            if os.path.exists("form_data.json"):
-                with open("form_data.json", "r") as f:
-                    self.form_data = json.load(f)
+            self.bookmarks = BookmarkIndex(self.store.load_bookmarks(self.namespace))
+            self.form_data = self.store.load_form_data(self.namespace)
+            self.autofill_mappings = self.store.load_autofill_mappings(self.namespace)
                     
             logger.info("Loaded persistent data successfully")
         except Exception as e:
             logger.error(f"Error loading persistent data: {str(e)}")
 
     def save_persistent_data(self):
-        """Save bookmarks, cookies, and form data to disk."""
+        """Wait until all queued bookmark and form data changes are committed."""
+        if not self.store:
+            return
         try:
-            # Save bookmarks
-            with open("bookmarks.json", "w") as f:
-                json.dump(self.bookmarks, f)
-            
-            # Save form data (with optional encryption in the future)
-            with open("form_data.json", "w") as f:
-                json.dump(self.form_data, f)
-                
+            self.store.flush()
             logger.info("Saved persistent data successfully")
         except Exception as e:
             logger.error(f"Error saving persistent data: {str(e)}")
 
-    def navigate(self, url):
+    def navigate(self, url, wait=None):
         """Navigate to a specific URL."""
+        wait, error = self._parse_wait(wait)
+        if error:
+            return error
         with self.lock:
             try:
                 if not self.is_running:
@@ -140,7 +285,7 @@ class HeadlessBrowser:
                     # Update history
                     self._update_history('about:blank')
                     
-                    return {'status': 'success', 'url': self.current_url}
+                    return self._after_action({'status': 'success', 'url': self.current_url}, wait)
                 
                 # Add protocol if missing
                 if not url.startswith(('http://', 'https://')):
@@ -148,6 +293,7 @@ class HeadlessBrowser:
                 
                 # Attempt to navigate with timeout handling
                 try:
+                    self._begin_page(url)
                     self.driver.get(url)
                     
                     # Wait for page to load (with timeout protection)
@@ -157,12 +303,16 @@ class HeadlessBrowser:
                     self.current_url = self.driver.current_url
                     
                     # Update history
-                    self._update_history(self.current_url)
+                    self._update_history(self.current_url, self.driver.title)
                     
                     # Store cookies for this domain
                     self._store_cookies()
                     
-                    return {'status': 'success', 'url': self.current_url}
+                    result = {'status': 'success', 'url': self.current_url}
+                    if self.lite_mode.enabled:
+                        self.events.drain()
+                        result['lite'] = self.lite_mode.current_page
+                    return self._after_action(result, wait)
                 except TimeoutException:
                     logger.warning(f"Page load timeout for URL: {url}")
                     return {'status': 'error', 'message': 'Page load timed out'}
@@ -171,18 +321,128 @@ class HeadlessBrowser:
                 logger.error(f"Navigation error: {str(e)}")
                 return {'status': 'error', 'message': str(e)}
     
-    def _update_history(self, url):
+    def _begin_page(self, url):
+        """Attribute pending network events to the previous page and start accounting for a new one."""
+        if self.events:
+            self.events.drain()
+        if self.page:
+            self.page.invalidate()
+        self.lite_mode.begin_page(url)
+
+    def _apply_blocked_urls(self):
+        """Push the lite mode URL patterns to Chrome."""
+        self.driver.execute_cdp_cmd('Network.enable', {})
+        self.driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': self.lite_mode.blocked_patterns()})
+
+    def set_lite_mode(self, enabled=True, block_types=None, patterns=None):
+        """
+        Enable or disable lite rendering mode for this session.
+        
+        Args:
+            enabled: Whether to block heavy resources
+            block_types: Resource types to block (image, font, media, tracker); defaults to all
+            patterns: Additional URL patterns to block (Network.setBlockedURLs wildcard syntax)
+            
+        Returns:
+            Dictionary with status and the active lite mode settings
+        """
+        with self.lock:
+            try:
+                self.lite_mode.configure(enabled, block_types, patterns)
+                if self.is_running:
+                    self._apply_blocked_urls()
+                return {
+                    'status': 'success',
+                    'enabled': self.lite_mode.enabled,
+                    'block_types': self.lite_mode.block_types,
+                    'patterns': self.lite_mode.extra_patterns
+                }
+            except ValueError as e:
+                return {'status': 'error', 'message': str(e)}
+            except Exception as e:
+                logger.error(f"Set lite mode error: {str(e)}")
+                return {'status': 'error', 'message': str(e)}
+
+    def get_lite_mode_stats(self):
+        """
+        Get lite mode settings and per-page request, byte and blocking statistics.
+        
+        Returns:
+            Dictionary with status and statistics
+        """
+        with self.lock:
+            try:
+                if self.events:
+                    self.events.drain()
+                return {'status': 'success', **self.lite_mode.stats()}
+            except Exception as e:
+                logger.error(f"Get lite mode stats error: {str(e)}")
+                return {'status': 'error', 'message': str(e)}
+
+    def _update_history(self, url, title=None):
         """Update the browser history when navigating."""
-        # If we're not at the end of history, truncate it
-        if self.history_position < len(self.history) - 1:
-            self.history = self.history[:self.history_position + 1]
+        # If we're not at the end of history, drop the forward entries in place
+        while len(self.history) > self.history_position + 1:
+            self.history.pop()
         
-        # Add the new URL to history
+        # Add the new URL to history (the oldest entry falls off once the stack is full)
         self.history.append(url)
         self.history_position = len(self.history) - 1
+        
+        # Record the visit in the persistent log, pruning it back to the limit now and then
+        if self.store and url != 'about:blank':
+            self.store.record_visit(self.namespace, url, title)
+            self._visits_since_prune += 1
+            if self._visits_since_prune >= 100:
+                self.store.prune_history(self.namespace, self.history_limit)
+                self._visits_since_prune = 0
+
+    def wait_for(self, wait):
+        """
+        Wait for a page condition.
+
+        Args:
+            wait: Condition name or dict, e.g. 'network_idle' or
+                  {'condition': 'selector_visible', 'selector': '#results', 'timeout': 5}.
+                  Conditions: load, network_idle (max_inflight, idle_ms), dom_stable (quiet_ms),
+                  selector_present / selector_visible (selector), url_matches (pattern)
 
-    def go_back(self):
+        Returns:
+            Dictionary with condition, satisfied and elapsed seconds
+        """
+        wait, error = self._parse_wait(wait)
+        if error:
+            return error
+        if not wait:
+            return {'status': 'error', 'message': 'No wait condition given'}
+        with self.lock:
+            try:
+                if not self.is_running:
+                    return {'status': 'error', 'message': 'Browser not available'}
+                return {'status': 'success', **self.waiter.wait(wait)}
+            except Exception as e:
+                logger.error(f"Wait error: {str(e)}")
+                return {'status': 'error', 'message': str(e)}
+
+    @staticmethod
+    def _parse_wait(wait):
+        """Validate an action's wait parameter; returns (spec, error result)."""
+        try:
+            return parse_wait_spec(wait), None
+        except ValueError as e:
+            return None, {'status': 'error', 'message': str(e)}
+
+    def _after_action(self, result, wait):
+        """Apply the requested wait after a successful action; caller holds the lock."""
+        if wait:
+            result['wait'] = self.waiter.wait(wait)
+        return result
+
+    def go_back(self, wait=None):
         """Navigate back in browser history."""
+        wait, error = self._parse_wait(wait)
+        if error:
+            return error
         with self.lock:
             if not self.is_running:
                 return {'status': 'error', 'message': 'Browser not available'}
@@ -193,17 +453,21 @@ class HeadlessBrowser:
                 url = self.history[self.history_position]
                 
                 try:
+                    self.page.invalidate()
                     self.driver.get(url)
                     self.current_url = self.driver.current_url
-                    return {'status': 'success', 'url': self.current_url}
+                    return self._after_action({'status': 'success', 'url': self.current_url}, wait)
                 except Exception as e:
                     logger.error(f"Error going back to {url}: {str(e)}")
                     return {'status': 'error', 'message': str(e)}
             else:
                 return {'status': 'error', 'message': 'No previous page in history'}
 
-    def go_forward(self):
+    def go_forward(self, wait=None):
         """Navigate forward in browser history."""
+        wait, error = self._parse_wait(wait)
+        if error:
+            return error
         with self.lock:
             if not self.is_running:
                 return {'status': 'error', 'message': 'Browser not available'}
@@ -214,26 +478,31 @@ class HeadlessBrowser:
                 url = self.history[self.history_position]
                 
                 try:
+                    self.page.invalidate()
                     self.driver.get(url)
                     self.current_url = self.driver.current_url
-                    return {'status': 'success', 'url': self.current_url}
+                    return self._after_action({'status': 'success', 'url': self.current_url}, wait)
                 except Exception as e:
                     logger.error(f"Error going forward to {url}: {str(e)}")
                     return {'status': 'error', 'message': str(e)}
             else:
                 return {'status': 'error', 'message': 'No next page in history'}
 
-    def refresh(self):
+    def refresh(self, wait=None):
         """Refresh the current page."""
+        wait, error = self._parse_wait(wait)
+        if error:
+            return error
         with self.lock:
             if not self.is_running:
                 return {'status': 'error', 'message': 'Browser not available'}
             
             try:
+                self.page.invalidate()
                 self.driver.refresh()
                 # Wait for page to load
                 self.page.wait_for_page_load(timeout=30)
-                return {'status': 'success', 'url': self.current_url}
+                return self._after_action({'status': 'success', 'url': self.current_url}, wait)
             except TimeoutException:
                 logger.warning(f"Page refresh timeout for URL: {self.current_url}")
                 return {'status': 'error', 'message': 'Page refresh timed out'}
@@ -265,12 +534,19 @@ class HeadlessBrowser:
                     d = ImageDraw.Draw(img)
                     
                     # Draw some text on the image
-                    text_lines = [
-                        "Browser Demo Mode",
-                        "Unable to initialize Chrome browser",
-                        "This is a placeholder interface",
-                        f"URL: {self.current_url or 'about:blank'}"
-                    ]
+                    if self.is_starting:
+                        text_lines = [
+                            "Starting browser...",
+                            "Chrome is launching in the background",
+                            "This view updates automatically once it is ready"
+                        ]
+                    else:
+                        text_lines = [
+                            "Browser Demo Mode",
+                            "Unable to initialize Chrome browser",
+                            "This is a placeholder interface",
+                            f"URL: {self.current_url or 'about:blank'}"
+                        ]
                     
                     y_position = 300
                     for line in text_lines:
@@ -284,16 +560,18 @@ class HeadlessBrowser:
                     
                     # Cache this screenshot
                     self.last_screenshot = encoded
+                    self.last_screenshot_format = "png"
                     self.last_screenshot_time = current_time
                     
                     return encoded
                 
                 # Take a real screenshot
-                screenshot = self.driver.get_screenshot_as_png()
+                screenshot = self.engine.screenshot(self.screenshot_format, self.screenshot_quality)
                 encoded = base64.b64encode(screenshot).decode('utf-8')
                 
                 # Cache this screenshot
                 self.last_screenshot = encoded
+                self.last_screenshot_format = self.screenshot_format
                 self.last_screenshot_time = current_time
                 
                 return encoded
@@ -318,8 +596,128 @@ class HeadlessBrowser:
                 except Exception:
                     return None
 
-    def click(self, x, y):
+    def get_capture_size(self):
+        """
+        Get the full page size for a full-page capture.
+
+        Returns:
+            Dictionary with width and height in CSS pixels and truncated (page taller than the capture limit)
+        """
+        with self.lock:
+            try:
+                if not self.is_running:
+                    return {'status': 'error', 'message': 'Browser not available'}
+                return {'status': 'success', **page_size(self.driver)}
+            except Exception as e:
+                logger.error(f"Error measuring page: {str(e)}")
+                return {'status': 'error', 'message': str(e)}
+
+    def iter_full_page_tiles(self, size, image_format='png', quality=80, tile_height=DEFAULT_TILE_HEIGHT):
+        """
+        Capture the full page as horizontal tiles, taking the lock once per tile.
+
+        Args:
+            size: Result of get_capture_size()
+            image_format: png, jpeg or webp
+            quality: Compression quality for jpeg and webp
+            tile_height: Height of each tile in CSS pixels
+
+        Yields:
+            Dictionaries with index, y, width, height, format and base64 data, in page order.
+            If a capture fails, a final {'index', 'status': 'error', 'message'} item ends the sequence.
+        """
+        for index, (y, height) in enumerate(tile_offsets(size['height'], tile_height)):
+            try:
+                with self.lock:
+                    if not self.is_running:
+                        raise RuntimeError('Browser not available')
+                    data = capture_tile(self.driver, y, size['width'], height, image_format, quality)
+            except Exception as e:
+                logger.error(f"Full-page capture error at tile {index}: {str(e)}")
+                yield {'index': index, 'status': 'error', 'message': str(e)}
+                return
+            yield {'index': index, 'y': y, 'width': size['width'], 'height': height, 'format': image_format, 'data': data}
+
+    def iter_full_page_png(self, size, tile_height=DEFAULT_TILE_HEIGHT):
+        """
+        Capture the full page as one PNG, encoded while the tiles are captured.
+
+        Memory use is bounded by one tile: each tile is decoded, its rows are compressed
+        into the output and the compressed data is yielded before the next tile is taken.
+        If a capture fails the error is logged and the image is completed with blank rows,
+        so the client still receives a valid PNG.
+
+        Args:
+            size: Result of get_capture_size()
+            tile_height: Height of each tile in CSS pixels
+
+        Yields:
+            Consecutive pieces of the PNG file
+        """
+        writer = StreamingPNGWriter(size['width'], size['height'])
+        yield writer.header()
+        for y, height in tile_offsets(size['height'], tile_height):
+            try:
+                with self.lock:
+                    if not self.is_running:
+                        raise RuntimeError('Browser not available')
+                    data = capture_tile(self.driver, y, size['width'], height, 'png')
+                rgb, rows = decode_tile(base64.b64decode(data), size['width'])
+            except Exception as e:
+                logger.error(f"Full-page PNG capture error at y={y}: {str(e)}")
+                break
+            output = writer.add_rows(rgb, rows)
+            if output:
+                yield output
+        yield writer.finish()
+
+    def start_pdf_export(self, options=None):
+        """
+        Render the current page as PDF into a browser-side stream.
+
+        Args:
+            options: Extra Page.printToPDF parameters (e.g. landscape, scale)
+
+        Returns:
+            Dictionary with the stream handle to pass to iter_pdf()
+        """
+        with self.lock:
+            try:
+                if not self.is_running:
+                    return {'status': 'error', 'message': 'Browser not available'}
+                return {'status': 'success', 'handle': print_to_pdf_stream(self.driver, options)}
+            except Exception as e:
+                logger.error(f"PDF export error: {str(e)}")
+                return {'status': 'error', 'message': str(e)}
+
+    def iter_pdf(self, handle):
+        """
+        Yield the PDF from start_pdf_export() in chunks, taking the lock once per chunk.
+
+        A read error ends the output early (it is logged). The browser-side stream is closed
+        under the lock when the output ends, fails or is closed by a disconnecting client.
+        """
+        chunks = read_stream(self.driver, handle)
+        try:
+            while True:
+                with self.lock:
+                    if not self.is_running:
+                        raise RuntimeError('Browser not available')
+                    chunk = next(chunks, None)
+                if chunk is None:
+                    return
+                yield chunk
+        except Exception as e:
+            logger.error(f"PDF read error: {str(e)}")
+        finally:
+            with self.lock:
+                chunks.close()
+
+    def click(self, x, y, wait=None):
         """Simulate a mouse click at the given coordinates."""
+        wait, error = self._parse_wait(wait)
+        if error:
+            return error
         with self.lock:
             try:
                 if not self.is_running:
@@ -345,8 +743,10 @@ class HeadlessBrowser:
                 # Reset the mouse position after clicking
                 actions.move_by_offset(-x, -y).perform()
                 
-                # Wait a moment for any page changes
-                time.sleep(0.5)
+                # Wait for page changes: the requested condition, or a fixed moment by default
+                outcome = self.waiter.wait(wait) if wait else None
+                if outcome is None:
+                    time.sleep(0.5)
                 
                 # Check if the URL changed after clicking
                 new_url = self.driver.current_url
@@ -354,13 +754,22 @@ class HeadlessBrowser:
                     self.current_url = new_url
                     self._update_history(new_url)
                 
-                return {'status': 'success'}
+                # Pick up cookies set by the click (navigations, XHRs, redirects)
+                self._sync_cookies()
+                
+                result = {'status': 'success'}
+                if outcome:
+                    result['wait'] = outcome
+                return result
             except Exception as e:
                 logger.error(f"Click error: {str(e)}")
                 return {'status': 'error', 'message': str(e)}
 
-    def type_text(self, text):
+    def type_text(self, text, wait=None):
         """Type text at the current focus position."""
+        wait, error = self._parse_wait(wait)
+        if error:
+            return error
         with self.lock:
             try:
                 if not self.is_running:
@@ -368,13 +777,16 @@ class HeadlessBrowser:
                 
                 actions = ActionChains(self.driver)
                 actions.send_keys(text).perform()
-                return {'status': 'success'}
+                return self._after_action({'status': 'success'}, wait)
             except Exception as e:
                 logger.error(f"Type text error: {str(e)}")
                 return {'status': 'error', 'message': str(e)}
 
-    def press_key(self, key):
+    def press_key(self, key, wait=None):
         """Press a specific keyboard key."""
+        wait, error = self._parse_wait(wait)
+        if error:
+            return error
         with self.lock:
             try:
                 if not self.is_running:
@@ -402,49 +814,64 @@ class HeadlessBrowser:
                     actions = ActionChains(self.driver)
                     actions.send_keys(key_to_press).perform()
                     
+                    outcome = self.waiter.wait(wait) if wait else None
+                    
                     # Check if Enter was pressed and URL changed (form submission)
                     if key == 'Enter':
-                        time.sleep(0.5)  # Short delay to let page load if form was submitted
+                        if outcome is None:
+                            time.sleep(0.5)  # Short delay to let page load if form was submitted
                         new_url = self.driver.current_url
                         if new_url != self.current_url:
                             self.current_url = new_url
                             self._update_history(new_url)
                     
-                    return {'status': 'success'}
+                    result = {'status': 'success'}
+                    if outcome:
+                        result['wait'] = outcome
+                    return result
                 else:
                     return {'status': 'error', 'message': f'Unsupported key: {key}'}
             except Exception as e:
                 logger.error(f"Key press error: {str(e)}")
                 return {'status': 'error', 'message': str(e)}
 
-    def scroll(self, x, y):
+    def scroll(self, x, y, wait=None):
         """Scroll the page by the given amount."""
+        wait, error = self._parse_wait(wait)
+        if error:
+            return error
         with self.lock:
             try:
                 if not self.is_running:
                     return {'status': 'error', 'message': 'Browser not available'}
                 
                 self.driver.execute_script(f"window.scrollBy({x}, {y});")
-                return {'status': 'success'}
+                return self._after_action({'status': 'success'}, wait)
             except Exception as e:
                 logger.error(f"Scroll error: {str(e)}")
                 return {'status': 'error', 'message': str(e)}
 
-    def scroll_to_position(self, x, y):
+    def scroll_to_position(self, x, y, wait=None):
         """Scroll to an absolute position on the page."""
+        wait, error = self._parse_wait(wait)
+        if error:
+            return error
         with self.lock:
             try:
                 if not self.is_running:
                     return {'status': 'error', 'message': 'Browser not available'}
                 
                 self.driver.execute_script(f"window.scrollTo({x}, {y});")
-                return {'status': 'success'}
+                return self._after_action({'status': 'success'}, wait)
             except Exception as e:
                 logger.error(f"Scroll to position error: {str(e)}")
                 return {'status': 'error', 'message': str(e)}
 
-    def drag(self, start_x, start_y, end_x, end_y):
+    def drag(self, start_x, start_y, end_x, end_y, wait=None):
         """Simulate a drag operation from start to end coordinates."""
+        wait, error = self._parse_wait(wait)
+        if error:
+            return error
         with self.lock:
             try:
                 if not self.is_running:
@@ -458,11 +885,66 @@ class HeadlessBrowser:
                 actions.perform()
                 # Reset mouse position
                 actions.move_by_offset(-(end_x), -(end_y)).perform()
-                return {'status': 'success'}
+                return self._after_action({'status': 'success'}, wait)
             except Exception as e:
                 logger.error(f"Drag error: {str(e)}")
                 return {'status': 'error', 'message': str(e)}
 
+    def extract_page(self, url, fields=('title', 'url'), selectors=None, timeout=30, wait=None):
+        """
+        Load a URL and extract data from it in one call, for batch jobs.
+
+        Args:
+            url: URL to load
+            fields: Any of 'title', 'url', 'text', 'html', 'screenshot'
+            selectors: CSS selectors whose matches' text is returned under 'selected'
+            timeout: Seconds allowed for loading the page and the wait condition together
+            wait: Optional wait condition (see wait_for) applied after loading
+
+        Returns:
+            Dictionary with status and the requested fields; timed_out is set on timeout
+        """
+        wait, error = self._parse_wait(wait)
+        if error:
+            return error
+        with self.lock:
+            if not self.is_running:
+                return {'status': 'error', 'message': 'Browser not available'}
+            if '://' not in url and not url.startswith(('about:', 'data:')):
+                url = 'https://' + url
+            started = time.monotonic()
+            try:
+                self._begin_page(url)
+                self.driver.set_page_load_timeout(timeout)
+                try:
+                    self.driver.get(url)
+                finally:
+                    self.driver.set_page_load_timeout(30)
+
+                result = {'status': 'success'}
+                if wait:
+                    remaining = max(0.1, timeout - (time.monotonic() - started))
+                    result['wait'] = self.waiter.wait(dict(wait, timeout=min(wait['timeout'], remaining)))
+
+                data = self.driver.execute_script(EXTRACT_SCRIPT, selectors or [], 'text' in fields)
+                self.current_url = data['url']
+                for field in ('title', 'url', 'text'):
+                    if field in fields:
+                        result[field] = data.get(field)
+                if selectors:
+                    result['selected'] = data['selected']
+                if 'html' in fields:
+                    result['html'] = self.driver.page_source
+                if 'screenshot' in fields:
+                    result['screenshot'] = self.driver.get_screenshot_as_base64()
+                return result
+            except TimeoutException:
+                logger.warning(f"Batch page load timeout for URL: {url}")
+                return {'status': 'error', 'message': f'Page load timed out after {timeout}s', 'timed_out': True}
+            except WebDriverException as e:
+                logger.error(f"Batch extraction error for {url}: {str(e)}")
+                return {'status': 'error', 'message': str(e)}
+
     def get_page_info(self):
         """Get information about the current page."""
         with self.lock:
@@ -489,7 +971,7 @@ class HeadlessBrowser:
                     pass
                 
                 # Check if this page is bookmarked
-                is_bookmarked = any(bookmark['url'] == url for bookmark in self.bookmarks)
+                is_bookmarked = self.bookmarks.contains(url)
                 
                 return {
                     'status': 'success',
@@ -517,6 +999,33 @@ class HeadlessBrowser:
                 logger.error(f"Get page HTML error: {str(e)}")
                 return {'status': 'error', 'message': str(e)}
 
+    def get_dom_diffs(self, since=None, limit=500):
+        """
+        Get DOM mutations recorded since a cursor.
+
+        The first call on a page installs a MutationObserver and returns reset=True;
+        the caller should fetch the full HTML once and then poll with the returned cursor.
+
+        Args:
+            since: Cursor returned by the previous call
+            limit: Maximum number of mutations to return
+
+        Returns:
+            Dictionary with reset, cursor, diffs and more (True if further mutations are pending)
+        """
+        with self.lock:
+            try:
+                if not self.is_running:
+                    return {'status': 'error', 'message': 'Browser not available'}
+
+                result = self.driver.execute_script(DOM_DIFF_SCRIPT, since, max(1, limit))
+                result['status'] = 'success'
+                result['url'] = self.driver.current_url
+                return result
+            except Exception as e:
+                logger.error(f"Get DOM diffs error: {str(e)}")
+                return {'status': 'error', 'message': str(e)}
+
     def execute_script(self, script, *args):
         """Execute JavaScript in the page context."""
         with self.lock:
@@ -530,6 +1039,83 @@ class HeadlessBrowser:
                 logger.error(f"Script execution error: {str(e)}")
                 return {'status': 'error', 'message': str(e)}
 
+    def execute_scripts(self, scripts, stop_on_error=False):
+        """
+        Execute several scripts in a single driver round-trip.
+
+        Each script is wrapped in its own function inside one injected call, so it sees
+        its own arguments and an exception only fails that item. If the combined script
+        cannot be compiled, none of it ran: the items with syntax errors are reported and
+        the others are run as one batch. Any other failure of the call is returned as an
+        error, since some items may already have run.
+
+        Args:
+            scripts: List of {'script': str, 'args': list} items (plain strings are accepted too)
+            stop_on_error: Skip the remaining scripts after the first error
+
+        Returns:
+            Dictionary with a result per script, in order
+        """
+        items = [{'script': item, 'args': []} if isinstance(item, str) else item for item in scripts or []]
+        if not items:
+            return {'status': 'success', 'results': []}
+
+        with self.lock:
+            try:
+                if not self.is_running:
+                    return {'status': 'error', 'message': 'Browser not available'}
+
+                try:
+                    results = self._run_script_batch(items, stop_on_error)
+                except WebDriverException as e:
+                    if 'SyntaxError' not in str(e):
+                        raise
+                    logger.warning(f"Batched script did not compile, checking items: {str(e)}")
+                    results = self._run_compilable_scripts(items, stop_on_error)
+
+                # Items skipped after an error are reported explicitly
+                results.extend({'status': 'skipped'} for _ in range(len(items) - len(results)))
+                errors = sum(1 for result in results if result['status'] == 'error')
+                return {'status': 'success', 'results': results, 'errors': errors}
+            except Exception as e:
+                logger.error(f"Batched script execution error: {str(e)}")
+                return {'status': 'error', 'message': str(e)}
+
+    def _run_script_batch(self, items, stop_on_error):
+        """Run items as one injected call; caller holds the lock."""
+        functions = ",\n".join(f"function() {{\n{item.get('script') or ''}\n}}" for item in items)
+        batch = BATCH_SCRIPT_TEMPLATE.replace("/*FUNCTIONS*/", functions)
+        args = [list(item.get('args') or []) for item in items]
+        return self.driver.execute_script(batch, args, stop_on_error)
+
+    def _run_compilable_scripts(self, items, stop_on_error):
+        """Report the items that do not compile and run the rest once, in order; caller holds the lock."""
+        syntax_errors = self.driver.execute_script(SYNTAX_CHECK_SCRIPT, [item.get('script') or '' for item in items])
+        if not any(syntax_errors):
+            raise RuntimeError("Batched scripts failed to compile")
+        runnable = []
+        for index, error in enumerate(syntax_errors):
+            if error and stop_on_error:
+                break
+            if not error:
+                runnable.append(index)
+        ran = iter(self._run_script_batch([items[index] for index in runnable], stop_on_error) if runnable else [])
+
+        results = []
+        for index, error in enumerate(syntax_errors):
+            if error:
+                results.append({'status': 'error', 'message': f"SyntaxError: {error}"})
+                if stop_on_error:
+                    break
+                continue
+            result = next(ran, None)
+            if result is None:
+                break  # Stopped by an error in an earlier item
+            results.append(result)
+            if result['status'] == 'error' and stop_on_error:
+                break
+        return results
+
     def get_element_info(self, x, y):
         """Get information about the element at the specified coordinates."""
         with self.lock:
@@ -569,6 +1155,37 @@ class HeadlessBrowser:
                 logger.error(f"Get element info error: {str(e)}")
                 return {'status': 'error', 'message': str(e)}
 
+    def get_dom_snapshot(self, node_filter='all'):
+        """
+        Capture the page structure with DOMSnapshot.captureSnapshot in compact flat-array form.
+
+        Args:
+            node_filter: 'all', 'visible' or 'interactive'
+
+        Returns:
+            Dictionary with interned strings and per-document node and layout arrays
+        """
+        if node_filter not in SNAPSHOT_FILTERS:
+            return {'status': 'error', 'message': f"Unknown filter: {node_filter}"}
+
+        with self.lock:
+            try:
+                if not self.is_running:
+                    return {'status': 'error', 'message': 'Browser not available'}
+
+                snapshot = self.driver.execute_cdp_cmd('DOMSnapshot.captureSnapshot', {
+                    'computedStyles': SNAPSHOT_STYLES
+                })
+            except Exception as e:
+                logger.error(f"DOM snapshot error: {str(e)}")
+                return {'status': 'error', 'message': str(e)}
+
+        # Compaction only touches the returned data, so it runs outside the browser lock
+        result = compact_snapshot(snapshot, node_filter)
+        result['status'] = 'success'
+        result['filter'] = node_filter
+        return result
+
     # Advanced capabilities
 
     def add_bookmark(self, url=None, title=None, folder=None):
@@ -610,9 +1227,9 @@ class HeadlessBrowser:
                 }
                 
                 # Add to bookmarks if not already there
-                if not any(b['url'] == bookmark_url for b in self.bookmarks):
-                    self.bookmarks.append(bookmark)
-                    self.save_persistent_data()
+                if self.bookmarks.add(bookmark):
+                    if self.store:
+                        self.store.put_bookmark(self.namespace, bookmark)
                     return {'status': 'success', 'bookmark': bookmark}
                 else:
                     return {'status': 'info', 'message': 'Bookmark already exists'}
@@ -642,11 +1259,11 @@ class HeadlessBrowser:
                     return {'status': 'error', 'message': 'No URL specified'}
                 
                 # Find and remove the bookmark
-                initial_length = len(self.bookmarks)
-                self.bookmarks = [b for b in self.bookmarks if b['url'] != bookmark_url]
+                removed = self.bookmarks.remove(bookmark_url)
                 
-                if len(self.bookmarks) < initial_length:
-                    self.save_persistent_data()
+                if removed:
+                    if self.store:
+                        self.store.delete_bookmark(self.namespace, removed['url'])
                     return {'status': 'success', 'message': 'Bookmark removed'}
                 else:
                     return {'status': 'info', 'message': 'Bookmark not found'}
@@ -668,30 +1285,76 @@ class HeadlessBrowser:
         with self.lock:
             try:
                 if folder:
-                    filtered_bookmarks = [b for b in self.bookmarks if b.get('folder') == folder]
-                    return {'status': 'success', 'bookmarks': filtered_bookmarks}
+                    return {'status': 'success', 'bookmarks': self.bookmarks.in_folder(folder)}
                 else:
-                    return {'status': 'success', 'bookmarks': self.bookmarks}
+                    return {'status': 'success', 'bookmarks': self.bookmarks.all()}
                 
             except Exception as e:
                 logger.error(f"Get bookmarks error: {str(e)}")
                 return {'status': 'error', 'message': str(e)}
 
-    def _store_cookies(self):
-        """Store cookies for the current domain."""
+    def search_bookmarks(self, query, folder=None, limit=50):
+        """
+        Search bookmarks by title and URL with token and prefix matching.
+        
+        Args:
+            query: Search text
+            folder: Optional folder to restrict the search to
+            limit: Maximum number of results
+            
+        Returns:
+            Dictionary with status and matching bookmarks
+        """
+        with self.lock:
+            try:
+                results = self.bookmarks.search(query or '', folder, limit)
+                return {'status': 'success', 'query': query, 'bookmarks': results}
+                
+            except Exception as e:
+                logger.error(f"Search bookmarks error: {str(e)}")
+                return {'status': 'error', 'message': str(e)}
+
+    def _on_request_sent(self, params):
+        # A document request means a (frame) navigation the page started itself, e.g. a link click
+        if params.get('type') == 'Document' and self.page:
+            self.page.invalidate()
+
+    def _on_response_headers(self, params):
+        """Mark the cookie index stale when any response (document, XHR, redirect) sets a cookie."""
+        headers = params.get('headers') or (params.get('response') or {}).get('headers') or {}
+        if any(name.lower() == 'set-cookie' for name in headers):
+            self._cookies_dirty = True
+
+    def _sync_cookies(self, force=False, max_age=5.0):
+        """
+        Bring the cookie index up to date from the browser.
+        
+        Network events are drained first; the full cookie list is only fetched (one CDP call,
+        all domains) when an event showed a Set-Cookie header, when forced, or when the
+        last sync is older than max_age seconds (cookies written by scripts produce no event).
+        """
         if not self.is_running:
             return
         
         try:
-            current_domain = self._extract_domain(self.current_url)
-            if not current_domain:
+            if self.events:
+                self.events.drain()
+            
+            stale = time.time() - self._cookies_synced_at > max_age
+            if not (force or self._cookies_dirty or stale):
                 return
             
-            selenium_cookies = self.driver.get_cookies()
-            self.cookies[current_domain] = selenium_cookies
+            cookies = self.driver.execute_cdp_cmd('Network.getAllCookies', {}).get('cookies', [])
+            self.cookies.apply_snapshot(cookies)
+            self._cookies_dirty = False
+            self._cookies_synced_at = time.time()
             
         except Exception as e:
-            logger.error(f"Store cookies error: {str(e)}")
+            logger.error(f"Sync cookies error: {str(e)}")
+
+    def _store_cookies(self):
+        """Update the cookie index after a navigation."""
+        self._sync_cookies()
 
     def _extract_domain(self, url):
         """Extract domain from URL."""
@@ -712,18 +1375,18 @@ class HeadlessBrowser:
         Get cookies for a domain or all domains.
         
         Args:
-            domain: Optional domain to filter cookies
+            domain: Optional domain to filter cookies (includes its subdomains and parent-domain cookies)
             
         Returns:
             Dictionary with status and cookies
         """
         with self.lock:
             try:
+                self._sync_cookies()
                 if domain:
-                    domain_cookies = self.cookies.get(domain, [])
-                    return {'status': 'success', 'cookies': domain_cookies}
+                    return {'status': 'success', 'cookies': self.cookies.for_domain(domain)}
                 else:
-                    return {'status': 'success', 'cookies': self.cookies}
+                    return {'status': 'success', 'cookies': self.cookies.grouped()}
                 
             except Exception as e:
                 logger.error(f"Get cookies error: {str(e)}")
@@ -734,7 +1397,7 @@ class HeadlessBrowser:
         Clear cookies for a domain or all domains.
         
         Args:
-            domain: Optional domain to clear cookies for
+            domain: Optional domain to clear cookies for (its subdomains are cleared too)
             
         Returns:
             Dictionary with status and message
@@ -743,25 +1406,29 @@ class HeadlessBrowser:
             try:
                 if not self.is_running:
                     if domain:
-                        if domain in self.cookies:
-                            del self.cookies[domain]
+                        for cookie in self.cookies.for_domain(domain, include_parents=False):
+                            self.cookies.remove(cookie)
                     else:
-                        self.cookies = {}
+                        self.cookies.clear()
                     return {'status': 'success', 'message': 'Cookies cleared'}
                 
                 if domain:
-                    # Clear cookies for specific domain
-                    if domain in self.cookies:
-                        del self.cookies[domain]
-                    
-                    # If it's the current domain, also clear in the browser
-                    current_domain = self._extract_domain(self.current_url)
-                    if domain == current_domain:
-                        self.driver.delete_all_cookies()
+                    # Delete exactly the cookies of this domain, leaving other sites untouched
+                    self._sync_cookies(force=True)
+                    cookies = self.cookies.for_domain(domain, include_parents=False)
+                    for cookie in cookies:
+                        self.driver.execute_cdp_cmd('Network.deleteCookies', {
+                            'name': cookie['name'],
+                            'domain': cookie['domain'],
+                            'path': cookie.get('path', '/')
+                        })
+                        self.cookies.remove(cookie)
+                    return {'status': 'success', 'message': f'Cleared {len(cookies)} cookies for {domain}'}
                 else:
                     # Clear all cookies
-                    self.cookies = {}
-                    self.driver.delete_all_cookies()
+                    self.driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+                    self.cookies.clear()
+                    self._cookies_synced_at = time.time()
                 
                 return {'status': 'success', 'message': 'Cookies cleared'}
                 
@@ -769,6 +1436,54 @@ class HeadlessBrowser:
                 logger.error(f"Clear cookies error: {str(e)}")
                 return {'status': 'error', 'message': str(e)}
 
+    def export_cookies(self, domain=None):
+        """
+        Export cookies so they can be imported into another browser session.
+        
+        Args:
+            domain: Optional domain to restrict the export to
+            
+        Returns:
+            Dictionary with status and a list of cookies in CDP format
+        """
+        with self.lock:
+            try:
+                if not self.is_running:
+                    return {'status': 'error', 'message': 'Browser not available'}
+                
+                self._sync_cookies(force=True)
+                cookies = self.cookies.for_domain(domain) if domain else self.cookies.all()
+                return {'status': 'success', 'cookies': [to_cookie_param(cookie) for cookie in cookies]}
+                
+            except Exception as e:
+                logger.error(f"Export cookies error: {str(e)}")
+                return {'status': 'error', 'message': str(e)}
+
+    def import_cookies(self, cookies):
+        """
+        Import cookies in bulk, e.g. the output of export_cookies from another session.
+        
+        Args:
+            cookies: List of cookies in CDP format
+            
+        Returns:
+            Dictionary with status and number of imported cookies
+        """
+        with self.lock:
+            try:
+                if not self.is_running:
+                    return {'status': 'error', 'message': 'Browser not available'}
+                
+                params = [to_cookie_param(cookie) for cookie in cookies or []]
+                if params:
+                    self.driver.execute_cdp_cmd('Network.setCookies', {'cookies': params})
+                self._sync_cookies(force=True)
+                return {'status': 'success', 'imported': len(params)}
+                
+            except Exception as e:
+                logger.error(f"Import cookies error: {str(e)}")
+                return {'status': 'error', 'message': str(e)}
+
     def add_form_data(self, field_name, value):
         """
         Store form data for autofill.
@@ -780,10 +1495,18 @@ class HeadlessBrowser:
         Returns:
             Dictionary with status and message
         """
+        if not isinstance(field_name, str) or not field_name:
+            return {'status': 'error', 'message': 'Field name must be a non-empty string'}
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = str(value)
+        if not isinstance(value, str):
+            return {'status': 'error', 'message': 'Value must be a string'}
+
         with self.lock:
             try:
                 self.form_data[field_name] = value
-                self.save_persistent_data()
+                if self.store:
+                    self.store.put_form_data(self.namespace, field_name, value)
                 return {'status': 'success', 'message': f'Form data saved for {field_name}'}
                 
             except Exception as e:
@@ -830,170 +1553,168 @@ class HeadlessBrowser:
                 if field_name:
                     if field_name in self.form_data:
                         del self.form_data[field_name]
-                        self.save_persistent_data()
+                        if self.store:
+                            self.store.delete_form_data(self.namespace, field_name)
                         return {'status': 'success', 'message': f'Form data cleared for {field_name}'}
                     else:
                         return {'status': 'info', 'message': f'No data found for {field_name}'}
                 else:
                     self.form_data = {}
-                    self.save_persistent_data()
+                    if self.store:
+                        self.store.delete_form_data(self.namespace)
                     return {'status': 'success', 'message': 'All form data cleared'}
                 
             except Exception as e:
                 logger.error(f"Clear form data error: {str(e)}")
                 return {'status': 'error', 'message': str(e)}
 
-    def fill_form(self, form_data=None, submit=False):
+    def fill_form(self, form_data=None, submit=False, wait=None):
         """
         Fill a form on the current page with stored or provided data.
-        
+
+        Without form_data, fields are discovered by one injected script that scores every
+        input by id, name, placeholder, autocomplete and label against the stored data
+        types. Filling and submitting then happen in a single call as well. The resulting
+        field mapping is remembered per domain and form signature (a hash of the form
+        structure), so repeat visits skip discovery until the form changes.
+
         Args:
             form_data: Dictionary of field selectors and values 
                       (e.g., {'#email': 'user@example.com'})
             submit: Whether to submit the form after filling
+            wait: Optional condition to wait for afterwards (see wait_for)
             
         Returns:
-            Dictionary with status and results
+            Dictionary with status, per-field results, the detected field types and
+            mapping ('cached' or 'discovered' when stored data was used)
         """
+        wait, error = self._parse_wait(wait)
+        if error:
+            return error
         with self.lock:
             try:
                 if not self.is_running:
                     return {'status': 'error', 'message': 'Browser not available'}
-                
-                # If no form data provided, try to auto-detect form fields and use stored data
-                if not form_data:
-                    # Auto-detect common form fields
-                    form_data = {}
-                    
-                    # Check for common input types
-                    input_types = {
-                        'email': ['email', 'e-mail', 'mail'],
-                        'name': ['name', 'username', 'user', 'fullname', 'full-name', 'first-name', 'firstname', 'last-name', 'lastname'],
-                        'password': ['password', 'pass', 'pwd'],
-                        'address': ['address', 'street', 'addr'],
-                        'city': ['city', 'town'],
-                        'zip': ['zip', 'zipcode', 'postal', 'postal-code'],
-                        'phone': ['phone', 'telephone', 'tel', 'mobile'],
-                    }
-                    
-                    # Find input elements
-                    for input_type, selectors in input_types.items():
-                        for selector in selectors:
-                            # Try find by ID
-                            element = self.page.find_element('id', selector, timeout=0.2)
-                            if element:
-                                if input_type in self.form_data:
-                                    form_data[f'#{selector}'] = self.form_data[input_type]
-                                continue
-                                
-                            # Try find by name
-                            element = self.page.find_element('name', selector, timeout=0.2)
-                            if element:
-                                if input_type in self.form_data:
-                                    form_data[f'[name="{selector}"]'] = self.form_data[input_type]
-                                continue
-                                
-                            # Try find by placeholder
-                            elements = self.page.find_elements('css', f'input[placeholder*="{selector}" i]', timeout=0.2)
-                            if elements:
-                                if input_type in self.form_data:
-                                    form_data[f'input[placeholder*="{selector}" i]'] = self.form_data[input_type]
-                
-                # Track which fields were successfully filled
-                results = {}
-                
-                # Fill the form fields
-                for selector, value in form_data.items():
-                    try:
-                        # Determine selector type (CSS is the default)
-                        selector_type = 'css'
-                        if selector.startswith('//'):
-                            selector_type = 'xpath'
-                        
-                        # Try to find and fill the element
-                        element = self.page.find_element(selector_type, selector, timeout=1)
-                        if element:
-                            # Clear the field first
-                            element.clear()
-                            # Enter the value
-                            element.send_keys(value)
-                            results[selector] = 'filled'
-                        else:
-                            results[selector] = 'not found'
-                    except Exception as e:
-                        results[selector] = f'error: {str(e)}'
-                
-                # Submit the form if requested
-                if submit and results:
-                    try:
-                        # Try to find the form element
-                        form = None
-                        for selector in form_data:
-                            try:
-                                selector_type = 'css'
-                                if selector.startswith('//'):
-                                    selector_type = 'xpath'
-                                
-                                element = self.page.find_element(selector_type, selector, timeout=0.2)
-                                if element:
-                                    # Try to get parent form
-                                    form = self.driver.execute_script("return arguments[0].closest('form')", element)
-                                    if form:
-                                        break
-                            except:
-                                pass
-                        
-                        if form:
-                            # Submit the form
-                            form.submit()
-                            results['form_submission'] = 'submitted'
-                            
-                            # Wait for page to load
-                            self.page.wait_for_page_load(timeout=10)
-                            
-                            # Check if URL changed
-                            new_url = self.driver.current_url
-                            if new_url != self.current_url:
-                                self.current_url = new_url
-                                self._update_history(new_url)
+
+                detected = {}
+                mapping_source = None
+                if form_data:
+                    outcome = self._run_form_fill(form_data, submit, require_all=False)
+                elif self.form_data:
+                    domain = urlsplit(self.driver.current_url).hostname or ''
+                    signature = self.driver.execute_script(FORM_SIGNATURE_SCRIPT)['signature']
+                    key = (domain, signature)
+
+                    # A learned mapping is reused while the form structure and stored data types are unchanged;
+                    # the fill script validates it and fills nothing if a mapped field has gone away
+                    cached = self.autofill_mappings.get(key)
+                    outcome = None
+                    if cached and set(self.form_data) <= set(cached['types']):
+                        detected = {selector: field_type for selector, field_type in cached['fields'].items()
+                                    if field_type in self.form_data}
+                        outcome = self._run_form_fill(self._mapped_values(detected), submit, require_all=True)
+                        if outcome['stale']:
+                            self._forget_autofill_mapping(key)
+                            outcome = None
                         else:
-                            # Try pressing Enter on the last field
-                            for selector in reversed(list(form_data.keys())):
-                                try:
-                                    selector_type = 'css'
-                                    if selector.startswith('//'):
-                                        selector_type = 'xpath'
-                                    
-                                    element = self.page.find_element(selector_type, selector, timeout=0.2)
-                                    if element:
-                                        element.send_keys(Keys.ENTER)
-                                        results['form_submission'] = 'enter key pressed'
-                                        
-                                        # Wait for page load
-                                        time.sleep(1)
-                                        self.page.wait_for_page_load(timeout=10)
-                                        
-                                        # Check if URL changed
-                                        new_url = self.driver.current_url
-                                        if new_url != self.current_url:
-                                            self.current_url = new_url
-                                            self._update_history(new_url)
-                                        
-                                        break
-                                except:
-                                    pass
-                            
-                            if 'form_submission' not in results:
-                                results['form_submission'] = 'no form found to submit'
-                    except Exception as e:
-                        results['form_submission'] = f'error: {str(e)}'
-                
-                return {'status': 'success', 'results': results}
+                            mapping_source = 'cached'
+
+                    if outcome is None:
+                        fields = self.driver.execute_script(
+                            FORM_DISCOVERY_SCRIPT,
+                            field_keywords(list(self.form_data)),
+                            AUTOCOMPLETE_TYPES,
+                            INPUT_TYPES,
+                            MIN_FIELD_SCORE
+                        )
+                        detected = {field['selector']: field['type'] for field in fields}
+                        mapping_source = 'discovered'
+                        if detected:
+                            self._remember_autofill_mapping(key, {'fields': detected, 'types': sorted(self.form_data)})
+                        outcome = self._run_form_fill(self._mapped_values(detected), submit, require_all=False)
+                else:
+                    outcome = None
+
+                if not outcome or not outcome['results']:
+                    return {'status': 'success', 'results': {}, 'detected': detected, 'mapping': mapping_source}
+
+                results = outcome['results']
+
+                if submit:
+                    if outcome.get('submission') == 'submitted':
+                        results['form_submission'] = 'submitted'
+                    elif outcome.get('enter_target') is not None:
+                        # No enclosing form: a real Enter key press triggers the page's own handlers
+                        outcome['enter_target'].send_keys(Keys.ENTER)
+                        results['form_submission'] = 'enter key pressed'
+                    else:
+                        results['form_submission'] = 'no form found to submit'
+
+                    if results['form_submission'] != 'no form found to submit':
+                        self.page.invalidate()
+                        self.page.wait_for_page_load(timeout=10)
+                        new_url = self.driver.current_url
+                        if new_url != self.current_url:
+                            self.current_url = new_url
+                            self._update_history(new_url)
+
+                return self._after_action(
+                    {'status': 'success', 'results': results, 'detected': detected, 'mapping': mapping_source}, wait
+                )
                 
             except Exception as e:
                 logger.error(f"Fill form error: {str(e)}")
                 return {'status': 'error', 'message': str(e)}
 
+    def _run_form_fill(self, form_data, submit, require_all):
+        """Fill (and optionally submit) fields in one injected call; caller holds the lock."""
+        return self.driver.execute_script(
+            FORM_FILL_SCRIPT,
+            [{'selector': selector, 'value': value} for selector, value in form_data.items()],
+            bool(submit),
+            require_all
+        )
+
+    def _mapped_values(self, mapping):
+        return {selector: self.form_data[field_type] for selector, field_type in mapping.items()}
+
+    def _remember_autofill_mapping(self, key, mapping):
+        self.autofill_mappings[key] = mapping
+        if self.store:
+            self.store.put_autofill_mapping(self.namespace, key[0], key[1], mapping)
+
+    def _forget_autofill_mapping(self, key):
+        self.autofill_mappings.pop(key, None)
+        if self.store:
+            self.store.delete_autofill_mappings(self.namespace, key[0], key[1])
+
+    def get_autofill_mappings(self, domain=None):
+        """
+        Get learned autofill field mappings.
+
+        Args:
+            domain: Optional host to restrict the result to
+
+        Returns:
+            Dictionary with a list of {domain, signature, fields, types}
+        """
+        with self.lock:
+            mappings = [
+                {'domain': key[0], 'signature': key[1], 'fields': mapping['fields'], 'types': mapping['types']}
+                for key, mapping in self.autofill_mappings.items()
+                if domain is None or key[0] == domain
+            ]
+            return {'status': 'success', 'mappings': mappings}
+
+    def clear_autofill_mappings(self, domain=None):
+        """Forget learned autofill mappings for one domain, or all of them."""
+        with self.lock:
+            for key in [key for key in self.autofill_mappings if domain is None or key[0] == domain]:
+                del self.autofill_mappings[key]
+            if self.store:
+                self.store.delete_autofill_mappings(self.namespace, domain)
+            return {'status': 'success'}
+
     def get_history(self, limit=None):
         """
         Get browser navigation history.
@@ -1006,9 +1727,10 @@ class HeadlessBrowser:
         """
         with self.lock:
             try:
-                history = self.history
                 if limit and limit > 0:
-                    history = history[-limit:]
+                    history = list(islice(self.history, max(0, len(self.history) - limit), None))
+                else:
+                    history = list(self.history)
                 
                 return {
                     'status': 'success', 
@@ -1033,21 +1755,81 @@ class HeadlessBrowser:
                 if self.is_running:
                     current_url = self.driver.current_url
                 
-                self.history = [current_url]
+                self.history.clear()
+                self.history.append(current_url)
                 self.history_position = 0
                 
+                if self.store:
+                    self.store.clear_history(self.namespace)
+                
                 return {'status': 'success', 'message': 'History cleared'}
                 
             except Exception as e:
                 logger.error(f"Clear history error: {str(e)}")
                 return {'status': 'error', 'message': str(e)}
 
+    def get_history_visits(self, limit=50, cursor=None):
+        """
+        Get persistent visit history, most recent first, one page at a time.
+        
+        Args:
+            limit: Page size
+            cursor: Cursor returned by the previous page
+            
+        Returns:
+            Dictionary with status, entries (url, title, visit_count, first/last visit) and next_cursor
+        """
+        try:
+            if not self.store:
+                return {'status': 'error', 'message': 'History storage not available'}
+            
+            # Include visits still waiting in the write queue
+            self.store.flush()
+            page = self.store.history_page(self.namespace, max(1, min(limit, 500)), cursor)
+            return {'status': 'success', **page}
+            
+        except ValueError:
+            return {'status': 'error', 'message': 'Invalid cursor'}
+        except Exception as e:
+            logger.error(f"Get history visits error: {str(e)}")
+            return {'status': 'error', 'message': str(e)}
+
+    def search_history(self, query, limit=50):
+        """
+        Full-text search over visited page titles and URLs.
+        
+        Args:
+            query: Search text; each word matches as a prefix
+            limit: Maximum number of results
+            
+        Returns:
+            Dictionary with status and matching entries
+        """
+        try:
+            if not self.store:
+                return {'status': 'error', 'message': 'History storage not available'}
+            
+            self.store.flush()
+            entries = self.store.search_history(self.namespace, query, max(1, min(limit, 500)))
+            return {'status': 'success', 'query': query, 'entries': entries}
+            
+        except Exception as e:
+            logger.error(f"Search history error: {str(e)}")
+            return {'status': 'error', 'message': str(e)}
+
     def close(self):
         """Close the browser and clean up resources."""
         with self.lock:
             # Save any persistent data before closing
             self.save_persistent_data()
             
+            if self.engine:
+                try:
+                    self.engine.close()
+                except Exception as e:
+                    logger.warning(f"Error closing {self.engine.name} engine: {str(e)}")
+                self.engine = None
+            
             if self.driver and self.is_running:
                 self.driver.quit()
                 self.is_running = False
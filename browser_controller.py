@@ -1,6 +1,7 @@
 # browser_controller.py
 from playwright.sync_api import sync_playwright, Error as PlaywrightError
 import io
+from wait_conditions import parse_wait_spec, playwright_wait
 
 class BrowserController:
     def __init__(self, headless=True): # Default to headless for server use
@@ -103,6 +104,10 @@ class BrowserController:
         print(f"Pressing key: {key}")
         self.page.keyboard.press(key)
 
+    def wait_for(self, wait):
+        if not self.page: return None
+        return playwright_wait(self.page, parse_wait_spec(wait))
+
     def get_current_url(self):
         if not self.page: return "Page not available"
         return self.page.url
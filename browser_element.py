@@ -6,18 +6,82 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException, StaleElementReferenceException
 
+from wait_conditions import PageWaiter
+
 logger = logging.getLogger(__name__)
 
+# Locator strategy names accepted by the lookup methods
+LOCATOR_MAP = {
+    'id': By.ID,
+    'xpath': By.XPATH,
+    'css': By.CSS_SELECTOR,
+    'name': By.NAME,
+    'tag': By.TAG_NAME,
+    'class': By.CLASS_NAME,
+    'link_text': By.LINK_TEXT,
+    'partial_link_text': By.PARTIAL_LINK_TEXT
+}
+
+# Resolves a list of [strategy, value] pairs in one call; null where nothing matches
+LOCATE_MANY_SCRIPT = """
+var locators = arguments[0];
+var byLinkText = function(value, partial) {
+    var links = document.getElementsByTagName('a');
+    for (var i = 0; i < links.length; i++) {
+        var text = (links[i].innerText || links[i].textContent || '').trim();
+        if (partial ? text.indexOf(value) !== -1 : text === value) {
+            return links[i];
+        }
+    }
+    return null;
+};
+var locate = function(by, value) {
+    switch (by) {
+        case 'id': return document.getElementById(value);
+        case 'xpath': return document.evaluate(value, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+        case 'name': return document.getElementsByName(value)[0] || null;
+        case 'tag': return document.getElementsByTagName(value)[0] || null;
+        case 'class': return document.getElementsByClassName(value)[0] || null;
+        case 'link_text': return byLinkText(value, false);
+        case 'partial_link_text': return byLinkText(value, true);
+        default: return document.querySelector(value);
+    }
+};
+return locators.map(function(locator) {
+    try {
+        return locate(locator[0], locator[1]);
+    } catch (e) {
+        return null;
+    }
+});
+"""
+
+
+def _locator(by: str):
+    return LOCATOR_MAP.get(by.lower(), By.CSS_SELECTOR)
+
+
 class BrowserPageElement:
     """
     Class to manage elements on a web page, providing more specific element-based interactions.
     This enhances the HeadlessBrowser class by adding the ability to find and interact with 
     specific elements rather than just coordinates.
+
+    Found elements are cached per document, keyed by locator. The cache is dropped when
+    the owner reports a navigation (invalidate()), a cached hit is checked for staleness
+    before it is returned, and element actions that hit a stale reference look the
+    element up again once. Lookups query the page immediately and
+    only fall back to polling with WebDriverWait when the element is not there yet.
     """
     
     def __init__(self, driver):
         """Initialize with the WebDriver instance."""
         self.driver = driver
+        self._cache: Dict[Tuple[str, str], WebElement] = {}
+
+    def invalidate(self):
+        """Forget cached element references; called when the document changes."""
+        self._cache.clear()
     
     def find_element(self, by: str, value: str, timeout: int = 5) -> Optional[WebElement]:
         """
@@ -31,23 +95,26 @@ class BrowserPageElement:
         Returns:
             WebElement if found, None otherwise
         """
+        key = (by.lower(), value)
+        cached = self._cache.get(key)
+        if cached is not None:
+            try:
+                # Script-driven navigations and DOM replacement don't invalidate the cache
+                cached.is_enabled()
+                return cached
+            except StaleElementReferenceException:
+                del self._cache[key]
         try:
-            locator_map = {
-                'id': By.ID,
-                'xpath': By.XPATH,
-                'css': By.CSS_SELECTOR,
-                'name': By.NAME,
-                'tag': By.TAG_NAME,
-                'class': By.CLASS_NAME,
-                'link_text': By.LINK_TEXT,
-                'partial_link_text': By.PARTIAL_LINK_TEXT
-            }
-            
-            locator = locator_map.get(by.lower(), By.CSS_SELECTOR)
-            
-            element = WebDriverWait(self.driver, timeout).until(
-                EC.presence_of_element_located((locator, value))
-            )
+            locator = _locator(by)
+            try:
+                element = self.driver.find_element(locator, value)
+            except NoSuchElementException:
+                if timeout <= 0:
+                    raise
+                element = WebDriverWait(self.driver, timeout).until(
+                    EC.presence_of_element_located((locator, value))
+                )
+            self._cache[key] = element
             return element
         except (TimeoutException, NoSuchElementException) as e:
             logger.error(f"Element not found: {by}={value}, error: {str(e)}")
@@ -69,29 +136,65 @@ class BrowserPageElement:
             List of WebElements, empty list if none found
         """
         try:
-            locator_map = {
-                'id': By.ID,
-                'xpath': By.XPATH,
-                'css': By.CSS_SELECTOR,
-                'name': By.NAME,
-                'tag': By.TAG_NAME,
-                'class': By.CLASS_NAME,
-                'link_text': By.LINK_TEXT,
-                'partial_link_text': By.PARTIAL_LINK_TEXT
-            }
-            
-            locator = locator_map.get(by.lower(), By.CSS_SELECTOR)
-            
-            WebDriverWait(self.driver, timeout).until(
-                EC.presence_of_element_located((locator, value))
-            )
-            return self.driver.find_elements(locator, value)
+            locator = _locator(by)
+            elements = self.driver.find_elements(locator, value)
+            if elements or timeout <= 0:
+                return elements
+            # Poll until at least one element is present; the wait returns the list itself
+            return WebDriverWait(self.driver, timeout).until(lambda d: d.find_elements(locator, value))
         except TimeoutException:
             logger.warning(f"No elements found: {by}={value} after {timeout} seconds")
             return []
         except Exception as e:
             logger.error(f"Error finding elements: {str(e)}")
             return []
+
+    def locate_many(self, locators: List[Tuple[str, str]]) -> List[Optional[WebElement]]:
+        """
+        Resolve several locators in a single round-trip, without waiting.
+
+        The results replace the cached references for these locators. (Cached elements
+        cannot be passed into the script for reuse: chromedriver rejects the whole call
+        if any argument is stale.)
+
+        Args:
+            locators: List of (strategy, value) pairs
+
+        Returns:
+            List of WebElements (None where nothing matched), in the order of the locators
+        """
+        if not locators:
+            return []
+        keys = [(by.lower(), value) for by, value in locators]
+        try:
+            elements = self.driver.execute_script(
+                LOCATE_MANY_SCRIPT,
+                [[by, value] for by, value in keys]
+            )
+        except Exception as e:
+            logger.error(f"Error locating elements: {str(e)}")
+            return [None] * len(locators)
+
+        for key, element in zip(keys, elements):
+            if element is None:
+                self._cache.pop(key, None)
+            else:
+                self._cache[key] = element
+        return elements
+
+    def _with_element(self, by: str, value: str, timeout: int, action):
+        """Run an action on a located element, looking it up again once if the cached reference went stale."""
+        element = self.find_element(by, value, timeout)
+        if element is None:
+            return None, False
+        try:
+            return action(element), True
+        except StaleElementReferenceException:
+            self._cache.pop((by.lower(), value), None)
+            element = self.find_element(by, value, timeout)
+            if element is None:
+                return None, False
+            return action(element), True
     
     def click_element(self, by: str, value: str, timeout: int = 5) -> bool:
         """
@@ -105,15 +208,12 @@ class BrowserPageElement:
         Returns:
             True if successful, False otherwise
         """
-        element = self.find_element(by, value, timeout)
-        if element:
-            try:
-                element.click()
-                return True
-            except Exception as e:
-                logger.error(f"Error clicking element: {str(e)}")
-                return False
-        return False
+        try:
+            _, found = self._with_element(by, value, timeout, lambda element: element.click())
+            return found
+        except Exception as e:
+            logger.error(f"Error clicking element: {str(e)}")
+            return False
     
     def input_text(self, by: str, value: str, text: str, timeout: int = 5, clear_first: bool = True) -> bool:
         """
@@ -129,17 +229,17 @@ class BrowserPageElement:
         Returns:
             True if successful, False otherwise
         """
-        element = self.find_element(by, value, timeout)
-        if element:
-            try:
-                if clear_first:
-                    element.clear()
-                element.send_keys(text)
-                return True
-            except Exception as e:
-                logger.error(f"Error entering text: {str(e)}")
-                return False
-        return False
+        def enter(element):
+            if clear_first:
+                element.clear()
+            element.send_keys(text)
+
+        try:
+            _, found = self._with_element(by, value, timeout, enter)
+            return found
+        except Exception as e:
+            logger.error(f"Error entering text: {str(e)}")
+            return False
     
     def get_element_text(self, by: str, value: str, timeout: int = 5) -> Optional[str]:
         """
@@ -153,14 +253,12 @@ class BrowserPageElement:
         Returns:
             Text content if found, None otherwise
         """
-        element = self.find_element(by, value, timeout)
-        if element:
-            try:
-                return element.text
-            except Exception as e:
-                logger.error(f"Error getting element text: {str(e)}")
-                return None
-        return None
+        try:
+            text, _ = self._with_element(by, value, timeout, lambda element: element.text)
+            return text
+        except Exception as e:
+            logger.error(f"Error getting element text: {str(e)}")
+            return None
     
     def get_element_attribute(self, by: str, value: str, attribute: str, timeout: int = 5) -> Optional[str]:
         """
@@ -175,14 +273,12 @@ class BrowserPageElement:
         Returns:
             Attribute value if found, None otherwise
         """
-        element = self.find_element(by, value, timeout)
-        if element:
-            try:
-                return element.get_attribute(attribute)
-            except Exception as e:
-                logger.error(f"Error getting element attribute: {str(e)}")
-                return None
-        return None
+        try:
+            result, _ = self._with_element(by, value, timeout, lambda element: element.get_attribute(attribute))
+            return result
+        except Exception as e:
+            logger.error(f"Error getting element attribute: {str(e)}")
+            return None
     
     def is_element_visible(self, by: str, value: str, timeout: int = 5) -> bool:
         """
@@ -197,20 +293,15 @@ class BrowserPageElement:
             True if element is visible, False otherwise
         """
         try:
-            locator_map = {
-                'id': By.ID,
-                'xpath': By.XPATH,
-                'css': By.CSS_SELECTOR,
-                'name': By.NAME,
-                'tag': By.TAG_NAME,
-                'class': By.CLASS_NAME,
-                'link_text': By.LINK_TEXT,
-                'partial_link_text': By.PARTIAL_LINK_TEXT
-            }
-            
-            locator = locator_map.get(by.lower(), By.CSS_SELECTOR)
-            
-            element = WebDriverWait(self.driver, timeout).until(
+            locator = _locator(by)
+            try:
+                if self.driver.find_element(locator, value).is_displayed():
+                    return True
+            except (NoSuchElementException, StaleElementReferenceException):
+                pass
+            if timeout <= 0:
+                return False
+            WebDriverWait(self.driver, timeout).until(
                 EC.visibility_of_element_located((locator, value))
             )
             return True
@@ -249,20 +340,19 @@ class BrowserPageElement:
         Returns:
             Dictionary with x, y, width, height if found, None otherwise
         """
-        element = self.find_element(by, value, timeout)
-        if element:
-            try:
-                rect = element.rect
-                return {
-                    'x': rect['x'],
-                    'y': rect['y'],
-                    'width': rect['width'],
-                    'height': rect['height']
-                }
-            except Exception as e:
-                logger.error(f"Error getting element dimensions: {str(e)}")
+        try:
+            rect, found = self._with_element(by, value, timeout, lambda element: element.rect)
+            if not found:
                 return None
-        return None
+            return {
+                'x': rect['x'],
+                'y': rect['y'],
+                'width': rect['width'],
+                'height': rect['height']
+            }
+        except Exception as e:
+            logger.error(f"Error getting element dimensions: {str(e)}")
+            return None
     
     def wait_for_page_load(self, timeout: int = 30) -> bool:
         """
@@ -275,13 +365,11 @@ class BrowserPageElement:
             True if page loaded successfully, False on timeout
         """
         try:
-            WebDriverWait(self.driver, timeout).until(
-                lambda d: d.execute_script('return document.readyState') == 'complete'
-            )
-            return True
-        except TimeoutException:
+            # Resolves on the window load event instead of polling document.readyState
+            if PageWaiter(self.driver).wait({'condition': 'load', 'timeout': timeout})['satisfied']:
+                return True
             logger.warning(f"Page load timeout after {timeout} seconds")
             return False
         except Exception as e:
             logger.error(f"Error waiting for page load: {str(e)}")
-            return False
\ No newline at end of file
+            return False
@@ -0,0 +1,176 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Any
+
+from browser import HeadlessBrowser
+from profiles import ProfileManager
+
+logger = logging.getLogger(__name__)
+
+# Lifecycle states of a pooled browser
+PENDING = "pending"
+STARTING = "starting"
+READY = "ready"
+FAILED = "failed"
+
+
+class BrowserPool:
+    """
+    Owns the managed browser instances and brings them up in the background.
+
+    Browsers are constructed without launching Chrome, so creating the pool is cheap
+    and the server can start answering requests immediately. warm_up() launches the
+    primary browser first (it backs the interactive session) and then the remaining
+    browsers with bounded concurrency.
+
+    With a ProfileManager, every browser runs on its own clone of the warm template
+    profile; the clone is made just before launch and deleted as soon as the browser
+    fails to start, is started again or is closed.
+
+    Browsers other than the primary serve batch jobs: each is checked out exclusively
+    with checkout() and returned with checkin().
+    """
+
+    def __init__(self, factory: Callable[[int], HeadlessBrowser], size: int = 1, warmup_concurrency: int = 2,
+                 profiles: Optional[ProfileManager] = None):
+        """
+        Initialize the pool.
+
+        Args:
+            factory: Callable returning an unstarted HeadlessBrowser for a pool index
+            size: Number of browsers to manage (at least one)
+            warmup_concurrency: Maximum number of browsers launched at the same time
+            profiles: Optional profile manager providing a cloned user data directory per browser
+        """
+        self.size = max(1, size)
+        self.warmup_concurrency = max(1, warmup_concurrency)
+        self.profiles = profiles
+        self.browsers: List[HeadlessBrowser] = [factory(index) for index in range(self.size)]
+        self.states: List[str] = [PENDING] * self.size
+        self.errors: Dict[int, str] = {}
+        self.lock = threading.Lock()
+        self.warmup_started = None
+        self.warmup_finished = None
+        self._warmup_thread = None
+        self._idle: "queue.Queue[HeadlessBrowser]" = queue.Queue()  # Ready batch browsers not checked out
+
+    @property
+    def primary(self) -> HeadlessBrowser:
+        """The browser backing the interactive /ws session."""
+        return self.browsers[0]
+
+    def warm_up(self):
+        """Start launching all browsers in a background thread and return immediately."""
+        if self._warmup_thread:
+            return
+        self.warmup_started = time.time()
+        self._warmup_thread = threading.Thread(target=self._warm_up, name="browser-pool-warmup", daemon=True)
+        self._warmup_thread.start()
+
+    def _warm_up(self):
+        if self.profiles:
+            try:
+                self.profiles.collect_garbage()
+                self.profiles.ensure_template()
+            except Exception as e:
+                logger.error(f"Error preparing template profile: {str(e)}")
+        self._start_browser(0)
+        if self.size > 1:
+            with ThreadPoolExecutor(max_workers=self.warmup_concurrency) as executor:
+                list(executor.map(self._start_browser, range(1, self.size)))
+        self.warmup_finished = time.time()
+        logger.info(f"Browser pool warm-up finished in {self.warmup_finished - self.warmup_started:.2f}s: {self.status()['counts']}")
+
+    def _start_browser(self, index: int):
+        browser = self.browsers[index]
+        self._set_state(index, STARTING)
+        try:
+            if self.profiles and self.profiles.template_ready():
+                # A browser started again gets a fresh clone; the previous one is dropped
+                self._release_profile(browser)
+                browser.user_data_dir = self.profiles.clone()
+            browser.setup_driver()
+        except Exception as e:
+            self.errors[index] = str(e)
+        if not browser.is_running:
+            self._release_profile(browser)
+        self._set_state(index, READY if browser.is_running else FAILED)
+        if browser.is_running and self._is_batch_browser(index):
+            self._idle.put(browser)
+
+    def _is_batch_browser(self, index: int) -> bool:
+        # The primary browser serves the interactive session and is never lent out
+        return index > 0
+
+    def batch_capacity(self) -> int:
+        """Number of started browsers available to batch jobs."""
+        with self.lock:
+            return sum(1 for index, state in enumerate(self.states) if state == READY and self._is_batch_browser(index))
+
+    def checkout(self, timeout: Optional[float] = None) -> Optional[HeadlessBrowser]:
+        """Take a batch browser for exclusive use, waiting up to timeout seconds; None if none became free."""
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def checkin(self, browser: HeadlessBrowser):
+        """Return a browser taken with checkout()."""
+        self._idle.put(browser)
+
+    def _set_state(self, index: int, state: str):
+        with self.lock:
+            self.states[index] = state
+
+    def is_ready(self) -> bool:
+        """Ready once the primary browser has started; a primary that failed to start (fallback mode) is not ready."""
+        with self.lock:
+            return self.states[0] == READY
+
+    def status(self) -> Dict[str, Any]:
+        """Warm-up progress for the readiness endpoint."""
+        with self.lock:
+            states = list(self.states)
+        counts = {state: states.count(state) for state in (PENDING, STARTING, READY, FAILED)}
+        elapsed = None
+        if self.warmup_started:
+            elapsed = (self.warmup_finished or time.time()) - self.warmup_started
+        return {
+            'size': self.size,
+            'counts': counts,
+            'browsers': [
+                {
+                    'index': index,
+                    'state': state,
+                    'startup_timings': self.browsers[index].startup_timings,
+                    'error': self.errors.get(index)
+                }
+                for index, state in enumerate(states)
+            ],
+            'warmup_seconds': elapsed,
+            'warmup_complete': self.warmup_finished is not None
+        }
+
+    def _release_profile(self, browser: HeadlessBrowser):
+        """Delete the browser's profile clone, if it has one."""
+        if self.profiles:
+            self.profiles.release(browser.user_data_dir)
+
+    def close_browser(self, index: int):
+        """Close one pooled browser and delete its profile clone."""
+        browser = self.browsers[index]
+        try:
+            browser.close()
+        except Exception as e:
+            logger.error(f"Error closing pooled browser: {str(e)}")
+        self._release_profile(browser)
+
+    def close(self):
+        """Close every browser in the pool."""
+        for index in range(self.size):
+            self.close_browser(index)
+        if self.profiles:
+            self.profiles.close()
@@ -0,0 +1,131 @@
+import base64
+import io
+import struct
+import zlib
+from typing import Any, Dict, Iterator, Optional
+
+CAPTURE_FORMATS = ('png', 'jpeg', 'webp')
+DEFAULT_TILE_HEIGHT = 2048
+MIN_TILE_HEIGHT = 256
+MAX_TILE_HEIGHT = 8192
+# Pages are captured down to this many CSS pixels at most
+MAX_CAPTURE_HEIGHT = 50000
+# Compressed PNG data is flushed to the client in IDAT chunks of about this size
+PNG_CHUNK_SIZE = 256 * 1024
+PDF_READ_SIZE = 1024 * 1024
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def page_size(driver) -> Dict[str, int]:
+    """Full content size of the page in CSS pixels, from Page.getLayoutMetrics."""
+    metrics = driver.execute_cdp_cmd('Page.getLayoutMetrics', {})
+    content = metrics.get('cssContentSize') or metrics['contentSize']
+    viewport = metrics.get('cssLayoutViewport') or metrics['layoutViewport']
+    width = int(max(content['width'], viewport['clientWidth']))
+    height = int(max(content['height'], viewport['clientHeight']))
+    return {'width': width, 'height': min(height, MAX_CAPTURE_HEIGHT), 'truncated': height > MAX_CAPTURE_HEIGHT}
+
+
+def tile_offsets(height: int, tile_height: int) -> Iterator[tuple]:
+    for y in range(0, height, tile_height):
+        yield y, min(tile_height, height - y)
+
+
+def capture_tile(driver, y: int, width: int, height: int, image_format: str = 'png', quality: int = 80) -> str:
+    """Render one horizontal band of the page, including parts outside the viewport; returns base64 image data."""
+    params = {
+        'format': image_format,
+        'clip': {'x': 0, 'y': y, 'width': width, 'height': height, 'scale': 1},
+        'captureBeyondViewport': True,
+        'fromSurface': True
+    }
+    if image_format != 'png':
+        params['quality'] = quality
+    return driver.execute_cdp_cmd('Page.captureScreenshot', params)['data']
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+
+class StreamingPNGWriter:
+    """
+    Encodes a PNG incrementally from bands of RGB rows.
+
+    The header is written up front from the final dimensions, then each band is
+    filtered and fed through one zlib stream; compressed data is emitted as IDAT chunks
+    as soon as enough of it has accumulated. Only the current band and the compressor
+    state are held in memory, however tall the image is. Bands that would run past the
+    declared height are cut, and missing rows are filled with white by finish().
+    """
+
+    def __init__(self, width: int, height: int, compression: int = 6):
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self._compressor = zlib.compressobj(compression)
+        self._pending = []
+        self._pending_size = 0
+
+    def header(self) -> bytes:
+        ihdr = struct.pack('>IIBBBBB', self.width, self.height, 8, 2, 0, 0, 0)
+        return PNG_SIGNATURE + _png_chunk(b'IHDR', ihdr)
+
+    def add_rows(self, rgb: bytes, rows: int) -> bytes:
+        """Add rows of packed RGB pixels (width * 3 bytes each); returns PNG bytes ready to send."""
+        rows = min(rows, self.height - self.rows_written)
+        stride = self.width * 3
+        filtered = b''.join(b'\x00' + rgb[row * stride:(row + 1) * stride] for row in range(rows))
+        self.rows_written += rows
+        return self._emit(self._compressor.compress(filtered))
+
+    def finish(self) -> bytes:
+        """Pad missing rows and return the remaining IDAT data and the IEND chunk."""
+        output = b''
+        missing = self.height - self.rows_written
+        if missing > 0:
+            output += self.add_rows(b'\xff' * (self.width * 3 * missing), missing)
+        output += self._emit(self._compressor.flush(), force=True)
+        return output + _png_chunk(b'IEND', b'')
+
+    def _emit(self, data: bytes, force: bool = False) -> bytes:
+        if data:
+            self._pending.append(data)
+            self._pending_size += len(data)
+        if self._pending_size < PNG_CHUNK_SIZE and not (force and self._pending_size):
+            return b''
+        chunk = _png_chunk(b'IDAT', b''.join(self._pending))
+        self._pending = []
+        self._pending_size = 0
+        return chunk
+
+
+def decode_tile(data: bytes, width: int):
+    """Decode a captured tile to packed RGB rows, scaled to the image width if the device pixel ratio differs."""
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(data)).convert('RGB')
+    if image.width != width:
+        image = image.resize((width, max(1, round(image.height * width / image.width))))
+    return image.tobytes(), image.height
+
+
+def read_stream(driver, handle: str, size: int = PDF_READ_SIZE) -> Iterator[bytes]:
+    """Read a CDP IO stream (e.g. from Page.printToPDF with ReturnAsStream) chunk by chunk and close it."""
+    try:
+        while True:
+            chunk = driver.execute_cdp_cmd('IO.read', {'handle': handle, 'size': size})
+            data = chunk.get('data', '')
+            if data:
+                yield base64.b64decode(data) if chunk.get('base64Encoded') else data.encode('utf-8')
+            if chunk.get('eof'):
+                break
+    finally:
+        driver.execute_cdp_cmd('IO.close', {'handle': handle})
+
+
+def print_to_pdf_stream(driver, options: Optional[Dict[str, Any]] = None) -> str:
+    """Start rendering the page as PDF; returns the IO stream handle to pass to read_stream()."""
+    params = {'printBackground': True, 'preferCSSPageSize': True, **(options or {}), 'transferMode': 'ReturnAsStream'}
+    return driver.execute_cdp_cmd('Page.printToPDF', params)['stream']
@@ -0,0 +1,82 @@
+import json
+import logging
+from collections import defaultdict
+from typing import Callable, Dict, List, Any
+
+logger = logging.getLogger(__name__)
+
+# Chrome logging preferences that make chromedriver record CDP Network events
+PERFORMANCE_LOGGING_PREFS = {'performance': 'ALL'}
+PERF_LOGGING_OPTIONS = {'enableNetwork': True, 'enablePage': False}
+
+
+def enable_performance_logging(chrome_options):
+    """Configure Chrome options so CDP Network events can be read back through the performance log."""
+    chrome_options.set_capability('goog:loggingPrefs', PERFORMANCE_LOGGING_PREFS)
+    chrome_options.add_experimental_option('perfLoggingPrefs', PERF_LOGGING_OPTIONS)
+
+
+class CDPEventLog:
+    """
+    Dispatches CDP events recorded in chromedriver's performance log.
+
+    Selenium's execute_cdp_cmd can only send commands, so events are collected by
+    chromedriver and read back in batches. drain() fetches everything recorded since
+    the previous call (one driver round-trip) and hands each event to the callbacks
+    subscribed to its method name.
+    """
+
+    def __init__(self, driver):
+        """Initialize with the WebDriver instance."""
+        self.driver = driver
+        self.listeners: Dict[str, List[Callable[[Dict[str, Any]], None]]] = defaultdict(list)
+        self.available = True
+
+    def subscribe(self, method: str, callback: Callable[[Dict[str, Any]], None]):
+        """
+        Register a callback for a CDP event.
+
+        Args:
+            method: CDP event name, e.g. 'Network.loadingFinished'
+            callback: Called with the event params
+        """
+        self.listeners[method].append(callback)
+
+    def drain(self) -> int:
+        """
+        Fetch pending events from the driver and dispatch them.
+
+        Returns:
+            Number of events dispatched
+        """
+        if not self.available:
+            return 0
+
+        try:
+            entries = self.driver.get_log('performance')
+        except Exception as e:
+            # Performance logging was not enabled for this session; stop asking
+            logger.warning(f"CDP event log unavailable: {str(e)}")
+            self.available = False
+            return 0
+
+        dispatched = 0
+        for entry in entries:
+            try:
+                message = json.loads(entry['message'])['message']
+            except (KeyError, ValueError):
+                continue
+
+            callbacks = self.listeners.get(message.get('method'))
+            if not callbacks:
+                continue
+
+            params = message.get('params', {})
+            for callback in callbacks:
+                try:
+                    callback(params)
+                except Exception as e:
+                    logger.error(f"Error handling CDP event {message.get('method')}: {str(e)}")
+            dispatched += 1
+
+        return dispatched
@@ -0,0 +1,142 @@
+from typing import Dict, List, Optional, Any, Iterable, Tuple, Set
+
+# Fields accepted by CDP Network.setCookies
+COOKIE_PARAM_FIELDS = {
+    'name', 'value', 'url', 'domain', 'path', 'secure', 'httpOnly', 'sameSite',
+    'expires', 'priority', 'sameParty', 'sourceScheme', 'sourcePort', 'partitionKey',
+}
+
+
+def normalize_domain(domain: Optional[str]) -> str:
+    """Lowercase a cookie or host domain and drop the leading dot of domain cookies."""
+    return (domain or '').strip().lower().lstrip('.')
+
+
+def cookie_key(cookie: Dict[str, Any]) -> Tuple[str, str, str]:
+    """Identity of a cookie: (domain, path, name), as in the cookie specification."""
+    return (cookie.get('domain') or '').lower(), cookie.get('path') or '/', cookie.get('name') or ''
+
+
+def to_cookie_param(cookie: Dict[str, Any]) -> Dict[str, Any]:
+    """Strip a cookie as returned by Network.getAllCookies down to what Network.setCookies accepts."""
+    param = {k: v for k, v in cookie.items() if k in COOKIE_PARAM_FIELDS}
+    # Session cookies are reported with expires -1; setting that would expire them immediately
+    if cookie.get('session') or (param.get('expires') is not None and param['expires'] < 0):
+        param.pop('expires', None)
+    return param
+
+
+class CookieIndex:
+    """
+    Browser cookie state indexed by domain and path.
+
+    Cookies are stored per normalized domain, keyed by their full (domain, path, name)
+    identity inside each domain, so a host-only cookie and a domain cookie with the same
+    name and path (domain 'example.com' and '.example.com') are kept apart.
+    A suffix index maps every parent domain to the domains below it, so lookups for a
+    site (its own cookies, cookies of its subdomains and parent-domain cookies) touch
+    only the relevant buckets. Updates are applied as diffs against a full cookie list,
+    which keeps the number of changed entries small between syncs.
+    """
+
+    def __init__(self):
+        self._domains: Dict[str, Dict[Tuple[str, str, str], Dict[str, Any]]] = {}
+        self._by_key: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        self._descendants: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._by_key)
+
+    def put(self, cookie: Dict[str, Any]):
+        key = cookie_key(cookie)
+        domain = normalize_domain(cookie.get('domain'))
+        bucket = self._domains.get(domain)
+        if bucket is None:
+            bucket = self._domains[domain] = {}
+            for suffix in self._suffixes(domain):
+                self._descendants.setdefault(suffix, set()).add(domain)
+        bucket[key] = cookie
+        self._by_key[key] = cookie
+
+    def remove(self, cookie: Dict[str, Any]) -> bool:
+        key = cookie_key(cookie)
+        if self._by_key.pop(key, None) is None:
+            return False
+        domain = normalize_domain(cookie.get('domain'))
+        bucket = self._domains.get(domain)
+        if bucket is not None:
+            bucket.pop(key, None)
+            if not bucket:
+                del self._domains[domain]
+                for suffix in self._suffixes(domain):
+                    members = self._descendants.get(suffix)
+                    if members is not None:
+                        members.discard(domain)
+                        if not members:
+                            del self._descendants[suffix]
+        return True
+
+    def clear(self):
+        self._domains.clear()
+        self._by_key.clear()
+        self._descendants.clear()
+
+    def apply_snapshot(self, cookies: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Bring the index in line with a full cookie list, touching only what changed.
+
+        Returns:
+            Counts of added, updated and removed cookies
+        """
+        incoming = {cookie_key(cookie): cookie for cookie in cookies}
+        changes = {'added': 0, 'updated': 0, 'removed': 0}
+
+        for key in [key for key in self._by_key if key not in incoming]:
+            self.remove(self._by_key[key])
+            changes['removed'] += 1
+
+        for key, cookie in incoming.items():
+            existing = self._by_key.get(key)
+            if existing is None:
+                changes['added'] += 1
+            elif existing != cookie:
+                changes['updated'] += 1
+            else:
+                continue
+            self.put(cookie)
+
+        return changes
+
+    def for_domain(self, domain: str, include_parents: bool = True) -> List[Dict[str, Any]]:
+        """
+        Cookies belonging to a site.
+
+        Args:
+            domain: Host or domain, e.g. 'example.com'
+            include_parents: Also return domain cookies of parent domains that the host receives
+
+        Returns:
+            Cookies set for the domain itself, for its subdomains and (optionally) for its parents
+        """
+        domain = normalize_domain(domain)
+        domains = set(self._descendants.get(domain, ()))
+        if include_parents:
+            domains.update(d for d in self._suffixes(domain) if d in self._domains)
+
+        cookies = []
+        for name in sorted(domains):
+            cookies.extend(self._domains.get(name, {}).values())
+        return cookies
+
+    def grouped(self) -> Dict[str, List[Dict[str, Any]]]:
+        """All cookies grouped by normalized domain."""
+        return {domain: list(bucket.values()) for domain, bucket in self._domains.items()}
+
+    def all(self) -> List[Dict[str, Any]]:
+        return list(self._by_key.values())
+
+    @staticmethod
+    def _suffixes(domain: str) -> List[str]:
+        """'a.b.com' -> ['a.b.com', 'b.com', 'com']"""
+        labels = domain.split('.')
+        return ['.'.join(labels[i:]) for i in range(len(labels))]
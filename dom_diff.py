@@ -0,0 +1,112 @@
+# In-page MutationObserver that records DOM changes in a bounded, sequenced log.
+#
+# Executed with arguments (since, limit). The first call on a document installs the
+# observer and reports a reset, telling the caller to fetch the full HTML once. Later
+# calls return the mutations recorded after the cursor "<document token>:<sequence>".
+# A cursor from another document (the page navigated) or older than the retained log
+# also yields a reset.
+DOM_DIFF_SCRIPT = """
+var since = arguments[0];
+var limit = arguments[1];
+var state = window.__domDiffState;
+
+if (!state) {
+    state = window.__domDiffState = {
+        token: Math.random().toString(36).slice(2) + Date.now().toString(36),
+        seq: 0,
+        log: [],
+        max: 5000,
+        ids: new WeakMap(),
+        nextId: 1
+    };
+
+    var nodeId = function(node) {
+        var id = state.ids.get(node);
+        if (!id) {
+            id = state.nextId++;
+            state.ids.set(node, id);
+        }
+        return id;
+    };
+
+    var nodePath = function(node) {
+        var el = node.nodeType === 1 ? node : node.parentElement;
+        var parts = [];
+        while (el && el.parentElement) {
+            var index = 1;
+            for (var sibling = el.previousElementSibling; sibling; sibling = sibling.previousElementSibling) {
+                index++;
+            }
+            parts.unshift(el.tagName.toLowerCase() + ':nth-child(' + index + ')');
+            el = el.parentElement;
+        }
+        parts.unshift('html');
+        return parts.join(' > ');
+    };
+
+    var describe = function(node) {
+        if (node.nodeType === 1) {
+            return {id: nodeId(node), html: node.outerHTML.slice(0, 20000)};
+        }
+        if (node.nodeType === 3) {
+            return {id: nodeId(node), text: node.data};
+        }
+        return {id: nodeId(node)};
+    };
+
+    state.observer = new MutationObserver(function(records) {
+        for (var i = 0; i < records.length; i++) {
+            var record = records[i];
+            var entry = {
+                seq: ++state.seq,
+                type: record.type,
+                target: nodeId(record.target),
+                path: nodePath(record.target)
+            };
+            if (record.type === 'childList') {
+                entry.added = Array.prototype.map.call(record.addedNodes, describe);
+                entry.removed = Array.prototype.map.call(record.removedNodes, nodeId);
+                if (record.previousSibling) {
+                    entry.previous_sibling = nodeId(record.previousSibling);
+                }
+            } else if (record.type === 'attributes') {
+                entry.attribute = record.attributeName;
+                entry.value = record.target.getAttribute(record.attributeName);
+            } else {
+                entry.value = record.target.data;
+            }
+            state.log.push(entry);
+        }
+        if (state.log.length > state.max) {
+            state.log.splice(0, state.log.length - state.max);
+        }
+    });
+    state.observer.observe(document.documentElement, {
+        childList: true, subtree: true, attributes: true, characterData: true
+    });
+}
+
+var reset = function() {
+    return {reset: true, cursor: state.token + ':' + state.seq, diffs: [], more: false};
+};
+
+if (!since) {
+    return reset();
+}
+var separator = since.lastIndexOf(':');
+var token = since.slice(0, separator);
+var sinceSeq = parseInt(since.slice(separator + 1), 10);
+var oldest = state.log.length ? state.log[0].seq : state.seq + 1;
+if (token !== state.token || isNaN(sinceSeq) || sinceSeq > state.seq || sinceSeq < oldest - 1) {
+    return reset();
+}
+
+var diffs = [];
+for (var i = 0; i < state.log.length && diffs.length < limit; i++) {
+    if (state.log[i].seq > sinceSeq) {
+        diffs.push(state.log[i]);
+    }
+}
+var last = diffs.length ? diffs[diffs.length - 1].seq : sinceSeq;
+return {reset: false, cursor: state.token + ':' + last, diffs: diffs, more: last < state.seq};
+"""
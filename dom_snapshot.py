@@ -0,0 +1,131 @@
+from typing import Dict, List, Any
+
+SNAPSHOT_FILTERS = ('all', 'visible', 'interactive')
+
+# Computed styles requested from DOMSnapshot.captureSnapshot, in this order, to decide visibility
+SNAPSHOT_STYLES = ['display', 'visibility', 'opacity']
+
+INTERACTIVE_TAGS = {'A', 'BUTTON', 'INPUT', 'SELECT', 'TEXTAREA', 'SUMMARY', 'OPTION', 'LABEL'}
+INTERACTIVE_ROLES = {'button', 'link', 'checkbox', 'radio', 'tab', 'menuitem', 'option', 'switch', 'textbox', 'combobox'}
+INTERACTIVE_ATTRIBUTES = {'onclick', 'tabindex', 'contenteditable'}
+
+
+def compact_snapshot(snapshot: Dict[str, Any], node_filter: str = 'all') -> Dict[str, Any]:
+    """
+    Reduce a DOMSnapshot.captureSnapshot result to a compact, optionally filtered form.
+
+    The output keeps the flat layout of the CDP result: one table of interned strings
+    shared by all documents, and per document parallel arrays for nodes (parent index,
+    type, name, value, backend node id, attributes as flat string-index pairs) and for
+    layout (node index, bounds as [x, y, width, height], text). Filtering keeps only
+    rendered nodes ('visible') or rendered nodes a user can act on ('interactive');
+    the parent of a kept node is then its nearest kept ancestor, or -1.
+
+    Args:
+        snapshot: Raw result of DOMSnapshot.captureSnapshot with SNAPSHOT_STYLES as computed styles
+        node_filter: 'all', 'visible' or 'interactive'
+
+    Returns:
+        Dictionary with strings, documents and node_count
+    """
+    source = snapshot.get('strings', [])
+    strings: List[str] = []
+    interned: Dict[str, int] = {}
+
+    def intern(index):
+        if index is None or index < 0:
+            return -1
+        value = source[index]
+        position = interned.get(value)
+        if position is None:
+            position = interned[value] = len(strings)
+            strings.append(value)
+        return position
+
+    documents = []
+    node_count = 0
+    for document in snapshot.get('documents', []):
+        nodes = document['nodes']
+        layout = document['layout']
+        parents = nodes.get('parentIndex', [])
+        names = nodes.get('nodeName', [])
+        attributes = nodes.get('attributes', [])
+
+        layout_row = {}
+        for row, node_index in enumerate(layout.get('nodeIndex', [])):
+            layout_row.setdefault(node_index, row)
+
+        if node_filter == 'all':
+            keep = set(range(len(parents)))
+        else:
+            keep = {index for index, row in layout_row.items() if _is_visible(layout, row, source)}
+            if node_filter == 'interactive':
+                clickable = set(nodes.get('isClickable', {}).get('index', []))
+                keep = {index for index in keep
+                        if index in clickable or _is_interactive(source, names[index], attributes[index] if index < len(attributes) else [])}
+
+        # Nodes are in document order, so a parent's nearest kept ancestor is known before its children
+        new_index = {}
+        nearest_kept = [-1] * len(parents)
+        out_nodes = {'parent': [], 'type': [], 'name': [], 'value': [], 'backend_id': [], 'attributes': []}
+        for index, parent in enumerate(parents):
+            inherited = nearest_kept[parent] if parent >= 0 else -1
+            if index not in keep:
+                nearest_kept[index] = inherited
+                continue
+            new_index[index] = len(out_nodes['parent'])
+            nearest_kept[index] = new_index[index]
+            out_nodes['parent'].append(inherited)
+            out_nodes['type'].append(nodes['nodeType'][index])
+            out_nodes['name'].append(intern(names[index]))
+            out_nodes['value'].append(intern(nodes['nodeValue'][index]))
+            out_nodes['backend_id'].append(nodes['backendNodeId'][index])
+            out_nodes['attributes'].append([intern(i) for i in (attributes[index] if index < len(attributes) else [])])
+
+        out_nodes['clickable'] = [new_index[i] for i in nodes.get('isClickable', {}).get('index', []) if i in new_index]
+        input_values = nodes.get('inputValue', {})
+        kept_inputs = [(new_index[i], v) for i, v in zip(input_values.get('index', []), input_values.get('value', []))
+                       if i in new_index]
+        out_nodes['input_value'] = {'index': [i for i, _ in kept_inputs], 'value': [intern(v) for _, v in kept_inputs]}
+
+        out_layout = {'node': [], 'bounds': [], 'text': []}
+        for node_index, row in sorted(layout_row.items()):
+            if node_index not in new_index:
+                continue
+            out_layout['node'].append(new_index[node_index])
+            out_layout['bounds'].append(layout['bounds'][row])
+            out_layout['text'].append(intern(layout['text'][row]) if row < len(layout.get('text', [])) else -1)
+
+        node_count += len(out_nodes['parent'])
+        documents.append({
+            'url': source[document['documentURL']] if document.get('documentURL', -1) >= 0 else None,
+            'title': source[document['title']] if document.get('title', -1) >= 0 else None,
+            'frame_id': source[document['frameId']] if document.get('frameId', -1) >= 0 else None,
+            'nodes': out_nodes,
+            'layout': out_layout
+        })
+
+    return {'strings': strings, 'documents': documents, 'node_count': node_count}
+
+
+def _is_visible(layout: Dict[str, Any], row: int, source: List[str]) -> bool:
+    bounds = layout['bounds'][row]
+    if len(bounds) < 4 or bounds[2] <= 0 or bounds[3] <= 0:
+        return False
+    styles = layout['styles'][row] if row < len(layout.get('styles', [])) else []
+    values = [source[i] if i >= 0 else '' for i in styles]
+    values += [''] * (len(SNAPSHOT_STYLES) - len(values))
+    display, visibility, opacity = values[:3]
+    return display != 'none' and visibility != 'hidden' and opacity != '0'
+
+
+def _is_interactive(source: List[str], name_index: int, attributes: List[int]) -> bool:
+    if source[name_index] in INTERACTIVE_TAGS:
+        return True
+    for position in range(0, len(attributes) - 1, 2):
+        name = source[attributes[position]].lower()
+        if name in INTERACTIVE_ATTRIBUTES:
+            return True
+        if name == 'role' and source[attributes[position + 1]].lower() in INTERACTIVE_ROLES:
+            return True
+    return False
@@ -0,0 +1,193 @@
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess
+import time
+from typing import Dict, Optional, Any
+
+logger = logging.getLogger(__name__)
+
+# Executable names probed on PATH when no explicit binary is configured
+CHROME_BINARY_NAMES = [
+    "google-chrome",
+    "google-chrome-stable",
+    "chromium",
+    "chromium-browser",
+    "chrome",
+]
+CHROMEDRIVER_NAMES = ["chromedriver"]
+
+CACHE_FILE_NAME = "driver_cache.json"
+
+
+def default_cache_dir() -> str:
+    """Directory used for the driver resolution cache when none is configured."""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "headless-browser")
+
+
+class DriverResolver:
+    """
+    Resolves the chromedriver and Chrome binaries once and caches the result on disk.
+
+    The cache entry carries a fingerprint (path, size and mtime) of both binaries, so
+    subsequent launches reuse the cached paths with a couple of stat() calls instead of
+    spawning processes or asking webdriver_manager to check for updates over the network.
+    In offline mode webdriver_manager is never consulted.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, offline: bool = False,
+                 chrome_binary: Optional[str] = None, driver_path: Optional[str] = None):
+        """
+        Initialize the resolver.
+
+        Args:
+            cache_dir: Directory holding the cache file (defaults to ~/.cache/headless-browser)
+            offline: Never perform network lookups when resolving the driver
+            chrome_binary: Explicit Chrome binary to use instead of probing PATH
+            driver_path: Explicit chromedriver to use instead of probing PATH
+        """
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.cache_file = os.path.join(self.cache_dir, CACHE_FILE_NAME)
+        self.offline = offline
+        self.chrome_binary = chrome_binary
+        self.driver_path = driver_path
+
+    def resolve(self) -> Dict[str, Any]:
+        """
+        Resolve driver and browser binaries, using the on-disk cache when it is still valid.
+
+        Returns:
+            Dictionary with driver_path, browser_binary, browser_version,
+            driver_version and source ('cache', 'local' or 'webdriver_manager').
+            driver_path is None when nothing could be resolved.
+        """
+        cached = self._load_cache()
+        if cached and self._is_valid(cached):
+            return dict(cached, source="cache")
+
+        resolution = self._resolve_fresh()
+        if resolution.get("driver_path"):
+            self._save_cache(resolution)
+        return resolution
+
+    def require_driver(self, resolution: Dict[str, Any]):
+        """
+        Refuse to launch without a resolved driver in offline mode.
+
+        A bare Service() starts Selenium Manager, which downloads a driver over the network.
+
+        Raises:
+            RuntimeError: When offline and resolution found no chromedriver
+        """
+        if self.offline and not resolution.get("driver_path"):
+            raise RuntimeError("Offline mode: no chromedriver found. Put a chromedriver matching "
+                               "the installed Chrome on PATH or disable BROWSER_OFFLINE")
+
+    def invalidate(self):
+        """Drop the cached resolution, e.g. after a launch failure with the cached driver."""
+        try:
+            if os.path.exists(self.cache_file):
+                os.remove(self.cache_file)
+        except OSError as e:
+            logger.warning(f"Could not remove driver cache: {str(e)}")
+
+    def _resolve_fresh(self) -> Dict[str, Any]:
+        browser_binary = self.chrome_binary or self._which(CHROME_BINARY_NAMES)
+        browser_version = self._binary_version(browser_binary) if browser_binary else None
+
+        driver_path = self.driver_path or self._which(CHROMEDRIVER_NAMES)
+        driver_version = self._binary_version(driver_path) if driver_path else None
+        source = "local"
+
+        # A local driver whose major version does not match the browser will fail to launch
+        mismatched = (driver_version and browser_version and
+                      driver_version.split(".")[0] != browser_version.split(".")[0])
+        if mismatched:
+            logger.warning(f"chromedriver {driver_version} does not match Chrome {browser_version}")
+
+        if (not driver_path or mismatched) and not self.driver_path:
+            if self.offline:
+                logger.warning("Offline mode: skipping webdriver_manager driver lookup")
+            else:
+                try:
+                    from webdriver_manager.chrome import ChromeDriverManager
+                    driver_path = ChromeDriverManager().install()
+                    driver_version = self._binary_version(driver_path)
+                    source = "webdriver_manager"
+                except Exception as e:
+                    logger.warning(f"Could not use webdriver_manager: {str(e)}")
+
+        return {
+            "driver_path": driver_path,
+            "driver_version": driver_version,
+            "browser_binary": browser_binary,
+            "browser_version": browser_version,
+            "fingerprint": self._fingerprint(driver_path, browser_binary),
+            "resolved_at": time.time(),
+            "source": source,
+        }
+
+    def _is_valid(self, cached: Dict[str, Any]) -> bool:
+        if self.driver_path and cached.get("driver_path") != self.driver_path:
+            return False
+        if self.chrome_binary and cached.get("browser_binary") != self.chrome_binary:
+            return False
+        fingerprint = self._fingerprint(cached.get("driver_path"), cached.get("browser_binary"))
+        return bool(cached.get("driver_path")) and fingerprint == cached.get("fingerprint")
+
+    @staticmethod
+    def _fingerprint(*paths: Optional[str]) -> Optional[list]:
+        """Cheap identity of the binaries: path, size and mtime of each."""
+        fingerprint = []
+        for path in paths:
+            if not path:
+                fingerprint.append(None)
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                return None
+            fingerprint.append([os.path.realpath(path), st.st_size, int(st.st_mtime)])
+        return fingerprint
+
+    @staticmethod
+    def _which(names) -> Optional[str]:
+        for name in names:
+            path = shutil.which(name)
+            if path:
+                return path
+        return None
+
+    @staticmethod
+    def _binary_version(path: str) -> Optional[str]:
+        try:
+            output = subprocess.run([path, "--version"], capture_output=True,
+                                    text=True, timeout=10).stdout
+            match = re.search(r"(\d+(?:\.\d+)+)", output)
+            return match.group(1) if match else None
+        except Exception as e:
+            logger.warning(f"Could not determine version of {path}: {str(e)}")
+            return None
+
+    def _load_cache(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.cache_file, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable driver cache: {str(e)}")
+            return None
+
+    def _save_cache(self, resolution: Dict[str, Any]):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_file = f"{self.cache_file}.tmp"
+            with open(tmp_file, "w") as f:
+                json.dump({k: v for k, v in resolution.items() if k != "source"}, f)
+            os.replace(tmp_file, self.cache_file)
+        except Exception as e:
+            logger.warning(f"Could not write driver cache: {str(e)}")
@@ -0,0 +1,301 @@
+import base64
+import logging
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from wait_conditions import PageWaiter, parse_wait_spec, playwright_wait
+
+logger = logging.getLogger(__name__)
+
+ENGINES = ('selenium', 'playwright')
+SCREENSHOT_FORMATS = ('png', 'jpeg')
+# SCREENSHOT_QUALITY presets for JPEG frames
+QUALITY_PRESETS = {'low': 40, 'medium': 70, 'high': 90}
+
+# Key names accepted by press_key(), as used by the web client and Playwright
+KEY_NAMES = ('Enter', 'Backspace', 'Tab', 'Escape', 'ArrowUp', 'ArrowDown', 'ArrowLeft', 'ArrowRight',
+             'Delete', 'Home', 'End', 'PageUp', 'PageDown', 'F5')
+
+
+def screenshot_quality(value: Any) -> int:
+    """JPEG quality from a preset name ('low', 'medium', 'high') or a number between 1 and 100."""
+    if isinstance(value, str) and value.lower() in QUALITY_PRESETS:
+        return QUALITY_PRESETS[value.lower()]
+    try:
+        return max(1, min(100, int(value)))
+    except (TypeError, ValueError):
+        raise ValueError(f"Unknown screenshot quality: {value}. Use low, medium, high or 1-100")
+
+
+class BrowserEngine(ABC):
+    """
+    One browser page driven through a common interface, whatever automation library is behind it.
+
+    Coordinates are CSS pixels in the viewport, scripts are function bodies that read their
+    parameters from `arguments` (Selenium's convention), and waits take the specs accepted
+    by wait_conditions.parse_wait_spec().
+    """
+
+    name = ''
+
+    @abstractmethod
+    def navigate(self, url: str, timeout: float = 30) -> str:
+        """Load a URL and return the final URL."""
+
+    @abstractmethod
+    def current_url(self) -> str:
+        """URL of the current page."""
+
+    @abstractmethod
+    def click(self, x: float, y: float):
+        """Click at viewport coordinates."""
+
+    @abstractmethod
+    def type_text(self, text: str):
+        """Type text into the focused element."""
+
+    @abstractmethod
+    def press_key(self, key: str):
+        """Press one of KEY_NAMES."""
+
+    @abstractmethod
+    def screenshot(self, image_format: str = 'jpeg', quality: int = 70) -> bytes:
+        """Capture the viewport as PNG or JPEG bytes."""
+
+    @abstractmethod
+    def execute_script(self, script: str, *args) -> Any:
+        """Run a function body with the given arguments and return its result."""
+
+    @abstractmethod
+    def wait_for(self, wait) -> Dict[str, Any]:
+        """Wait for a page condition; returns condition, satisfied and elapsed."""
+
+    @abstractmethod
+    def close(self):
+        """Release the engine; attached engines leave the browser itself running."""
+
+
+class SeleniumEngine(BrowserEngine):
+    """
+    Engine on a Selenium Chrome driver.
+
+    Captures go through CDP Page.captureScreenshot so JPEG frames are encoded by Chrome
+    instead of as PNG through WebDriver; clicks are dispatched at exact coordinates with
+    Input.dispatchMouseEvent.
+    """
+
+    name = 'selenium'
+
+    def __init__(self, driver, waiter: Optional[PageWaiter] = None, owns_driver: bool = False):
+        self.driver = driver
+        self.waiter = waiter or PageWaiter(driver)
+        self.owns_driver = owns_driver
+
+    @classmethod
+    def launch(cls, width: int = 1280, height: int = 720, driver_cache_dir: Optional[str] = None,
+               offline: bool = False) -> 'SeleniumEngine':
+        """Start a headless Chrome of its own (used by the benchmark)."""
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+        from selenium.webdriver.chrome.service import Service
+        from driver_cache import DriverResolver
+
+        options = Options()
+        for argument in ("--headless=new", "--no-sandbox", "--disable-dev-shm-usage", "--disable-gpu",
+                         f"--window-size={width},{height}"):
+            options.add_argument(argument)
+        resolver = DriverResolver(cache_dir=driver_cache_dir, offline=offline)
+        resolution = resolver.resolve()
+        resolver.require_driver(resolution)
+        if resolution.get('browser_binary'):
+            options.binary_location = resolution['browser_binary']
+        service = Service(resolution['driver_path']) if resolution.get('driver_path') else Service()
+        return cls(webdriver.Chrome(service=service, options=options), owns_driver=True)
+
+    def navigate(self, url: str, timeout: float = 30) -> str:
+        self.driver.set_page_load_timeout(timeout)
+        self.driver.get(url)
+        return self.driver.current_url
+
+    def current_url(self) -> str:
+        return self.driver.current_url
+
+    def click(self, x: float, y: float):
+        for event_type in ('mousePressed', 'mouseReleased'):
+            self.driver.execute_cdp_cmd('Input.dispatchMouseEvent', {
+                'type': event_type, 'x': x, 'y': y, 'button': 'left', 'clickCount': 1
+            })
+
+    def type_text(self, text: str):
+        self.driver.execute_cdp_cmd('Input.insertText', {'text': text})
+
+    def press_key(self, key: str):
+        from selenium.webdriver.common.action_chains import ActionChains
+        from selenium.webdriver.common.keys import Keys
+
+        if key not in KEY_NAMES:
+            raise ValueError(f"Unsupported key: {key}")
+        # Keys constants use upper snake case: ArrowUp -> ARROW_UP, PageDown -> PAGE_DOWN
+        constant = ''.join('_' + c if c.isupper() and i else c for i, c in enumerate(key)).upper()
+        ActionChains(self.driver).send_keys(getattr(Keys, constant)).perform()
+
+    def screenshot(self, image_format: str = 'jpeg', quality: int = 70) -> bytes:
+        params = {'format': image_format, 'fromSurface': True}
+        if image_format == 'jpeg':
+            params['quality'] = quality
+        return base64.b64decode(self.driver.execute_cdp_cmd('Page.captureScreenshot', params)['data'])
+
+    def execute_script(self, script: str, *args) -> Any:
+        return self.driver.execute_script(script, *args)
+
+    def wait_for(self, wait) -> Dict[str, Any]:
+        return self.waiter.wait(parse_wait_spec(wait))
+
+    def close(self):
+        if self.owns_driver:
+            self.driver.quit()
+
+
+class PlaywrightEngine(BrowserEngine):
+    """
+    Engine on a Playwright (sync API) Chromium page.
+
+    The sync API only works on the thread that started it, so every call is forwarded to
+    a dedicated thread and the engine can be used from any thread, like the Selenium one.
+    attach() connects over CDP to a Chrome that is already running, e.g. the one a
+    HeadlessBrowser launched, and drives its first tab; launch() starts its own browser.
+    """
+
+    name = 'playwright'
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='playwright')
+        self._playwright = None
+        self._browser = None
+        self._owns_browser = False
+        self.page = None
+
+    @classmethod
+    def attach(cls, debugger_address: str) -> 'PlaywrightEngine':
+        """Connect to a running Chrome by its remote debugging address (host:port)."""
+        engine = cls()
+        try:
+            engine._call(engine._connect, debugger_address)
+        except Exception:
+            # Stop the Playwright driver and its thread before the caller falls back
+            engine._close_quietly()
+            raise
+        return engine
+
+    @classmethod
+    def launch(cls, width: int = 1280, height: int = 720, executable_path: Optional[str] = None) -> 'PlaywrightEngine':
+        """Start a headless Chromium of its own (used by the benchmark)."""
+        engine = cls()
+        try:
+            engine._call(engine._launch, width, height, executable_path)
+        except Exception:
+            engine._close_quietly()
+            raise
+        return engine
+
+    def _start(self):
+        from playwright.sync_api import sync_playwright
+        self._playwright = sync_playwright().start()
+
+    def _connect(self, debugger_address: str):
+        self._start()
+        self._browser = self._playwright.chromium.connect_over_cdp(f"http://{debugger_address}")
+        context = self._browser.contexts[0] if self._browser.contexts else self._browser.new_context()
+        self.page = context.pages[0] if context.pages else context.new_page()
+
+    def _launch(self, width: int, height: int, executable_path: Optional[str]):
+        self._start()
+        self._browser = self._playwright.chromium.launch(
+            headless=True, executable_path=executable_path, args=["--no-sandbox", "--disable-dev-shm-usage"]
+        )
+        self._owns_browser = True
+        self.page = self._browser.new_page(viewport={'width': width, 'height': height})
+
+    def _close_quietly(self):
+        try:
+            self.close()
+        except Exception as e:
+            logger.warning(f"Error stopping Playwright after a failed start: {str(e)}")
+
+    def _call(self, function, *args):
+        return self._executor.submit(function, *args).result()
+
+    def navigate(self, url: str, timeout: float = 30) -> str:
+        def run():
+            self.page.goto(url, timeout=timeout * 1000, wait_until='load')
+            return self.page.url
+        return self._call(run)
+
+    def current_url(self) -> str:
+        return self._call(lambda: self.page.url)
+
+    def click(self, x: float, y: float):
+        self._call(lambda: self.page.mouse.click(float(x), float(y)))
+
+    def type_text(self, text: str):
+        self._call(lambda: self.page.keyboard.type(text))
+
+    def press_key(self, key: str):
+        if key not in KEY_NAMES:
+            raise ValueError(f"Unsupported key: {key}")
+        self._call(lambda: self.page.keyboard.press(key))
+
+    def screenshot(self, image_format: str = 'jpeg', quality: int = 70) -> bytes:
+        options = {'type': image_format}
+        if image_format == 'jpeg':
+            options['quality'] = quality
+        return self._call(lambda: self.page.screenshot(**options))
+
+    def execute_script(self, script: str, *args) -> Any:
+        # Wrap the body so `arguments` behaves as it does under Selenium
+        wrapped = "(args) => (function() {\n" + script + "\n}).apply(null, args)"
+        return self._call(self.page.evaluate, wrapped, list(args))
+
+    def wait_for(self, wait) -> Dict[str, Any]:
+        spec = parse_wait_spec(wait)
+        return self._call(playwright_wait, self.page, spec)
+
+    def close(self):
+        def run():
+            # For an attached browser stopping Playwright only drops the CDP connection
+            if self._owns_browser and self._browser:
+                self._browser.close()
+            if self._playwright:
+                self._playwright.stop()
+        try:
+            self._call(run)
+        finally:
+            self._executor.shutdown(wait=False)
+
+
+def create_engine(name: str, driver=None, waiter: Optional[PageWaiter] = None) -> BrowserEngine:
+    """
+    Build the engine for a Selenium-launched Chrome.
+
+    Args:
+        name: One of ENGINES
+        driver: The Selenium driver of the browser to drive
+        waiter: PageWaiter with the browser's event log, for Selenium waits
+
+    Raises:
+        ValueError: For an unknown engine name
+    """
+    if name == 'selenium':
+        return SeleniumEngine(driver, waiter)
+    if name == 'playwright':
+        # Chrome started by chromedriver listens on a local debugging port for CDP clients
+        address = driver.capabilities.get('goog:chromeOptions', {}).get('debuggerAddress')
+        if not address:
+            raise RuntimeError("Chrome did not report a remote debugging address")
+        started = time.perf_counter()
+        engine = PlaywrightEngine.attach(address)
+        logger.info(f"Playwright attached to Chrome at {address} in {time.perf_counter() - started:.3f}s")
+        return engine
+    raise ValueError(f"Unknown browser engine: {name}. Supported: {', '.join(ENGINES)}")
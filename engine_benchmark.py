@@ -0,0 +1,127 @@
+"""
+Compare the Selenium and Playwright engines on the same local pages.
+
+Serves a few generated pages from a local HTTP server, then for each engine times
+navigation, PNG and JPEG viewport captures and a script call, and prints the median
+and 95th percentile per operation in milliseconds.
+
+    python engine_benchmark.py --iterations 20
+    python engine_benchmark.py --engines playwright --json
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from engine import ENGINES, PlaywrightEngine, SeleniumEngine
+
+PAGES = {
+    'text.html': "<h1>Article</h1>" + "<p>Lorem ipsum dolor sit amet, consectetur adipiscing elit.</p>" * 300,
+    'table.html': "<table border=1>" + "".join(
+        f"<tr><td>{row}</td><td>Row {row}</td><td>{row * 3.5:.2f}</td></tr>" for row in range(2000)
+    ) + "</table>",
+    'layout.html': "<style>div{display:inline-block;width:120px;height:80px;margin:4px;"
+                   "border-radius:8px;box-shadow:0 2px 6px #0004}</style>" + "".join(
+        f"<div style='background:linear-gradient(hsl({i * 7 % 360},70%,60%),hsl({i * 13 % 360},70%,40%))'></div>"
+        for i in range(400)
+    )
+}
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_pages(directory):
+    for name, body in PAGES.items():
+        with open(os.path.join(directory, name), 'w') as f:
+            f.write(f"<!doctype html><html><head><title>{name}</title></head><body>{body}</body></html>")
+    server = ThreadingHTTPServer(('127.0.0.1', 0), partial(_QuietHandler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def timed(function, iterations):
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        'median_ms': round(statistics.median(samples), 2),
+        'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 2)
+    }
+
+
+def benchmark_engine(name, base_url, iterations, width, height):
+    started = time.perf_counter()
+    engine = SeleniumEngine.launch(width, height) if name == 'selenium' else PlaywrightEngine.launch(width, height)
+    results = {'launch_ms': round((time.perf_counter() - started) * 1000, 2), 'pages': {}}
+    try:
+        for page in PAGES:
+            url = base_url + page
+            engine.navigate(url)  # Warm up caches before measuring
+            results['pages'][page] = {
+                'navigate': timed(lambda: engine.navigate(url), iterations),
+                'screenshot_png': timed(lambda: engine.screenshot('png'), iterations),
+                'screenshot_jpeg': timed(lambda: engine.screenshot('jpeg', 70), iterations),
+                'script': timed(lambda: engine.execute_script("return document.querySelectorAll('*').length;"),
+                                iterations)
+            }
+    finally:
+        engine.close()
+    return results
+
+
+def print_table(report):
+    operations = ('navigate', 'screenshot_png', 'screenshot_jpeg', 'script')
+    print(f"{'engine':<12}{'page':<14}" + "".join(f"{op + ' (med/p95)':>28}" for op in operations))
+    for name, results in report.items():
+        if 'error' in results:
+            print(f"{name:<12}error: {results['error']}")
+            continue
+        for page, timings in results['pages'].items():
+            cells = "".join(f"{timings[op]['median_ms']:>18.2f} / {timings[op]['p95_ms']:<7.2f}" for op in operations)
+            print(f"{name:<12}{page:<14}{cells}")
+        print(f"{name:<12}{'(launch)':<14}{results['launch_ms']:>18.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--engines', default=','.join(ENGINES), help="Comma-separated engines to run")
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        server = serve_pages(directory)
+        base_url = f"http://127.0.0.1:{server.server_address[1]}/"
+        report = {}
+        try:
+            for name in [engine.strip() for engine in args.engines.split(',') if engine.strip()]:
+                if name not in ENGINES:
+                    parser.error(f"Unknown engine: {name}")
+                try:
+                    report[name] = benchmark_engine(name, base_url, max(1, args.iterations), args.width, args.height)
+                except Exception as e:
+                    report[name] = {'error': str(e)}
+        finally:
+            server.shutdown()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_table(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,249 @@
+from typing import Dict, List
+
+# Keywords identifying stored form data types in field ids, names, placeholders and labels
+FIELD_KEYWORDS: Dict[str, List[str]] = {
+    'email': ['email', 'e-mail', 'mail'],
+    'name': ['name', 'username', 'user', 'fullname', 'full-name', 'first-name', 'firstname', 'last-name', 'lastname'],
+    'password': ['password', 'pass', 'pwd'],
+    'address': ['address', 'street', 'addr'],
+    'city': ['city', 'town'],
+    'zip': ['zip', 'zipcode', 'postal', 'postal-code'],
+    'phone': ['phone', 'telephone', 'tel', 'mobile'],
+}
+
+# Standard autocomplete tokens and input types that identify a field type outright
+AUTOCOMPLETE_TYPES: Dict[str, str] = {
+    'email': 'email',
+    'name': 'name', 'given-name': 'name', 'family-name': 'name', 'username': 'name', 'nickname': 'name',
+    'current-password': 'password', 'new-password': 'password',
+    'street-address': 'address', 'address-line1': 'address', 'address-line2': 'address',
+    'address-level2': 'city',
+    'postal-code': 'zip',
+    'tel': 'phone', 'tel-national': 'phone',
+}
+INPUT_TYPES: Dict[str, str] = {'email': 'email', 'password': 'password', 'tel': 'phone'}
+
+# Minimum score for a field to be filled automatically
+MIN_FIELD_SCORE = 3
+
+
+def field_keywords(types: List[str]) -> Dict[str, List[str]]:
+    """Keywords for the stored data types; types without predefined keywords match their own name."""
+    return {field_type: FIELD_KEYWORDS.get(field_type, [field_type.lower()]) for field_type in types}
+
+
+# Scores every visible, editable field against the keyword table in one pass.
+# Arguments: keywords {type: [keyword]}, autocomplete map, input type map, minimum score.
+# Returns [{selector, type, score}] for fields whose best type reaches the minimum score.
+FORM_DISCOVERY_SCRIPT = """
+var keywords = arguments[0];
+var autocompleteTypes = arguments[1];
+var inputTypes = arguments[2];
+var minScore = arguments[3];
+var skipped = {hidden: 1, submit: 1, button: 1, reset: 1, image: 1, checkbox: 1, radio: 1, file: 1, range: 1, color: 1};
+
+var normalize = function(value) {
+    return (value || '').toString().toLowerCase().replace(/[_\\s]+/g, '-');
+};
+
+var uniqueSelector = function(el) {
+    if (el.id && document.querySelectorAll('#' + CSS.escape(el.id)).length === 1) {
+        return '#' + CSS.escape(el.id);
+    }
+    var name = el.getAttribute('name');
+    if (name) {
+        var byName = el.tagName.toLowerCase() + '[name="' + name.replace(/"/g, '\\\\"') + '"]';
+        if (document.querySelectorAll(byName).length === 1) {
+            return byName;
+        }
+    }
+    var parts = [];
+    for (var node = el; node && node.nodeType === 1 && node !== document.documentElement; node = node.parentElement) {
+        var index = 1;
+        for (var sibling = node.previousElementSibling; sibling; sibling = sibling.previousElementSibling) {
+            if (sibling.tagName === node.tagName) {
+                index++;
+            }
+        }
+        parts.unshift(node.tagName.toLowerCase() + ':nth-of-type(' + index + ')');
+    }
+    return 'html > ' + parts.join(' > ');
+};
+
+var labelText = function(el) {
+    var texts = [];
+    if (el.labels) {
+        for (var i = 0; i < el.labels.length; i++) {
+            texts.push(el.labels[i].textContent);
+        }
+    }
+    texts.push(el.getAttribute('aria-label'));
+    return normalize(texts.join(' '));
+};
+
+var scoreValue = function(value, words, exactWeight, partialWeight) {
+    if (!value) {
+        return 0;
+    }
+    var best = 0;
+    for (var i = 0; i < words.length; i++) {
+        if (value === words[i]) {
+            return exactWeight;
+        }
+        if (value.indexOf(words[i]) !== -1) {
+            best = partialWeight;
+        }
+    }
+    return best;
+};
+
+var fields = [];
+var elements = document.querySelectorAll('input, textarea, select');
+for (var i = 0; i < elements.length; i++) {
+    var el = elements[i];
+    var type = (el.getAttribute('type') || '').toLowerCase();
+    if (skipped[type] || el.disabled || el.readOnly) {
+        continue;
+    }
+    var rect = el.getBoundingClientRect();
+    if (rect.width === 0 && rect.height === 0) {
+        continue;
+    }
+
+    var id = normalize(el.id);
+    var name = normalize(el.getAttribute('name'));
+    var placeholder = normalize(el.getAttribute('placeholder'));
+    var autocomplete = normalize(el.getAttribute('autocomplete')).split(' ').pop();
+    var label = labelText(el);
+
+    var bestType = null;
+    var bestScore = 0;
+    for (var fieldType in keywords) {
+        var words = keywords[fieldType];
+        var score = scoreValue(id, words, 5, 3)
+            + scoreValue(name, words, 5, 3)
+            + scoreValue(placeholder, words, 3, 2)
+            + scoreValue(label, words, 4, 2);
+        if (autocompleteTypes[autocomplete] === fieldType) {
+            score += 6;
+        }
+        if (inputTypes[type] === fieldType) {
+            score += 4;
+        }
+        if (score > bestScore) {
+            bestScore = score;
+            bestType = fieldType;
+        }
+    }
+    if (bestType && bestScore >= minScore) {
+        fields.push({selector: uniqueSelector(el), type: bestType, score: bestScore});
+    }
+}
+return fields;
+"""
+
+# Hash of the page's form structure: tag, type, name and id of every form and field in
+# document order (values are left out, so tokens and user input do not change it).
+# Used to key learned field mappings; a changed form gets a new signature.
+FORM_SIGNATURE_SCRIPT = """
+var parts = [];
+var elements = document.querySelectorAll('form, input, textarea, select');
+for (var i = 0; i < elements.length; i++) {
+    var el = elements[i];
+    parts.push([el.tagName, el.getAttribute('type') || '', el.getAttribute('name') || '', el.id || ''].join(':'));
+}
+var text = parts.join('|');
+var hash = 0x811c9dc5;
+for (var j = 0; j < text.length; j++) {
+    hash ^= text.charCodeAt(j);
+    hash = Math.imul(hash, 0x01000193) >>> 0;
+}
+return {signature: ('0000000' + hash.toString(16)).slice(-8) + '-' + elements.length, fields: elements.length};
+"""
+
+# Fills all fields and optionally submits in one call.
+# Arguments: [{selector, value}], submit flag, require-all flag.
+# With require-all, nothing is filled unless every selector resolves to an enabled
+# element; the result then has stale=true (used to validate cached mappings).
+# Values are set through the native setter and input/change events are dispatched, so
+# framework-bound inputs see the change. Without an enclosing form the last filled
+# element is returned as enter_target for a real Enter key press.
+FORM_FILL_SCRIPT = """
+var fields = arguments[0];
+var submit = arguments[1];
+var requireAll = arguments[2];
+
+var find = function(selector) {
+    if (selector.indexOf('//') === 0) {
+        return document.evaluate(selector, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    }
+    return document.querySelector(selector);
+};
+
+var setValue = function(el, value) {
+    var prototype = el.tagName === 'TEXTAREA' ? HTMLTextAreaElement.prototype
+        : el.tagName === 'SELECT' ? HTMLSelectElement.prototype : HTMLInputElement.prototype;
+    var descriptor = Object.getOwnPropertyDescriptor(prototype, 'value');
+    el.focus();
+    if (descriptor && descriptor.set) {
+        descriptor.set.call(el, value);
+    } else {
+        el.value = value;
+    }
+    el.dispatchEvent(new Event('input', {bubbles: true}));
+    el.dispatchEvent(new Event('change', {bubbles: true}));
+    el.blur();
+};
+
+var resolved = [];
+for (var k = 0; k < fields.length; k++) {
+    var target = null;
+    try {
+        target = find(fields[k].selector);
+    } catch (e) {
+        target = null;
+    }
+    if (requireAll && (!target || target.disabled)) {
+        return {results: {}, stale: true, submission: null, enter_target: null};
+    }
+    resolved.push(target);
+}
+
+var results = {};
+var filled = [];
+for (var i = 0; i < fields.length; i++) {
+    var field = fields[i];
+    try {
+        var el = resolved[i];
+        if (!el) {
+            results[field.selector] = 'not found';
+            continue;
+        }
+        setValue(el, field.value == null ? '' : String(field.value));
+        results[field.selector] = 'filled';
+        filled.push(el);
+    } catch (e) {
+        results[field.selector] = 'error: ' + (e && e.message || e);
+    }
+}
+
+var submission = null;
+var enterTarget = null;
+if (submit && filled.length) {
+    var form = null;
+    for (var j = 0; j < filled.length && !form; j++) {
+        form = filled[j].closest('form');
+    }
+    if (form) {
+        if (form.requestSubmit) {
+            form.requestSubmit();
+        } else {
+            form.submit();
+        }
+        submission = 'submitted';
+    } else {
+        enterTarget = filled[filled.length - 1];
+    }
+}
+return {results: results, stale: false, submission: submission, enter_target: enterTarget};
+"""
@@ -0,0 +1,677 @@
+import hashlib
+import http.client
+import json
+import logging
+import os
+import select
+import socket
+import threading
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple, Any
+from urllib.parse import urlsplit
+
+from url_filter import UrlFilter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+
+# Statuses a shared cache may store without explicit freshness information (RFC 9110 15.1)
+CACHEABLE_STATUSES = {200, 203, 204, 300, 301, 308, 404, 405, 410, 414, 501}
+
+# Headers that apply to a single connection and are never forwarded or stored
+HOP_BY_HOP_HEADERS = {
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization', 'proxy-connection',
+    'te', 'trailer', 'transfer-encoding', 'upgrade'
+}
+
+# Heuristic freshness for responses with Last-Modified only: 10% of their age, at most a day
+HEURISTIC_FRACTION = 0.1
+HEURISTIC_MAX_SECONDS = 24 * 3600
+
+CHUNK_SIZE = 64 * 1024
+
+
+def parse_cache_control(value: Optional[str]) -> Dict[str, Optional[str]]:
+    """Parse a Cache-Control header into {directive: argument or None}, directive names lowercased."""
+    directives = {}
+    for part in (value or '').split(','):
+        name, _, argument = part.strip().partition('=')
+        if name:
+            directives[name.strip().lower()] = argument.strip().strip('"') or None
+    return directives
+
+
+def _seconds(directives: Dict[str, Optional[str]], name: str) -> Optional[int]:
+    try:
+        return max(0, int(directives[name]))
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _http_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def _header(headers: List[List[str]], name: str) -> Optional[str]:
+    name = name.lower()
+    values = [value for key, value in headers if key.lower() == name]
+    return ', '.join(values) if values else None
+
+
+def freshness_lifetime(headers: List[List[str]]) -> Optional[float]:
+    """
+    Seconds a stored response stays fresh for a shared cache (RFC 9111 4.2.1).
+
+    Returns:
+        Lifetime in seconds, or None when the response carries no freshness information
+    """
+    directives = parse_cache_control(_header(headers, 'Cache-Control'))
+    for name in ('s-maxage', 'max-age'):
+        seconds = _seconds(directives, name)
+        if seconds is not None:
+            return seconds
+    date = _http_date(_header(headers, 'Date')) or time.time()
+    expires = _header(headers, 'Expires')
+    if expires is not None:
+        expires_at = _http_date(expires)
+        # An invalid Expires value (such as "0") means already expired
+        return max(0.0, expires_at - date) if expires_at is not None else 0.0
+    last_modified = _http_date(_header(headers, 'Last-Modified'))
+    if last_modified is not None and last_modified < date:
+        return min((date - last_modified) * HEURISTIC_FRACTION, HEURISTIC_MAX_SECONDS)
+    return None
+
+
+def is_storable(method: str, status: int, request_headers: Dict[str, str], headers: List[List[str]]) -> bool:
+    """Whether a shared cache may store this response (RFC 9111 3)."""
+    if method != 'GET' or status not in CACHEABLE_STATUSES:
+        return False
+    directives = parse_cache_control(_header(headers, 'Cache-Control'))
+    request_directives = parse_cache_control(request_headers.get('cache-control'))
+    if 'no-store' in directives or 'private' in directives or 'no-store' in request_directives:
+        return False
+    if (_header(headers, 'Vary') or '').strip() == '*':
+        return False
+    explicitly_shared = 'public' in directives or 's-maxage' in directives
+    # Authenticated and cookie-setting responses belong to one session unless marked shared
+    if 'authorization' in request_headers and not (explicitly_shared or 'must-revalidate' in directives):
+        return False
+    if _header(headers, 'Set-Cookie') is not None and not explicitly_shared:
+        return False
+    has_validator = _header(headers, 'ETag') is not None or _header(headers, 'Last-Modified') is not None
+    return freshness_lifetime(headers) is not None or has_validator
+
+
+class HttpDiskCache:
+    """
+    Size-bounded HTTP response cache on disk, shared by all browser sessions.
+
+    Each entry is a body file plus a JSON metadata file named after the SHA-256 of the
+    URL. One variant is kept per URL: the request header values named by Vary are stored
+    with the entry, and a lookup with different values is a miss that replaces it. The
+    in-memory index is ordered by last use; entries are evicted least recently used
+    first once the total body size exceeds max_bytes. The index is rebuilt from the
+    metadata files on startup, ordered by their modification time, which is touched on
+    every hit.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_CACHE_MAX_BYTES, max_entry_bytes: Optional[int] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            directory: Directory for the entry files, created if missing
+            max_bytes: Maximum total size of the stored bodies
+            max_entry_bytes: Largest body stored; defaults to an eighth of max_bytes
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes or max(1, max_bytes // 8)
+        self.lock = threading.Lock()
+        self._index: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.size = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def key(url: str) -> str:
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        base = os.path.join(self.directory, key)
+        return base + '.json', base + '.body'
+
+    def _load_index(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith('.tmp'):
+                os.unlink(path)
+                continue
+            if not name.endswith('.json'):
+                continue
+            key = name[:-5]
+            meta_path, body_path = self._paths(key)
+            try:
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+                meta['size'] = os.path.getsize(body_path)
+                entries.append((os.path.getmtime(meta_path), key, meta))
+            except (OSError, ValueError):
+                self._unlink(key)
+        for _, key, meta in sorted(entries, key=lambda entry: entry[0]):
+            self._index[key] = meta
+            self.size += meta['size']
+        self._evict()
+        logger.info(f"HTTP cache: {len(self._index)} entries, {self.size} bytes in {self.directory}")
+
+    def _unlink(self, key: str):
+        for path in self._paths(key):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def _evict(self):
+        while self.size > self.max_bytes and self._index:
+            key, meta = self._index.popitem(last=False)
+            self.size -= meta['size']
+            self.evictions += 1
+            self._unlink(key)
+
+    def lookup(self, url: str, request_headers: Dict[str, str]):
+        """
+        Find the stored response for a request.
+
+        Returns:
+            (metadata, open body file) or None; the caller closes the file. The file stays
+            readable even if the entry is evicted meanwhile.
+        """
+        key = self.key(url)
+        with self.lock:
+            meta = self._index.get(key)
+            if meta is None:
+                return None
+            if any(request_headers.get(name, '') != value for name, value in meta['vary'].items()):
+                return None
+            meta_path, body_path = self._paths(key)
+            try:
+                body = open(body_path, 'rb')
+                os.utime(meta_path)
+            except OSError:
+                self._index.pop(key)
+                self.size -= meta['size']
+                self._unlink(key)
+                return None
+            self._index.move_to_end(key)
+            return meta, body
+
+    def store(self, url: str, request_headers: Dict[str, str], status: int, reason: str,
+              headers: List[List[str]], body: bytes, response_time: float, initial_age: float):
+        """Store a response, replacing any earlier variant of the URL."""
+        if len(body) > self.max_entry_bytes:
+            return
+        vary = {}
+        for name in (_header(headers, 'Vary') or '').split(','):
+            name = name.strip().lower()
+            if name:
+                vary[name] = request_headers.get(name, '')
+        meta = {
+            'url': url,
+            'status': status,
+            'reason': reason,
+            'headers': headers,
+            'vary': vary,
+            'stored_at': response_time,
+            'initial_age': initial_age,
+            'size': len(body)
+        }
+        key = self.key(url)
+        meta_path, body_path = self._paths(key)
+        suffix = f'.{threading.get_ident()}.tmp'
+        try:
+            with open(body_path + suffix, 'wb') as f:
+                f.write(body)
+            with open(meta_path + suffix, 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+        except OSError as e:
+            logger.error(f"Error writing HTTP cache entry for {url}: {str(e)}")
+            return
+        with self.lock:
+            previous = self._index.pop(key, None)
+            if previous is not None:
+                self.size -= previous['size']
+            os.replace(body_path + suffix, body_path)
+            os.replace(meta_path + suffix, meta_path)
+            self._index[key] = meta
+            self.size += meta['size']
+            self._evict()
+
+    def refresh(self, url: str, headers: List[List[str]], response_time: float, initial_age: float):
+        """Merge the headers of a 304 response into the stored entry and restart its age."""
+        key = self.key(url)
+        with self.lock:
+            meta = self._index.get(key)
+            if meta is None:
+                return None
+            updated = {name.lower() for name, _ in headers if name.lower() != 'content-length'}
+            meta['headers'] = [[name, value] for name, value in meta['headers'] if name.lower() not in updated]
+            meta['headers'] += [[name, value] for name, value in headers if name.lower() in updated]
+            meta['stored_at'] = response_time
+            meta['initial_age'] = initial_age
+            meta_path, _ = self._paths(key)
+            try:
+                with open(meta_path, 'w', encoding='utf-8') as f:
+                    json.dump(meta, f)
+            except OSError as e:
+                logger.error(f"Error updating HTTP cache entry for {url}: {str(e)}")
+            return meta
+
+    def invalidate(self, url: str):
+        """Drop the entry for a URL, e.g. after an unsafe request to it."""
+        key = self.key(url)
+        with self.lock:
+            meta = self._index.pop(key, None)
+            if meta is not None:
+                self.size -= meta['size']
+                self._unlink(key)
+
+    def clear(self) -> int:
+        """Remove all entries; returns how many were removed."""
+        with self.lock:
+            count = len(self._index)
+            for key in list(self._index):
+                self._unlink(key)
+            self._index.clear()
+            self.size = 0
+            return count
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                'entries': len(self._index),
+                'size_bytes': self.size,
+                'max_bytes': self.max_bytes,
+                'evictions': self.evictions
+            }
+
+
+def current_age(meta: Dict[str, Any], now: float) -> float:
+    return meta['initial_age'] + max(0.0, now - meta['stored_at'])
+
+
+def initial_age(headers: List[List[str]], request_time: float, response_time: float) -> float:
+    """Age of a response when it was received (RFC 9111 4.2.3)."""
+    date = _http_date(_header(headers, 'Date'))
+    apparent_age = max(0.0, response_time - date) if date is not None else 0.0
+    try:
+        age = float(_header(headers, 'Age') or 0)
+    except ValueError:
+        age = 0.0
+    return max(apparent_age, age + (response_time - request_time))
+
+
+class CachingProxy:
+    """
+    Local forward proxy that serves plain HTTP through an HttpDiskCache.
+
+    All managed browsers are started with --proxy-server pointing here, so a resource
+    one session downloaded is served to the others from disk while it is fresh, and
+    revalidated with the origin (If-None-Match / If-Modified-Since) once it is stale.
+    HTTPS requests arrive as CONNECT tunnels and are relayed unchanged: their content
+    is encrypted end to end and cannot be cached without intercepting TLS.
+
+    With a UrlFilter, blocked requests are answered with 403 before reaching the origin
+    or the cache. Tunnelled HTTPS connections are only checked against domain rules,
+    since their URL is not visible to the proxy. Without a cache the proxy only filters.
+    """
+
+    def __init__(self, cache: Optional[HttpDiskCache], host: str = '127.0.0.1', port: int = 0,
+                 upstream_timeout: float = 30, url_filter: Optional[UrlFilter] = None):
+        """
+        Initialize the proxy and bind its port.
+
+        Args:
+            cache: Cache to serve from, or None to forward every request
+            host: Interface to listen on
+            port: Port to listen on; 0 picks a free one (see address)
+            upstream_timeout: Socket timeout for origin connections in seconds
+            url_filter: Blocklist applied to every request
+        """
+        self.cache = cache
+        self.url_filter = url_filter
+        self.upstream_timeout = upstream_timeout
+        self.stats_lock = threading.Lock()
+        self.counters = {
+            'requests': 0,
+            'hits': 0,
+            'revalidated': 0,
+            'misses': 0,
+            'uncacheable': 0,
+            'tunnels': 0,
+            'blocked': 0,
+            'errors': 0,
+            'bytes_from_cache': 0,
+            'bytes_from_origin': 0
+        }
+        self.server = ThreadingHTTPServer((host, port), _ProxyHandler)
+        self.server.daemon_threads = True
+        self.server.proxy = self
+        self.thread = None
+
+    @property
+    def address(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name="http-cache-proxy", daemon=True)
+        self.thread.start()
+        logger.info(f"HTTP cache proxy listening on {self.address}")
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def count(self, name: str, amount: int = 1):
+        with self.stats_lock:
+            self.counters[name] += amount
+
+    def stats(self) -> Dict[str, Any]:
+        """Request counters, hit ratios and cache size."""
+        with self.stats_lock:
+            counters = dict(self.counters)
+        lookups = counters['hits'] + counters['revalidated'] + counters['misses']
+        transferred = counters['bytes_from_cache'] + counters['bytes_from_origin']
+        counters['hit_ratio'] = round((counters['hits'] + counters['revalidated']) / lookups, 4) if lookups else 0.0
+        counters['byte_hit_ratio'] = round(counters['bytes_from_cache'] / transferred, 4) if transferred else 0.0
+        if self.cache:
+            counters.update(self.cache.stats())
+        counters['address'] = self.address
+        return counters
+
+
+class _ProxyHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        logger.debug(f"Proxy {self.address_string()}: {format % args}")
+
+    @property
+    def proxy(self) -> CachingProxy:
+        return self.server.proxy
+
+    def do_CONNECT(self):
+        self.proxy.count('requests')
+        self.proxy.count('tunnels')
+        host, _, port = self.path.rpartition(':')
+        if self._blocked(self.proxy.url_filter and self.proxy.url_filter.check_host(host.strip('[]'))):
+            return
+        try:
+            upstream = socket.create_connection((host, int(port)), timeout=self.proxy.upstream_timeout)
+        except (OSError, ValueError) as e:
+            self.proxy.count('errors')
+            self.send_error(502, f"Cannot connect to {self.path}: {e}")
+            return
+        self.send_response(200, 'Connection Established')
+        self.end_headers()
+        self.close_connection = True
+        sockets = [self.connection, upstream]
+        try:
+            while True:
+                readable, _, failed = select.select(sockets, [], sockets, self.proxy.upstream_timeout)
+                if failed or not readable:
+                    break
+                for source in readable:
+                    data = source.recv(CHUNK_SIZE)
+                    if not data:
+                        return
+                    (upstream if source is self.connection else self.connection).sendall(data)
+        except OSError:
+            pass
+        finally:
+            upstream.close()
+
+    def do_GET(self):
+        self._handle()
+
+    def do_HEAD(self):
+        self._handle()
+
+    def do_POST(self):
+        self._handle()
+
+    def do_PUT(self):
+        self._handle()
+
+    def do_PATCH(self):
+        self._handle()
+
+    def do_DELETE(self):
+        self._handle()
+
+    def do_OPTIONS(self):
+        self._handle()
+
+    def _blocked(self, rule: Optional[str]) -> bool:
+        if not rule:
+            return False
+        self.proxy.count('blocked')
+        body = f"Blocked by filter rule: {rule}".encode('utf-8')
+        self.send_response(403, 'Blocked')
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+        return True
+
+    def _request_headers(self) -> Dict[str, str]:
+        return {name.lower(): value for name, value in self.headers.items()}
+
+    def _handle(self):
+        proxy = self.proxy
+        proxy.count('requests')
+        url = self.path
+        parts = urlsplit(url)
+        if parts.scheme != 'http' or not parts.hostname:
+            self.send_error(400, "Only absolute http:// URLs are proxied")
+            return
+        request_headers = self._request_headers()
+        length = int(request_headers.get('content-length') or 0)
+        body = self.rfile.read(length) if length else None
+        if proxy.url_filter and self._blocked(proxy.url_filter.check(url, request_headers.get('referer'))):
+            return
+        if proxy.cache is None:
+            self._forward(parts, request_headers, body)
+            return
+
+        if self.command not in ('GET', 'HEAD'):
+            # Unsafe methods invalidate the stored response for the target URL (RFC 9111 4.4)
+            if self.command not in ('OPTIONS', 'TRACE'):
+                proxy.cache.invalidate(url)
+            proxy.count('uncacheable')
+            self._forward(parts, request_headers, body)
+            return
+
+        request_directives = parse_cache_control(request_headers.get('cache-control'))
+        if 'no-store' in request_directives:
+            self._forward(parts, request_headers, body)
+            return
+
+        found = proxy.cache.lookup(url, request_headers)
+        if found is None:
+            proxy.count('misses')
+            self._forward(parts, request_headers, body, store=self.command == 'GET')
+            return
+
+        meta, stored_body = found
+        try:
+            if self._is_fresh(meta, request_headers, request_directives):
+                proxy.count('hits')
+                self._serve_stored(meta, stored_body, request_headers)
+                return
+            self._revalidate(parts, request_headers, meta, stored_body)
+        finally:
+            stored_body.close()
+
+    @staticmethod
+    def _is_fresh(meta: Dict[str, Any], request_headers: Dict[str, str], request_directives) -> bool:
+        directives = parse_cache_control(_header(meta['headers'], 'Cache-Control'))
+        if 'no-cache' in directives or 'no-cache' in request_directives or 'no-cache' in request_headers.get('pragma', ''):
+            return False
+        lifetime = freshness_lifetime(meta['headers'])
+        if lifetime is None:
+            return False
+        age = current_age(meta, time.time())
+        max_age = _seconds(request_directives, 'max-age')
+        if max_age is not None and age > max_age:
+            return False
+        return age < lifetime
+
+    def _revalidate(self, parts, request_headers: Dict[str, str], meta: Dict[str, Any], stored_body):
+        proxy = self.proxy
+        conditional = {name: value for name, value in request_headers.items()
+                       if name not in ('if-none-match', 'if-modified-since')}
+        etag = _header(meta['headers'], 'ETag')
+        last_modified = _header(meta['headers'], 'Last-Modified')
+        if etag:
+            conditional['if-none-match'] = etag
+        if last_modified:
+            conditional['if-modified-since'] = last_modified
+        if not etag and not last_modified:
+            proxy.count('misses')
+            self._forward(parts, request_headers, None, store=self.command == 'GET')
+            return
+
+        request_time = time.time()
+        try:
+            connection, response = self._open_upstream(parts, 'GET', conditional, None)
+        except (OSError, http.client.HTTPException) as e:
+            proxy.count('errors')
+            self.send_error(502, f"Origin unreachable: {e}")
+            return
+        try:
+            if response.status == 304:
+                response.read()
+                response_time = time.time()
+                headers = [[name, value] for name, value in response.getheaders() if name.lower() not in HOP_BY_HOP_HEADERS]
+                refreshed = proxy.cache.refresh(self.path, headers, response_time,
+                                                initial_age(headers, request_time, response_time))
+                proxy.count('revalidated')
+                self._serve_stored(refreshed or meta, stored_body, request_headers)
+                return
+            proxy.count('misses')
+            # A HEAD relays no body, so its answer must not replace the stored entry
+            self._relay(response, request_headers, request_time, store=self.command == 'GET')
+        finally:
+            connection.close()
+
+    def _serve_stored(self, meta: Dict[str, Any], stored_body, request_headers: Dict[str, str]):
+        etag = _header(meta['headers'], 'ETag')
+        if_none_match = request_headers.get('if-none-match')
+        not_modified = bool(etag and if_none_match and (if_none_match.strip() == '*' or etag in [
+            tag.strip() for tag in if_none_match.split(',')]))
+        self.send_response(304 if not_modified else meta['status'], None if not_modified else meta['reason'])
+        for name, value in meta['headers']:
+            if name.lower() not in ('age', 'content-length'):
+                self.send_header(name, value)
+        self.send_header('Age', str(int(current_age(meta, time.time()))))
+        if not_modified:
+            self.end_headers()
+            return
+        self.send_header('Content-Length', str(meta['size']))
+        self.end_headers()
+        if self.command == 'HEAD':
+            return
+        sent = 0
+        while True:
+            chunk = stored_body.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            self.wfile.write(chunk)
+            sent += len(chunk)
+        self.proxy.count('bytes_from_cache', sent)
+
+    def _open_upstream(self, parts, method: str, headers: Dict[str, str], body: Optional[bytes]):
+        connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=self.proxy.upstream_timeout)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        connection.putrequest(method, path, skip_host=True, skip_accept_encoding=True)
+        if 'host' not in headers:
+            connection.putheader('Host', parts.netloc)
+        for name, value in headers.items():
+            if name not in HOP_BY_HOP_HEADERS:
+                connection.putheader(name, value)
+        connection.endheaders(body)
+        return connection, connection.getresponse()
+
+    def _forward(self, parts, request_headers: Dict[str, str], body: Optional[bytes], store: bool = False):
+        request_time = time.time()
+        try:
+            connection, response = self._open_upstream(parts, self.command, request_headers, body)
+        except (OSError, http.client.HTTPException) as e:
+            self.proxy.count('errors')
+            self.send_error(502, f"Origin unreachable: {e}")
+            return
+        try:
+            self._relay(response, request_headers, request_time, store)
+        finally:
+            connection.close()
+
+    def _relay(self, response, request_headers: Dict[str, str], request_time: float, store: bool):
+        """Send an origin response to the client, keeping a copy in the cache when it is storable."""
+        headers = [[name, value] for name, value in response.getheaders() if name.lower() not in HOP_BY_HOP_HEADERS]
+        # Conditional requests from the browser are answered by the origin and not stored
+        store = store and 'if-none-match' not in request_headers and 'if-modified-since' not in request_headers \
+            and is_storable('GET', response.status, request_headers, headers)
+        if not store and self.command in ('GET', 'HEAD') and self.proxy.cache is not None:
+            self.proxy.count('uncacheable')
+        length = _header(headers, 'Content-Length')
+        chunked = length is None and self.command != 'HEAD' and response.status not in (204, 304)
+
+        self.send_response(response.status, response.reason)
+        for name, value in headers:
+            self.send_header(name, value)
+        if chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        copy = [] if store else None
+        copied = 0
+        received = 0
+        while self.command != 'HEAD':
+            chunk = response.read1(CHUNK_SIZE) if hasattr(response, 'read1') else response.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            received += len(chunk)
+            if copy is not None:
+                copied += len(chunk)
+                if copied > self.proxy.cache.max_entry_bytes:
+                    copy = None
+                else:
+                    copy.append(chunk)
+            if chunked:
+                self.wfile.write(f"{len(chunk):x}\r\n".encode('ascii') + chunk + b"\r\n")
+            else:
+                self.wfile.write(chunk)
+        if chunked:
+            self.wfile.write(b"0\r\n\r\n")
+        self.proxy.count('bytes_from_origin', received)
+
+        if copy is not None:
+            response_time = time.time()
+            self.proxy.cache.store(self.path, request_headers, response.status, response.reason, headers,
+                                   b''.join(copy), response_time, initial_age(headers, request_time, response_time))
@@ -0,0 +1,153 @@
+import logging
+import time
+from collections import deque
+from typing import Dict, List, Optional, Any
+
+logger = logging.getLogger(__name__)
+
+# URL patterns (Network.setBlockedURLs wildcard syntax) for each blockable resource type
+RESOURCE_TYPE_PATTERNS = {
+    'image': ['*.png', '*.png?*', '*.jpg', '*.jpg?*', '*.jpeg', '*.jpeg?*', '*.gif', '*.gif?*',
+              '*.webp', '*.webp?*', '*.avif', '*.avif?*', '*.svg', '*.svg?*', '*.ico', '*.ico?*', '*.bmp'],
+    'font': ['*.woff', '*.woff?*', '*.woff2', '*.woff2?*', '*.ttf', '*.ttf?*', '*.otf', '*.otf?*', '*.eot', '*.eot?*'],
+    'media': ['*.mp4', '*.mp4?*', '*.webm', '*.webm?*', '*.mp3', '*.mp3?*', '*.ogg', '*.ogg?*',
+              '*.m4a', '*.wav', '*.m3u8', '*.m3u8?*', '*.mpd', '*.ts?*'],
+    'tracker': ['*google-analytics.com/*', '*googletagmanager.com/*', '*doubleclick.net/*',
+                '*googlesyndication.com/*', '*facebook.net/*', '*connect.facebook.com/*',
+                '*hotjar.com/*', '*segment.io/*', '*cdn.segment.com/*', '*scorecardresearch.com/*',
+                '*quantserve.com/*', '*criteo.com/*', '*adnxs.com/*', '*taboola.com/*', '*outbrain.com/*'],
+}
+DEFAULT_BLOCK_TYPES = ['image', 'font', 'media', 'tracker']
+
+# Typical transfer sizes per CDP resource type, used until real averages have been observed
+TYPICAL_TRANSFER_SIZES = {
+    'Image': 40_000,
+    'Font': 35_000,
+    'Media': 500_000,
+    'Script': 60_000,
+    'Stylesheet': 20_000,
+    'Other': 10_000,
+}
+
+
+class LiteMode:
+    """
+    Per-session lite rendering mode.
+
+    Heavy resources are blocked with CDP Network.setBlockedURLs, so Chrome never starts
+    those requests. Network events from the performance log are used to count what was
+    loaded and what was blocked on each page. Blocked requests never report a size, so
+    bytes saved are estimated from the average transfer size observed for the same
+    resource type while lite mode was off (or a typical size before any were observed).
+    """
+
+    def __init__(self, history_size: int = 20):
+        self.enabled = False
+        self.block_types: List[str] = list(DEFAULT_BLOCK_TYPES)
+        self.extra_patterns: List[str] = []
+        self.requests: Dict[str, str] = {}  # requestId -> resource type
+        self.observed_sizes: Dict[str, List[float]] = {}  # resource type -> [total bytes, count]
+        self.current_page: Optional[Dict[str, Any]] = None
+        self.pages = deque(maxlen=history_size)
+
+    def attach(self, event_log):
+        """Subscribe to the Network events needed for per-page accounting."""
+        event_log.subscribe('Network.requestWillBeSent', self._on_request)
+        event_log.subscribe('Network.loadingFinished', self._on_finished)
+        event_log.subscribe('Network.loadingFailed', self._on_failed)
+
+    def configure(self, enabled: bool, block_types: Optional[List[str]] = None,
+                  patterns: Optional[List[str]] = None) -> List[str]:
+        """
+        Update the lite mode settings.
+
+        Args:
+            enabled: Whether lite mode is on
+            block_types: Resource types to block (image, font, media, tracker)
+            patterns: Extra URL patterns to block
+
+        Returns:
+            The URL patterns to pass to Network.setBlockedURLs
+        """
+        if block_types is not None:
+            unknown = [t for t in block_types if t not in RESOURCE_TYPE_PATTERNS]
+            if unknown:
+                raise ValueError(f"Unknown resource types: {', '.join(unknown)}")
+            self.block_types = list(block_types)
+        if patterns is not None:
+            self.extra_patterns = [p for p in patterns if p]
+        self.enabled = enabled
+        return self.blocked_patterns()
+
+    def blocked_patterns(self) -> List[str]:
+        if not self.enabled:
+            return []
+        patterns = []
+        for block_type in self.block_types:
+            patterns.extend(RESOURCE_TYPE_PATTERNS[block_type])
+        patterns.extend(self.extra_patterns)
+        return patterns
+
+    def begin_page(self, url: str):
+        """Start accounting for a new top-level page load."""
+        self._finish_page()
+        self.requests.clear()
+        self.current_page = {
+            'url': url,
+            'started': time.time(),
+            'lite_mode': self.enabled,
+            'requests': 0,
+            'bytes_loaded': 0,
+            'blocked_requests': 0,
+            'blocked_by_type': {},
+            'estimated_bytes_saved': 0,
+        }
+
+    def _finish_page(self):
+        if self.current_page:
+            self.pages.append(self.current_page)
+            self.current_page = None
+
+    def _on_request(self, params):
+        self.requests[params.get('requestId')] = params.get('type', 'Other')
+        if self.current_page:
+            self.current_page['requests'] += 1
+
+    def _on_finished(self, params):
+        resource_type = self.requests.pop(params.get('requestId'), 'Other')
+        size = params.get('encodedDataLength', 0) or 0
+        if self.current_page:
+            self.current_page['bytes_loaded'] += size
+        if not self.enabled and size:
+            totals = self.observed_sizes.setdefault(resource_type, [0, 0])
+            totals[0] += size
+            totals[1] += 1
+
+    def _on_failed(self, params):
+        resource_type = params.get('type') or self.requests.get(params.get('requestId'), 'Other')
+        self.requests.pop(params.get('requestId'), None)
+        if params.get('blockedReason') != 'inspector' or not self.current_page:
+            return
+        page = self.current_page
+        page['blocked_requests'] += 1
+        page['blocked_by_type'][resource_type] = page['blocked_by_type'].get(resource_type, 0) + 1
+        page['estimated_bytes_saved'] += self._average_size(resource_type)
+
+    def _average_size(self, resource_type: str) -> int:
+        totals = self.observed_sizes.get(resource_type)
+        if totals and totals[1]:
+            return int(totals[0] / totals[1])
+        return TYPICAL_TRANSFER_SIZES.get(resource_type, TYPICAL_TRANSFER_SIZES['Other'])
+
+    def stats(self) -> Dict[str, Any]:
+        pages = list(self.pages)
+        if self.current_page:
+            pages.append(self.current_page)
+        return {
+            'enabled': self.enabled,
+            'block_types': self.block_types,
+            'patterns': self.extra_patterns,
+            'current_page': self.current_page,
+            'pages': pages,
+            'total_estimated_bytes_saved': sum(p['estimated_bytes_saved'] for p in pages),
+        }
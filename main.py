@@ -1,24 +1,70 @@
 # app.py
 from flask import Flask, render_template, request, jsonify, send_file, Response
 from browser_controller import BrowserController
+from wait_conditions import parse_wait_spec
 import io
 import time
 import threading
 import os
-import uuid # For unique task IDs
+import queue
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 
 # --- Global Variables & Configuration ---
 browser_controller = None
 app_ready = False
 
 browser_lock = threading.Lock() # Still useful for shared Python data structures if any
-command_queue = []
-command_event = threading.Event()
-
-# Store results of asynchronous tasks (like screenshots)
-# Key: task_id, Value: {'result': data, 'status': 'pending'/'done'/'error'}
-async_task_results = {}
-async_task_lock = threading.Lock() # To protect access to async_task_results
+# Tasks for the worker thread; each task dict carries a Future that the worker resolves
+command_queue = queue.Queue()
+
+# Applied after commands that do not name their own wait condition
+POST_ACTION_WAIT = {'condition': 'dom_stable', 'quiet_ms': 150, 'timeout': 5}
+# Screenshots and URL reads completed this recently are served again without a new capture
+READ_RESULT_TTL_SECONDS = 0.25
+
+# --- Read Task Coalescing ---
+class SingleFlight:
+    """
+    Coalesces identical read tasks (screenshots, URL lookups) into one worker task.
+
+    Callers asking for a key that is already queued or running share its Future instead
+    of queueing another task, and a successful result is reused for ttl seconds, so ten
+    clients polling /screenshot at once cost one capture. Failures are not cached.
+    """
+    def __init__(self, ttl=READ_RESULT_TTL_SECONDS):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._inflight = {} # key -> Future of the queued/running task
+        self._recent = {} # key -> (expires_at, completed Future)
+
+    def run(self, key, start):
+        """Return the Future for key, calling start(future) to queue the work only if none is shared."""
+        with self._lock:
+            recent = self._recent.get(key)
+            if recent and recent[0] > time.monotonic():
+                return recent[1]
+            future = self._inflight.get(key)
+            if future is not None:
+                return future
+            future = Future()
+            self._inflight[key] = future
+        # Registered outside the lock: the callback runs inline if the task is already done
+        future.add_done_callback(lambda done: self._complete(key, done))
+        start(future)
+        return future
+
+    def invalidate(self):
+        """Forget cached results, e.g. after a command changed the page."""
+        with self._lock:
+            self._recent.clear()
+
+    def _complete(self, key, future):
+        with self._lock:
+            self._inflight.pop(key, None)
+            if self.ttl > 0 and not future.cancelled() and future.exception() is None:
+                self._recent[key] = (time.monotonic() + self.ttl, future)
+
+read_tasks = SingleFlight()
 
 # --- Command Parsing (remains the same) ---
 def parse_simple_command(command_str: str):
@@ -48,7 +94,7 @@ def parse_simple_command(command_str: str):
 
 # --- Browser Worker Thread ---
 def browser_thread_worker():
-    global browser_controller, app_ready, async_task_results
+    global browser_controller, app_ready
     print("Browser worker thread started.")
     try:
         browser_controller = BrowserController(headless=True)
@@ -60,15 +106,11 @@ def browser_thread_worker():
         return
 
     while True:
-        command_event.wait()
-        command_event.clear()
-
-        if not command_queue:
-            continue
-
-        task = command_queue.pop(0) # task is a dict
+        task = command_queue.get() # task is a dict
         task_type = task.get('type', 'user_command') # 'user_command', 'get_screenshot', 'get_url'
-        task_id = task.get('id') # For async tasks like screenshot
+        future = task['future']
+        if not future.set_running_or_notify_cancel():
+            continue # The request timed out while the task was queued
 
         current_logs = []
 
@@ -87,7 +129,7 @@ def browser_thread_worker():
                 if not action_item or action_item.get("action") == "error":
                     error_message = action_item.get("message") if action_item else "Invalid command format."
                     current_logs.append(f"COMMAND PARSE ERROR: {error_message}")
-                    task['result_data'] = {"status": "error", "message": error_message, "logs": current_logs}
+                    future.set_result({"status": "error", "message": error_message, "logs": current_logs})
                 else:
                     action_type_parsed = action_item.get("action")
                     current_logs.append(f"Parsed action: {action_type_parsed}, Params: {action_item}")
@@ -100,32 +142,28 @@ def browser_thread_worker():
                     elif action_type_parsed == "press_key":
                         browser_controller.press_key(action_item.get("key"))
 
-                    time.sleep(0.2)
-                    browser_controller.page.wait_for_load_state("domcontentloaded", timeout=5000)
+                    outcome = browser_controller.wait_for(task.get('wait') or POST_ACTION_WAIT)
+                    current_logs.append(f"Wait '{outcome['condition']}' satisfied={outcome['satisfied']} in {outcome['elapsed']}s.")
                     current_logs.append(f"Action '{action_type_parsed}' executed successfully.")
-                    task['result_data'] = {"status": "success", "message": f"Action '{action_type_parsed}' processed.", "logs": current_logs}
+                    # Screenshots or URLs read before the action no longer describe the page
+                    read_tasks.invalidate()
+                    future.set_result({"status": "success", "message": f"Action '{action_type_parsed}' processed.", "logs": current_logs})
 
             elif task_type == 'get_screenshot':
-                img_bytes = browser_controller.take_screenshot_bytes()
-                with async_task_lock:
-                    async_task_results[task_id] = {'status': 'done', 'result': img_bytes}
-                # This task type doesn't need to set task['result_data'] for the main command loop
+                future.set_result(browser_controller.take_screenshot_bytes())
 
             elif task_type == 'get_url':
-                url = browser_controller.get_current_url()
-                with async_task_lock:
-                    async_task_results[task_id] = {'status': 'done', 'result': url}
-                # This task type doesn't need to set task['result_data'] for the main command loop
+                future.set_result(browser_controller.get_current_url())
 
         except Exception as e:
             error_msg = f"WORKER THREAD ERROR during '{task_type}': {str(e)}"
             print(error_msg)
             current_logs.append(error_msg)
             if task_type == 'user_command':
-                task['result_data'] = {"status": "error", "message": error_msg, "logs": current_logs}
-            elif task_id: # For async tasks like screenshot/url
-                with async_task_lock:
-                    async_task_results[task_id] = {'status': 'error', 'result': str(e)}
+                read_tasks.invalidate()
+                future.set_result({"status": "error", "message": error_msg, "logs": current_logs})
+            else: # Read tasks like screenshot/url
+                future.set_exception(e)
         # End of try-except block
 
 # --- Flask Application Setup (remains the same) ---
@@ -138,35 +176,18 @@ def index():
     return render_template('index.html')
 
 def _queue_and_wait_for_task_result(task_type, timeout=5):
-    """Helper to queue a task for the worker and wait for its result via async_task_results."""
+    """Helper to queue a read task for the worker (or join an identical one) and wait for its result."""
     if not app_ready:
         return None, "App not ready"
 
-    task_id = str(uuid.uuid4())
-    with async_task_lock:
-        async_task_results[task_id] = {'status': 'pending', 'result': None}
-
-    command_queue.append({'type': task_type, 'id': task_id})
-    command_event.set()
-
-    start_time = time.time()
-    while (time.time() - start_time) < timeout:
-        with async_task_lock:
-            task_data = async_task_results.get(task_id)
-            if task_data and task_data['status'] != 'pending':
-                # Clean up the result once fetched
-                result_to_return = task_data['result']
-                del async_task_results[task_id]
-                if task_data['status'] == 'error':
-                    return None, str(result_to_return) # Error message
-                return result_to_return, None # Data, no error
-        time.sleep(0.05) # Poll frequently
-
-    # Timeout
-    with async_task_lock: # Cleanup if timed out
-        if task_id in async_task_results:
-            del async_task_results[task_id]
-    return None, f"{task_type} task timed out after {timeout}s"
+    future = read_tasks.run(task_type, lambda f: command_queue.put({'type': task_type, 'future': f}))
+    try:
+        return future.result(timeout=timeout), None # Data, no error
+    except FutureTimeoutError:
+        # Not cancelled: other callers may be sharing the same task
+        return None, f"{task_type} task timed out after {timeout}s"
+    except Exception as e:
+        return None, str(e) # Error message
 
 
 @app.route('/screenshot')
@@ -220,23 +241,21 @@ def command_route():
     if not raw_command_str or not raw_command_str.strip():
          return jsonify({"status": "error", "message": "Command string cannot be empty."}), 400
 
-    # 'result_data' will be populated by the worker thread for user commands
-    task_info = {'type': 'user_command', 'command_string': raw_command_str, 'result_data': None}
+    try:
+        parse_wait_spec(data.get('wait'))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
 
-    command_queue.append(task_info)
-    command_event.set()
+    # The future is resolved by the worker thread with the command's result
+    task_info = {'type': 'user_command', 'command_string': raw_command_str, 'wait': data.get('wait'), 'future': Future()}
+    command_queue.put(task_info)
 
     processing_timeout_seconds = 60
-    start_time = time.time()
-    while task_info['result_data'] is None and (time.time() - start_time) < processing_timeout_seconds:
-        time.sleep(0.1)
-
-    if task_info['result_data']:
-        return jsonify(task_info['result_data'])
-    else:
-        try:
-            if task_info in command_queue: command_queue.remove(task_info)
-        except ValueError: pass
+    try:
+        return jsonify(task_info['future'].result(timeout=processing_timeout_seconds))
+    except FutureTimeoutError:
+        # Still queued: cancelled so the worker skips it. Already running: the result is dropped
+        task_info['future'].cancel()
         return jsonify({
             "status": "error", "message": "Command processing timed out on the server.",
             "logs": [f"Server timeout for command: '{raw_command_str}'"]
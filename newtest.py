@@ -3,8 +3,11 @@ import io
 import time
 import threading
 import os
+import queue
 import uuid
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 from playwright.sync_api import sync_playwright, Error as PlaywrightError
+from wait_conditions import parse_wait_spec, playwright_wait
 # Pillow (PIL) is used for placeholder images.
 # Make sure it's installed: pip install Pillow
 try:
@@ -21,16 +24,60 @@ app_ready = False # Flag to indicate if backend components are ready
 
 DEFAULT_VIEWPORT_WIDTH = 1280
 DEFAULT_VIEWPORT_HEIGHT = 720
-
-# For user commands and interaction commands
-command_queue = []
-command_event = threading.Event() # Signals worker that a new command/interaction or frame request is pending
-
-# For MJPEG stream - a way to get the latest frame from the worker
-latest_frame_bytes = None
-latest_frame_lock = threading.Lock() # Protects access to latest_frame_bytes
-# This event is set by gen_frames() to tell the worker to prioritize a frame capture
-request_new_frame_event = threading.Event()
+# Applied after commands and interactions that do not name their own wait condition
+POST_ACTION_WAIT = {'condition': 'dom_stable', 'quiet_ms': 150, 'timeout': 5}
+# Steps accepted by /interact/batch, and the most one request may carry
+BATCH_INTERACTION_ACTIONS = ('click_at_coords', 'type_direct', 'press_key', 'wait')
+MAX_BATCH_INTERACTIONS = 100
+
+# For user commands and interaction commands: each task dict carries a Future that the worker
+# resolves with the result
+command_queue = queue.Queue()
+
+# For MJPEG stream
+STREAM_FRAME_INTERVAL = 0.05 # Worker capture interval while /video_feed has viewers (~20 FPS)
+STREAM_KEEPALIVE_SECONDS = 5 # Resend the current frame this often on a static page
+
+# --- MJPEG Frame Hub ---
+class FrameHub:
+    """
+    Latest stream frame, shared between the browser worker and any number of MJPEG clients.
+
+    Each published frame gets the next sequence number. Clients block on a condition
+    variable until a frame newer than the one they last sent exists, so every real frame
+    costs one wakeup per viewer and no frame is sent twice. A frame identical to the
+    current one (a static page) is not republished.
+    """
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._frame = None
+        self._seq = 0
+        self.viewers = 0
+
+    def publish(self, frame):
+        with self._condition:
+            if frame == self._frame:
+                return self._seq
+            self._frame = frame
+            self._seq += 1
+            self._condition.notify_all()
+            return self._seq
+
+    def wait_for_frame(self, after_seq, timeout=None):
+        # Returns (seq, frame); seq equals after_seq if nothing newer arrived within the timeout
+        with self._condition:
+            self._condition.wait_for(lambda: self._seq > after_seq, timeout=timeout)
+            return self._seq, self._frame
+
+    def add_viewer(self):
+        with self._condition:
+            self.viewers += 1
+
+    def remove_viewer(self):
+        with self._condition:
+            self.viewers -= 1
+
+frame_hub = FrameHub()
 
 # --- Browser Controller Class ---
 class BrowserController:
@@ -174,6 +221,14 @@ class BrowserController:
         self.page.keyboard.type(text_to_type) # Playwright handles if nothing is focused gracefully (usually no-op)
         print(f"Typed into focused element: '{text_to_type}'")
 
+    def wait_for(self, wait):
+        if not self.page:
+            raise RuntimeError("Page not available for waiting.")
+        spec = parse_wait_spec(wait)
+        outcome = playwright_wait(self.page, spec)
+        print(f"Wait '{outcome['condition']}' satisfied={outcome['satisfied']} after {outcome['elapsed']}s")
+        return outcome
+
     def close(self):
         if self.browser:
             self.browser.close()
@@ -211,9 +266,55 @@ def parse_simple_command(command_str: str):
     else: return {"action": "error", "message": f"Unknown command action: '{action_type}'. Supported: navigate, type, click, press_key"}
     return action_item
 
+def validate_interaction(details, allowed=('click_at_coords', 'type_direct')):
+    # Returns an error message for a malformed interaction, or None
+    if not isinstance(details, dict) or 'action' not in details:
+        return "Invalid request: 'action' not found."
+    interaction_action = details.get('action')
+    if interaction_action not in allowed:
+        return f"Unknown interaction action: {interaction_action}"
+    if interaction_action == "click_at_coords":
+        if 'x' not in details or 'y' not in details:
+            return "Click action needs 'x' and 'y' coordinates."
+    elif interaction_action == "type_direct":
+        if 'text' not in details: # 'text' can be empty string, so check for key existence
+            return "Type_direct action needs 'text' field."
+    elif interaction_action == "press_key":
+        if not details.get('key'):
+            return "Press_key action needs a 'key' field."
+    elif interaction_action == "wait":
+        if not details.get('wait'):
+            return "Wait action needs a 'wait' condition."
+    try:
+        parse_wait_spec(details.get('wait'))
+    except ValueError as e:
+        return str(e)
+    return None
+
+def perform_interaction(details, current_logs):
+    # Runs one interaction in the worker thread, without the post-interaction settle step
+    interaction_action = details.get('action')
+    if interaction_action == "click_at_coords":
+        x = details.get("x")
+        y = details.get("y")
+        browser_controller.mouse_click_at_coordinates(x, y)
+        current_logs.append(f"Interaction: Clicked at ({float(x):.0f}, {float(y):.0f}).")
+    elif interaction_action == "type_direct":
+        text = details.get("text")
+        browser_controller.type_into_focused(text)
+        current_logs.append(f"Interaction: Typed directly '{text}'.")
+    elif interaction_action == "press_key":
+        browser_controller.press_key(details.get("key"))
+        current_logs.append(f"Interaction: Pressed key '{details.get('key')}'.")
+    elif interaction_action == "wait":
+        outcome = browser_controller.wait_for(details.get('wait'))
+        current_logs.append(f"Interaction: Wait '{outcome['condition']}' satisfied={outcome['satisfied']} in {outcome['elapsed']}s.")
+    else:
+        raise ValueError(f"Unknown interaction action: {interaction_action}")
+
 # --- Browser Worker Thread ---
 def browser_thread_worker():
-    global browser_controller, app_ready, latest_frame_bytes, latest_frame_lock, request_new_frame_event
+    global browser_controller, app_ready
     print("Browser worker thread started.")
     try:
         browser_controller = BrowserController(headless=True, viewport_width=DEFAULT_VIEWPORT_WIDTH, viewport_height=DEFAULT_VIEWPORT_HEIGHT)
@@ -230,33 +331,31 @@ def browser_thread_worker():
             img = Image.new('RGB', (DEFAULT_VIEWPORT_WIDTH, DEFAULT_VIEWPORT_HEIGHT), color='darkgrey')
             d = ImageDraw.Draw(img); d.text((30, 30), "Initializing Stream...", fill=(255, 255, 0))
             byte_arr = io.BytesIO(); img.save(byte_arr, format='JPEG')
-            with latest_frame_lock:
-                latest_frame_bytes = byte_arr.getvalue()
+            frame_hub.publish(byte_arr.getvalue())
         except Exception as e_pil_init:
             print(f"Error creating initial placeholder frame with PIL: {e_pil_init}")
-            with latest_frame_lock: latest_frame_bytes = b''
+            frame_hub.publish(b'')
     else:
         print("Pillow not installed, cannot create detailed placeholder images.")
-        with latest_frame_lock: latest_frame_bytes = b''
+        frame_hub.publish(b'')
 
     last_frame_capture_time = 0
     worker_frame_capture_interval = 0.2 # Target ~5 FPS for background capture
 
     while True:
-        if request_new_frame_event.is_set():
-            request_new_frame_event.clear()
-            command_event.set()
-
-        signaled_by_event = command_event.wait(timeout=worker_frame_capture_interval)
+        # Capture faster only while someone is watching the stream
+        capture_interval = STREAM_FRAME_INTERVAL if frame_hub.viewers else worker_frame_capture_interval
+        try:
+            task = command_queue.get(timeout=capture_interval)
+        except queue.Empty:
+            task = None
 
-        if signaled_by_event:
-            command_event.clear()
+        signaled_by_event = False
 
-        if command_queue:
-            task = command_queue.pop(0)
+        # Tasks whose request already timed out were cancelled and are skipped
+        if task is not None and task['future'].set_running_or_notify_cancel():
             task_type = task.get('type')
             current_logs = []
-            if 'result_data' not in task: task['result_data'] = None
 
             try:
                 if not browser_controller or not browser_controller.page:
@@ -272,7 +371,7 @@ def browser_thread_worker():
                     if not action_item or action_item.get("action") == "error":
                         error_message = action_item.get("message") if action_item else "Invalid command format."
                         current_logs.append(f"COMMAND PARSE ERROR: {error_message}")
-                        task['result_data'] = {"status": "error", "message": error_message, "logs": current_logs}
+                        result = {"status": "error", "message": error_message, "logs": current_logs}
                     else:
                         action_type_parsed = action_item.get("action")
                         current_logs.append(f"Parsed action: {action_type_parsed}, Params: {action_item}")
@@ -285,13 +384,12 @@ def browser_thread_worker():
                             browser_controller.click_element(action_item.get("selector"))
                         elif action_type_parsed == "press_key":
                             browser_controller.press_key(action_item.get("key"))
-                        # Common post-action steps
-                        time.sleep(0.3) # Allow page to react/load
-                        if browser_controller.page:
-                           browser_controller.page.wait_for_load_state("domcontentloaded", timeout=7000)
+                        # Common post-action steps: wait for the page to settle instead of a fixed sleep
+                        outcome = browser_controller.wait_for(task.get('wait') or POST_ACTION_WAIT)
+                        current_logs.append(f"Wait '{outcome['condition']}' satisfied={outcome['satisfied']} in {outcome['elapsed']}s.")
                         current_logs.append(f"Action '{action_type_parsed}' executed.")
-                        task['result_data'] = {"status": "success", "message": f"Action '{action_type_parsed}' processed.", "logs": current_logs}
-                        command_event.set() # Signal to update frame immediately
+                        result = {"status": "success", "message": f"Action '{action_type_parsed}' processed.", "logs": current_logs}
+                        signaled_by_event = True # Update frame immediately
 
                 elif task_type == 'interaction_command':
                     interaction_details = task.get('interaction_details', {})
@@ -299,44 +397,60 @@ def browser_thread_worker():
                     print(f"Worker: Dequeued interaction command: {interaction_action}")
                     current_logs.append(f"Processing interaction: {interaction_action}, Details: {interaction_details}")
 
-                    if interaction_action == "click_at_coords":
-                        x = interaction_details.get("x")
-                        y = interaction_details.get("y")
-                        browser_controller.mouse_click_at_coordinates(x, y)
-                        current_logs.append(f"Interaction: Clicked at ({float(x):.0f}, {float(y):.0f}).")
-                    elif interaction_action == "type_direct":
-                        text = interaction_details.get("text")
-                        browser_controller.type_into_focused(text)
-                        current_logs.append(f"Interaction: Typed directly '{text}'.")
-                    else:
-                        raise ValueError(f"Unknown interaction action: {interaction_action}")
+                    perform_interaction(interaction_details, current_logs)
                     # Common post-interaction steps
-                    time.sleep(0.2)
-                    if browser_controller.page:
-                        browser_controller.page.wait_for_load_state("domcontentloaded", timeout=5000)
+                    outcome = browser_controller.wait_for(interaction_details.get('wait') or POST_ACTION_WAIT)
+                    current_logs.append(f"Wait '{outcome['condition']}' satisfied={outcome['satisfied']} in {outcome['elapsed']}s.")
                     current_logs.append(f"Interaction action '{interaction_action}' executed.")
-                    task['result_data'] = {"status": "success", "message": f"Interaction '{interaction_action}' processed.", "logs": current_logs}
-                    command_event.set() # Signal for frame update
+                    result = {"status": "success", "message": f"Interaction '{interaction_action}' processed.", "logs": current_logs}
+                    signaled_by_event = True # Update frame immediately
+
+                elif task_type == 'interaction_batch':
+                    steps = task.get('steps', [])
+                    print(f"Worker: Dequeued interaction batch of {len(steps)} steps")
+                    step_results = []
+                    # Steps run back-to-back; the page is only settled once, after the last one
+                    for index, step in enumerate(steps):
+                        step_start = time.time()
+                        try:
+                            perform_interaction(step, current_logs)
+                            step_results.append({"index": index, "action": step.get('action'), "status": "success",
+                                                 "elapsed": round(time.time() - step_start, 3)})
+                        except Exception as e_step:
+                            current_logs.append(f"Step {index} ({step.get('action')}) failed: {e_step}")
+                            step_results.append({"index": index, "action": step.get('action'), "status": "error",
+                                                 "message": str(e_step), "elapsed": round(time.time() - step_start, 3)})
+                            if task.get('stop_on_error', True):
+                                break
+                    outcome = browser_controller.wait_for(task.get('wait') or POST_ACTION_WAIT)
+                    current_logs.append(f"Wait '{outcome['condition']}' satisfied={outcome['satisfied']} in {outcome['elapsed']}s.")
+                    failed = sum(1 for step_result in step_results if step_result['status'] != 'success')
+                    result = {
+                        "status": "success" if not failed and len(step_results) == len(steps) else "error",
+                        "message": f"{len(step_results) - failed} of {len(steps)} interactions succeeded.",
+                        "steps": step_results, "logs": current_logs
+                    }
+                    signaled_by_event = True # Update frame immediately
 
             except Exception as e:
                 command_details = task.get('command_string', task.get('interaction_details', 'N/A'))
                 error_msg = f"WORKER THREAD ERROR processing {task_type}: {str(e)}"
                 print(f"{error_msg} (Details: {command_details})")
                 current_logs.append(error_msg)
-                task['result_data'] = {"status": "error", "message": error_msg, "logs": current_logs}
+                result = {"status": "error", "message": error_msg, "logs": current_logs}
+            task['future'].set_result(result)
         # End of command/interaction processing
 
         # Capture and Update Screenshot Frame
         current_time = time.time()
-        should_capture_frame = signaled_by_event or (current_time - last_frame_capture_time > worker_frame_capture_interval)
+        should_capture_frame = signaled_by_event or (current_time - last_frame_capture_time >= capture_interval)
 
         if should_capture_frame:
             if app_ready and browser_controller and browser_controller.page:
                 try:
                     frame = browser_controller.take_screenshot_bytes()
                     if frame:
-                        with latest_frame_lock:
-                            latest_frame_bytes = frame
+                        frame_hub.publish(frame)
                         last_frame_capture_time = current_time
                     else:
                         print("Worker: take_screenshot_bytes returned empty/None.")
@@ -348,54 +462,41 @@ def browser_thread_worker():
                         img = Image.new('RGB', (DEFAULT_VIEWPORT_WIDTH, DEFAULT_VIEWPORT_HEIGHT), color='black')
                         d = ImageDraw.Draw(img); d.text((30, 30), "Browser Not Ready...", fill=(255, 0, 0))
                         byte_arr = io.BytesIO(); img.save(byte_arr, format='JPEG')
-                        with latest_frame_lock: latest_frame_bytes = byte_arr.getvalue()
+                        frame_hub.publish(byte_arr.getvalue())
                     except Exception: pass # Ignore if PIL fails for placeholder here
 # --- End of browser_thread_worker ---
 
 # --- MJPEG Frame Generator ---
 def gen_frames():
-    global latest_frame_bytes, latest_frame_lock, request_new_frame_event, app_ready
+    global app_ready
     client_addr = "unknown_client"
     try: client_addr = request.remote_addr
     except RuntimeError: pass # Not in request context (e.g. if called directly, though unlikely for a generator)
     # print(f"DEBUG: MJPEG stream requested by client: {client_addr}")
 
-    frame_error_count = 0
-    MAX_FRAME_ERRORS_BEFORE_SLEEP = 5
-
-    while True:
-        if not app_ready:
-            if Image and ImageDraw:
-                try:
-                    img = Image.new('RGB', (DEFAULT_VIEWPORT_WIDTH, DEFAULT_VIEWPORT_HEIGHT), color='black')
-                    d = ImageDraw.Draw(img); d.text((10,10), "SERVER NOT READY", fill=(255,0,0))
-                    byte_arr = io.BytesIO(); img.save(byte_arr, format='JPEG')
-                    frame_to_send_error = byte_arr.getvalue()
-                    yield (b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + frame_to_send_error + b'\r\n')
-                except Exception: yield (b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + b'' + b'\r\n') # Empty frame
-            else: yield (b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + b'' + b'\r\n') # Empty frame if PIL fails
-            time.sleep(1)
-            continue
-
-        request_new_frame_event.set() # Signal worker to prioritize a new frame
-        frame_to_send = None
-        timeout_get_frame = 0.15 # Max time to wait for a new frame from worker
-        start_get_frame = time.time()
-
-        # Try to get the latest frame from the worker
-        while time.time() - start_get_frame < timeout_get_frame:
-            with latest_frame_lock:
-                if latest_frame_bytes: # Check if there's any frame
-                    frame_to_send = latest_frame_bytes # Use the latest available
-                    break # Got a frame
-            time.sleep(0.01) # Small pause to not busy-wait too hard
-
-        if not frame_to_send: # If timeout and still no frame (or it was empty)
-            # This can happen if worker is very busy or screenshot failed silently
-            # print(f"gen_frames: Timeout or no frame from worker for {client_addr}. Using last known or placeholder.")
-            with latest_frame_lock: # Get whatever is there, even if old
-                frame_to_send = latest_frame_bytes
-            if not frame_to_send: # Still nothing
+    last_seq = 0
+    frame_hub.add_viewer()
+    try:
+        while True:
+            if not app_ready:
+                if Image and ImageDraw:
+                    try:
+                        img = Image.new('RGB', (DEFAULT_VIEWPORT_WIDTH, DEFAULT_VIEWPORT_HEIGHT), color='black')
+                        d = ImageDraw.Draw(img); d.text((10,10), "SERVER NOT READY", fill=(255,0,0))
+                        byte_arr = io.BytesIO(); img.save(byte_arr, format='JPEG')
+                        frame_to_send_error = byte_arr.getvalue()
+                        yield (b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + frame_to_send_error + b'\r\n')
+                    except Exception: yield (b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + b'' + b'\r\n') # Empty frame
+                else: yield (b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + b'' + b'\r\n') # Empty frame if PIL fails
+                time.sleep(1)
+                continue
+
+            # Blocks until the worker publishes a frame this client has not sent yet. On a static
+            # page the current frame is resent after the keepalive timeout, which also lets the
+            # server notice disconnected clients
+            last_seq, frame_to_send = frame_hub.wait_for_frame(last_seq, timeout=STREAM_KEEPALIVE_SECONDS)
+
+            if not frame_to_send: # No frame yet, or the worker could only publish an empty one
                 if Image and ImageDraw:
                     try:
                         img = Image.new('RGB', (DEFAULT_VIEWPORT_WIDTH, DEFAULT_VIEWPORT_HEIGHT), color='gray')
@@ -404,21 +505,11 @@ def gen_frames():
                         frame_to_send = byte_arr.getvalue()
                     except Exception: frame_to_send = b'' # Empty on error
                 else: frame_to_send = b'' # Empty if no PIL
-                # Avoid busy-looping if frames are consistently unavailable
-                frame_error_count += 1
-                if frame_error_count > MAX_FRAME_ERRORS_BEFORE_SLEEP:
-                    time.sleep(0.5) # Longer sleep if frames are failing
-                    frame_error_count = 0 # Reset counter
-                else:
-                    time.sleep(0.1)
-                # Fall through to yield whatever frame_to_send is now
-        else:
-            frame_error_count = 0 # Reset error count on successful frame
-
-        yield (b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + frame_to_send + b'\r\n')
-        time.sleep(0.05) # Target ~20 FPS from gen_frames, worker provides actual frames
-    # except GeneratorExit: print(f"DEBUG: MJPEG stream for client {client_addr} ended.")
-    # except Exception as e_gen: print(f"Error in gen_frames for client {client_addr}: {e_gen}")
+
+            yield (b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + frame_to_send + b'\r\n')
+    finally:
+        # Runs on GeneratorExit when the client disconnects
+        frame_hub.remove_viewer()
 # --- End of gen_frames ---
 
 # --- Flask Routes ---
@@ -462,21 +553,20 @@ def command_route():
     if not raw_command_str or not raw_command_str.strip():
          return jsonify({"status": "error", "message": "Command string cannot be empty."}), 400
 
-    task_info = {'type': 'user_command', 'command_string': raw_command_str, 'result_data': None}
-    command_queue.append(task_info)
-    command_event.set()
+    try:
+        parse_wait_spec(data.get('wait'))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
 
-    processing_timeout_seconds = 60
-    start_time = time.time()
-    while task_info['result_data'] is None and (time.time() - start_time) < processing_timeout_seconds:
-        time.sleep(0.1)
+    task_info = {'type': 'user_command', 'command_string': raw_command_str, 'wait': data.get('wait'), 'future': Future()}
+    command_queue.put(task_info)
 
-    if task_info['result_data']:
-        return jsonify(task_info['result_data'])
-    else:
-        # Try to remove from queue to prevent eventual processing if it's still there
-        try: command_queue.remove(task_info)
-        except ValueError: pass # Already processed or removed
+    processing_timeout_seconds = 60
+    try:
+        return jsonify(task_info['future'].result(timeout=processing_timeout_seconds))
+    except FutureTimeoutError:
+        # Still queued: cancelled so the worker skips it. Already running: the result is dropped
+        task_info['future'].cancel()
         return jsonify({
             "status": "error", "message": "Command processing timed out on the server.",
             "logs": [f"Server timeout for command: '{raw_command_str}'"]
@@ -512,38 +602,58 @@ def interact_route():
 
     data = request.get_json()
     # print(f"DEBUG: Flask: /interact payload: {data}")
-    if not data or 'action' not in data:
-        return jsonify({"status": "error", "message": "Invalid request: 'action' not found."}), 400
+    error_message = validate_interaction(data)
+    if error_message:
+        return jsonify({"status": "error", "message": error_message}), 400
 
     interaction_action = data.get('action')
-    task_info = {'type': 'interaction_command', 'interaction_details': data, 'result_data': None}
-
-    if interaction_action == "click_at_coords":
-        if 'x' not in data or 'y' not in data:
-            return jsonify({"status": "error", "message": "Click action needs 'x' and 'y' coordinates."}), 400
-    elif interaction_action == "type_direct":
-        if 'text' not in data: # 'text' can be empty string, so check for key existence
-            return jsonify({"status": "error", "message": "Type_direct action needs 'text' field."}), 400
-    else:
-        return jsonify({"status": "error", "message": f"Unknown interaction action: {interaction_action}"}), 400
-
-    command_queue.append(task_info)
-    command_event.set()
+    task_info = {'type': 'interaction_command', 'interaction_details': data, 'future': Future()}
+    command_queue.put(task_info)
 
     processing_timeout_seconds = 30 # Interactions should be quicker
-    start_time = time.time()
-    while task_info['result_data'] is None and (time.time() - start_time) < processing_timeout_seconds:
-        time.sleep(0.05)
-
-    if task_info['result_data']:
-        return jsonify(task_info['result_data'])
-    else:
-        try: command_queue.remove(task_info)
-        except ValueError: pass
+    try:
+        return jsonify(task_info['future'].result(timeout=processing_timeout_seconds))
+    except FutureTimeoutError:
+        task_info['future'].cancel()
         return jsonify({
             "status": "error", "message": "Interaction processing timed out on the server.",
             "logs": [f"Server timeout for interaction: '{interaction_action}' with details: {data}"]
         }), 504
+
+@app.route('/interact/batch', methods=['POST'])
+def interact_batch_route():
+    # Runs an ordered list of interactions in one worker task, settling the page once at the end
+    if not app_ready:
+        return jsonify({"status": "error", "message": "Backend browser services not ready."}), 503
+
+    data = request.get_json()
+    steps = data.get('steps') if isinstance(data, dict) else None
+    if not isinstance(steps, list) or not steps:
+        return jsonify({"status": "error", "message": "Invalid request: 'steps' must be a non-empty list."}), 400
+    if len(steps) > MAX_BATCH_INTERACTIONS:
+        return jsonify({"status": "error", "message": f"At most {MAX_BATCH_INTERACTIONS} steps per batch."}), 400
+    for index, step in enumerate(steps):
+        error_message = validate_interaction(step, allowed=BATCH_INTERACTION_ACTIONS)
+        if error_message:
+            return jsonify({"status": "error", "message": f"Step {index}: {error_message}"}), 400
+    try:
+        parse_wait_spec(data.get('wait'))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    task_info = {'type': 'interaction_batch', 'steps': steps, 'wait': data.get('wait'),
+                 'stop_on_error': data.get('stop_on_error', True), 'future': Future()}
+    command_queue.put(task_info)
+
+    processing_timeout_seconds = 120
+    try:
+        return jsonify(task_info['future'].result(timeout=processing_timeout_seconds))
+    except FutureTimeoutError:
+        task_info['future'].cancel()
+        return jsonify({
+            "status": "error", "message": "Interaction batch timed out on the server.",
+            "logs": [f"Server timeout for a batch of {len(steps)} interactions"]
+        }), 504
 # --- End of Flask Routes ---
 
 # --- Main Execution ---
@@ -0,0 +1,200 @@
+import logging
+import os
+import shutil
+import subprocess
+import threading
+import time
+import uuid
+from typing import Callable, List, Optional, Any
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Chrome's per-process lock files; a clone must not inherit them or Chrome refuses to start
+LOCK_FILES = {"SingletonLock", "SingletonSocket", "SingletonCookie", "lockfile"}
+TEMPLATE_MARKER = ".template_ready"
+RUN_LOCK_SUFFIX = ".lock"
+
+
+def _run_alive(lock_path: str) -> bool:
+    """Whether the run owning a lock file still holds it; released when the process exits."""
+    if fcntl is None:
+        # Without flock assume one server per profile root, so every other run is gone
+        return False
+    try:
+        with open(lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            fcntl.flock(f, fcntl.LOCK_UN)
+    except BlockingIOError:
+        return True
+    except OSError:
+        return False
+    return False
+
+
+class ProfileManager:
+    """
+    Pre-warmed template profile cloned per browser session.
+
+    The template is created once: Chrome is launched on it (paying the first-run cost),
+    optionally visits warm-up URLs or starts from an existing profile (e.g. one with
+    logged-in state), and is closed again. Each session then gets its own copy. Copies use
+    `cp --reflink=auto`, which is copy-on-write and near-instant on filesystems that
+    support it (btrfs, XFS) and an ordinary copy elsewhere. Clones are removed when their
+    session ends, and clones left behind by dead processes are collected on startup.
+
+    Clones are named after a token unique to this run rather than the process ID, which
+    repeats across container restarts (the server is usually PID 1). The run holds an
+    flock on `sessions/.<token>.lock` for its lifetime; a token whose lock is free
+    belongs to a process that is gone.
+    """
+
+    def __init__(self, root: str, launcher: Callable[[str], Any], warm_urls: Optional[List[str]] = None,
+                 template_source: Optional[str] = None):
+        """
+        Initialize the profile manager.
+
+        Args:
+            root: Directory holding the template and the session clones
+            launcher: Callable starting a browser on a profile directory; must return an object with navigate() and close()
+            warm_urls: URLs visited while building the template
+            template_source: Existing profile directory to seed the template from
+        """
+        self.root = root
+        self.template_dir = os.path.join(root, "template")
+        self.sessions_dir = os.path.join(root, "sessions")
+        self.launcher = launcher
+        self.warm_urls = warm_urls or []
+        self.template_source = template_source
+        self.lock = threading.Lock()
+        self._use_cp = shutil.which("cp") is not None and os.name == "posix"
+        os.makedirs(self.sessions_dir, exist_ok=True)
+
+        self.run_token = uuid.uuid4().hex[:12]
+        self._run_lock_path = os.path.join(self.sessions_dir, f".{self.run_token}{RUN_LOCK_SUFFIX}")
+        self._run_lock = open(self._run_lock_path, "w")
+        if fcntl is not None:
+            fcntl.flock(self._run_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def template_ready(self) -> bool:
+        return os.path.exists(os.path.join(self.template_dir, TEMPLATE_MARKER))
+
+    def ensure_template(self):
+        """Build and warm the template profile if it does not exist yet."""
+        with self.lock:
+            if self.template_ready():
+                return
+
+            started = time.perf_counter()
+            if os.path.exists(self.template_dir):
+                shutil.rmtree(self.template_dir, ignore_errors=True)
+            if self.template_source and os.path.isdir(self.template_source):
+                self._copy_tree(self.template_source, self.template_dir)
+            os.makedirs(self.template_dir, exist_ok=True)
+
+            browser = self.launcher(self.template_dir)
+            try:
+                for url in self.warm_urls:
+                    result = browser.navigate(url)
+                    if result.get('status') != 'success':
+                        logger.warning(f"Template warm-up visit failed for {url}: {result.get('message')}")
+            finally:
+                browser.close()
+
+            self._remove_lock_files(self.template_dir)
+            with open(os.path.join(self.template_dir, TEMPLATE_MARKER), "w") as f:
+                f.write(str(time.time()))
+            logger.info(f"Template profile built in {time.perf_counter() - started:.2f}s")
+
+    def clone(self) -> str:
+        """
+        Create a session profile from the template.
+
+        Returns:
+            Path of the new profile directory
+        """
+        self.ensure_template()
+        destination = os.path.join(self.sessions_dir, f"{self.run_token}-{uuid.uuid4().hex[:12]}")
+        started = time.perf_counter()
+        self._copy_tree(self.template_dir, destination)
+        self._remove_lock_files(destination)
+        marker = os.path.join(destination, TEMPLATE_MARKER)
+        if os.path.exists(marker):
+            os.remove(marker)
+        logger.info(f"Cloned profile {os.path.basename(destination)} in {(time.perf_counter() - started) * 1000:.0f}ms")
+        return destination
+
+    def release(self, path: Optional[str]):
+        """Delete a session clone once its browser has been closed."""
+        if not path or os.path.dirname(os.path.abspath(path)) != os.path.abspath(self.sessions_dir):
+            return
+        shutil.rmtree(path, ignore_errors=True)
+
+    def collect_garbage(self) -> int:
+        """
+        Remove clones whose owning run is gone (e.g. after a crash).
+
+        Returns:
+            Number of removed clones
+        """
+        live = {self.run_token}
+        names = os.listdir(self.sessions_dir)
+        for name in names:
+            if name.startswith(".") and name.endswith(RUN_LOCK_SUFFIX):
+                token = name[1:-len(RUN_LOCK_SUFFIX)]
+                if token == self.run_token:
+                    continue
+                lock_path = os.path.join(self.sessions_dir, name)
+                if _run_alive(lock_path):
+                    live.add(token)
+                else:
+                    try:
+                        os.remove(lock_path)
+                    except OSError:
+                        pass
+
+        removed = 0
+        for name in names:
+            # Clones of older versions are prefixed with a PID and have no lock file
+            if name.startswith(".") or name.split("-", 1)[0] in live:
+                continue
+            shutil.rmtree(os.path.join(self.sessions_dir, name), ignore_errors=True)
+            removed += 1
+        if removed:
+            logger.info(f"Removed {removed} stale profile clones")
+        return removed
+
+    def close(self):
+        """Give up this run's lock; call after its clones have been released."""
+        if self._run_lock.closed:
+            return
+        try:
+            os.remove(self._run_lock_path)
+        except OSError:
+            pass
+        self._run_lock.close()
+
+    def _copy_tree(self, source: str, destination: str):
+        if self._use_cp:
+            try:
+                subprocess.run(["cp", "-a", "--reflink=auto", source, destination],
+                               check=True, capture_output=True, timeout=300)
+                return
+            except Exception as e:
+                logger.warning(f"cp --reflink failed, falling back to a regular copy: {str(e)}")
+                shutil.rmtree(destination, ignore_errors=True)
+        shutil.copytree(source, destination, symlinks=True, ignore=shutil.ignore_patterns(*LOCK_FILES))
+
+    @staticmethod
+    def _remove_lock_files(directory: str):
+        for name in LOCK_FILES:
+            path = os.path.join(directory, name)
+            if os.path.lexists(path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
@@ -5,9 +5,12 @@ import os
 import time
 import base64
 import secrets
-from typing import List, Dict, Optional
+import zlib
+import itertools
+from contextlib import asynccontextmanager
+from typing import List, Dict, Optional, Any
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request, Response, Depends, HTTPException, status
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
@@ -15,6 +18,14 @@ from fastapi.security import HTTPBasic, HTTPBasicCredentials
 import uvicorn
 
 from browser import HeadlessBrowser
+from browser_pool import BrowserPool, FAILED
+from batch import BatchRunner, parse_batch_job
+from capture import CAPTURE_FORMATS, DEFAULT_TILE_HEIGHT, MIN_TILE_HEIGHT, MAX_TILE_HEIGHT
+from engine import ENGINES, SCREENSHOT_FORMATS, screenshot_quality
+from profiles import ProfileManager
+from http_cache import HttpDiskCache, CachingProxy
+from url_filter import UrlFilter
+from storage import PersistentStore, DEFAULT_DB_NAME
 
 # Configure logging
 logging.basicConfig(
@@ -32,7 +43,54 @@ AUTH_USERNAME = os.environ.get("AUTH_USERNAME", "admin")
 AUTH_PASSWORD = os.environ.get("AUTH_PASSWORD", "changeme")
 FPS_LIMIT = int(os.environ.get("FPS_LIMIT", "10"))
 SCREENSHOT_QUALITY = os.environ.get("SCREENSHOT_QUALITY", "medium")
+SCREENSHOT_FORMAT = os.environ.get("SCREENSHOT_FORMAT", "png").lower()
+BROWSER_ENGINE = os.environ.get("BROWSER_ENGINE", "selenium").lower()
 MAX_CONNECTIONS = int(os.environ.get("MAX_CONNECTIONS", "10"))
+MAX_SPECTATORS = int(os.environ.get("MAX_SPECTATORS", "500"))
+BROWSER_OFFLINE = os.environ.get("BROWSER_OFFLINE", "false").lower() == "true"
+DRIVER_CACHE_DIR = os.path.expanduser(os.environ["DRIVER_CACHE_DIR"]) if os.environ.get("DRIVER_CACHE_DIR") else None
+BROWSER_POOL_SIZE = int(os.environ.get("BROWSER_POOL_SIZE", "1"))
+POOL_WARMUP_CONCURRENCY = int(os.environ.get("POOL_WARMUP_CONCURRENCY", "2"))
+PROFILE_CLONING = os.environ.get("PROFILE_CLONING", "false").lower() == "true"
+PROFILE_ROOT = os.environ.get("PROFILE_ROOT") or os.path.join(os.getcwd(), "browser_profiles")
+PROFILE_TEMPLATE_SOURCE = os.environ.get("PROFILE_TEMPLATE_SOURCE") or None
+PROFILE_WARM_URLS = [url.strip() for url in os.environ.get("PROFILE_WARM_URLS", "").split(",") if url.strip()]
+HTTP_CACHE = os.environ.get("HTTP_CACHE", "false").lower() == "true"
+HTTP_CACHE_DIR = os.environ.get("HTTP_CACHE_DIR") or os.path.join(os.getcwd(), "http_cache")
+HTTP_CACHE_MAX_MB = int(os.environ.get("HTTP_CACHE_MAX_MB", "1024"))
+HTTP_CACHE_PORT = int(os.environ.get("HTTP_CACHE_PORT", "0"))
+BLOCKLISTS = [path.strip() for path in os.environ.get("BLOCKLISTS", "").split(",") if path.strip()]
+URL_FILTER = os.environ.get("URL_FILTER", "false").lower() == "true" or bool(BLOCKLISTS)
+STATE_DB_PATH = os.environ.get("STATE_DB_PATH") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", DEFAULT_DB_NAME)
+
+if BROWSER_ENGINE not in ENGINES:
+    logger.warning(f"Unknown BROWSER_ENGINE '{BROWSER_ENGINE}', using selenium")
+    BROWSER_ENGINE = "selenium"
+if SCREENSHOT_FORMAT not in SCREENSHOT_FORMATS:
+    logger.warning(f"Unknown SCREENSHOT_FORMAT '{SCREENSHOT_FORMAT}', using png")
+    SCREENSHOT_FORMAT = "png"
+try:
+    FRAME_QUALITY = screenshot_quality(SCREENSHOT_QUALITY)
+except ValueError as e:
+    logger.warning(f"{str(e)}; using medium")
+    FRAME_QUALITY = screenshot_quality("medium")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Bring browsers up in the background so the server can bind and answer health checks immediately."""
+    startup = None
+    if url_filter:
+        # Browsers start once the blocklists are compiled, so no page loads unfiltered
+        startup = asyncio.create_task(asyncio.to_thread(load_blocklists_and_warm_up))
+    else:
+        pool.warm_up()
+    yield
+    if startup:
+        await startup
+    await asyncio.to_thread(pool.close)
+    await asyncio.to_thread(store.close)
+    if http_proxy:
+        http_proxy.stop()
 
 # Initialize FastAPI app with optional docs
 app = FastAPI(
@@ -40,7 +98,8 @@ app = FastAPI(
     description="A web-based interface for interacting with a headless browser",
     version="1.0.0",
     docs_url="/api/docs" if DEBUG else None,
-    redoc_url="/api/redoc" if DEBUG else None
+    redoc_url="/api/redoc" if DEBUG else None,
+    lifespan=lifespan
 )
 
 # Security setup for basic auth
@@ -112,43 +171,170 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 # Setup Jinja2 templates
 templates = Jinja2Templates(directory="templates")
 
-# Create a headless browser instance
+# Create the browser pool; Chrome is launched in the background by the lifespan handler
 user_data_dir = os.path.join(os.getcwd(), "browser_data")
 os.makedirs(user_data_dir, exist_ok=True)
-browser = HeadlessBrowser(user_data_dir=user_data_dir)
+
+# Bookmarks and form data live in SQLite; mutations are committed by a background writer
+store = PersistentStore(STATE_DB_PATH)
+
+# Request blocklists, enforced by the local proxy
+url_filter = UrlFilter() if URL_FILTER else None
+
+# Local proxy all pooled browsers go through for the shared HTTP cache and the blocklists;
+# it must listen before they launch
+http_proxy = None
+if HTTP_CACHE or url_filter:
+    http_proxy = CachingProxy(
+        HttpDiskCache(HTTP_CACHE_DIR, HTTP_CACHE_MAX_MB * 1024 * 1024) if HTTP_CACHE else None,
+        port=HTTP_CACHE_PORT,
+        url_filter=url_filter
+    )
+    http_proxy.start()
+
+def load_blocklists_and_warm_up():
+    try:
+        url_filter.load(files=BLOCKLISTS)
+    except Exception as e:
+        logger.error(f"Error loading blocklists: {str(e)}")
+    pool.warm_up()
+
+def create_browser(index: int) -> HeadlessBrowser:
+    # Only the primary browser owns the stored data; with profile cloning the pool assigns each browser its own clone
+    return HeadlessBrowser(
+        user_data_dir=user_data_dir if index == 0 and not PROFILE_CLONING else None,
+        offline=BROWSER_OFFLINE,
+        driver_cache_dir=DRIVER_CACHE_DIR,
+        auto_start=False,
+        store=store if index == 0 else None,
+        proxy_server=http_proxy.address if http_proxy else None,
+        engine=BROWSER_ENGINE,
+        screenshot_format=SCREENSHOT_FORMAT,
+        screenshot_quality=FRAME_QUALITY
+    )
+
+def launch_template_browser(profile_dir: str) -> HeadlessBrowser:
+    return HeadlessBrowser(user_data_dir=profile_dir, offline=BROWSER_OFFLINE, driver_cache_dir=DRIVER_CACHE_DIR,
+                           proxy_server=http_proxy.address if http_proxy else None)
+
+profiles = None
+if PROFILE_CLONING:
+    profiles = ProfileManager(
+        PROFILE_ROOT,
+        launch_template_browser,
+        warm_urls=PROFILE_WARM_URLS,
+        template_source=PROFILE_TEMPLATE_SOURCE
+    )
+
+pool = BrowserPool(create_browser, size=BROWSER_POOL_SIZE, warmup_concurrency=POOL_WARMUP_CONCURRENCY, profiles=profiles)
+browser = pool.primary
+batch_runner = BatchRunner(pool)
+
+# Read-only viewer attached to the shared frame stream
+class SpectatorChannel:
+    """
+    Delivers frames to a single read-only viewer.
+
+    Only the most recent frame is kept: publishing never waits on the socket,
+    and a slow viewer simply skips the frames it could not keep up with.
+    """
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.pending: Optional[str] = None
+        self.ready = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def publish(self, message: str):
+        self.pending = message
+        self.ready.set()
+
+    async def run(self, on_error):
+        try:
+            while True:
+                await self.ready.wait()
+                self.ready.clear()
+                message, self.pending = self.pending, None
+                if message is None:
+                    continue
+                await self.websocket.send_text(message)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.info(f"Spectator stream ended: {str(e)}")
+            on_error(self.websocket)
 
 # WebSocket connection manager
 class ConnectionManager:
     def __init__(self):
         self.active_connections: List[WebSocket] = []
+        self.spectators: Dict[WebSocket, SpectatorChannel] = {}
         self.screenshot_task = None
         self.running = False
         self.frame_rate = FPS_LIMIT
         self.screenshot_interval = 1.0 / self.frame_rate
         self.max_connections = MAX_CONNECTIONS
+        self.max_spectators = MAX_SPECTATORS
         self.quality = SCREENSHOT_QUALITY
 
+    def _has_viewers(self) -> bool:
+        return bool(self.active_connections or self.spectators)
+
+    def _ensure_screenshot_task(self):
+        if not self.running and not self.screenshot_task:
+            self.running = True
+            self.screenshot_task = asyncio.create_task(self.send_screenshots())
+
+    def _stop_screenshot_task_if_idle(self):
+        if not self._has_viewers() and self.running:
+            self.running = False
+            if self.screenshot_task:
+                self.screenshot_task.cancel()
+                self.screenshot_task = None
+
     async def connect(self, websocket: WebSocket):
         # Check if we have too many connections
         if len(self.active_connections) >= self.max_connections:
             await websocket.close(code=1008, reason="Too many connections")
-            return
+            return False
             
         await websocket.accept()
         self.active_connections.append(websocket)
-        if not self.running and not self.screenshot_task:
-            self.running = True
-            self.screenshot_task = asyncio.create_task(self.send_screenshots())
+        self._ensure_screenshot_task()
+        return True
+
+    async def connect_spectator(self, websocket: WebSocket):
+        """Attach a read-only viewer to the shared screenshot stream."""
+        if len(self.spectators) >= self.max_spectators:
+            await websocket.close(code=1008, reason="Too many spectators")
+            return False
+
+        await websocket.accept()
+        channel = SpectatorChannel(websocket)
+        self.spectators[websocket] = channel
+        channel.task = asyncio.create_task(channel.run(self.disconnect))
+
+        # Give the new viewer the latest frame right away instead of waiting for the next capture
+        if browser.last_screenshot:
+            channel.publish(json.dumps({
+                "type": "screenshot",
+                "data": browser.last_screenshot,
+                "format": browser.last_screenshot_format,
+                "page_info": {"status": "success", "url": browser.current_url}
+            }))
+
+        self._ensure_screenshot_task()
+        return True
 
     def disconnect(self, websocket: WebSocket):
         if websocket in self.active_connections:
             self.active_connections.remove(websocket)
-        
-        if not self.active_connections and self.running:
-            self.running = False
-            if self.screenshot_task:
-                self.screenshot_task.cancel()
-                self.screenshot_task = None
+
+        channel = self.spectators.pop(websocket, None)
+        if channel and channel.task:
+            channel.task.cancel()
+
+        self._stop_screenshot_task_if_idle()
 
     async def send_personal_message(self, message: str, websocket: WebSocket):
         try:
@@ -169,23 +355,29 @@ class ConnectionManager:
         # Clean up disconnected websockets
         for ws in disconnected_ws:
             self.disconnect(ws)
+
+        # Spectators get the same serialized frame; each has its own writer task
+        for channel in list(self.spectators.values()):
+            channel.publish(message)
     
     async def send_screenshots(self):
         """Continuously send screenshots to all connected clients."""
         try:
             while self.running:
-                if not self.active_connections:
+                if not self._has_viewers():
                     await asyncio.sleep(0.1)
                     continue
                 
                 # Get new screenshot
                 try:
-                    screenshot = browser.get_screenshot()
+                    # Off the event loop: an action holding the browser lock during its wait would block it
+                    screenshot = await asyncio.to_thread(browser.get_screenshot)
                     if screenshot:
-                        page_info = browser.get_page_info()
+                        page_info = await asyncio.to_thread(browser.get_page_info)
                         message = {
                             "type": "screenshot",
                             "data": screenshot,
+                            "format": browser.last_screenshot_format,
                             "page_info": page_info
                         }
                         await self.broadcast(json.dumps(message))
@@ -212,7 +404,25 @@ async def get_index(request: Request, username: str = Depends(get_current_userna
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
-    return {"status": "ok", "browser_running": browser.is_running}
+    return {"status": "ok", "browser_running": browser.is_running, "ready": pool.is_ready()}
+
+@app.get("/health/live")
+async def liveness_check():
+    """Liveness probe: the process is up and serving requests."""
+    return {"status": "ok"}
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness probe: the primary browser has started. Reports pool warm-up progress, or the error if Chrome failed to start."""
+    pool_status = pool.status()
+    if pool.is_ready():
+        return {"status": "ready", "browser_running": browser.is_running, "pool": pool_status}
+    primary = pool_status["browsers"][0]
+    content = {"status": "starting", "browser_running": browser.is_running, "pool": pool_status}
+    if primary["state"] == FAILED:
+        content["status"] = "failed"
+        content["error"] = primary["error"] or "Browser failed to start"
+    return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content=content)
 
 # API endpoints
 @app.get("/api/status")
@@ -220,7 +430,12 @@ async def get_status(username: str = Depends(get_current_username)):
     """Get the browser status."""
     return {
         "status": "running" if browser.is_running else "fallback",
-        "url": browser.current_url
+        "url": browser.current_url,
+        "connections": len(manager.active_connections),
+        "spectators": len(manager.spectators),
+        "engine": browser.engine.name if browser.engine else BROWSER_ENGINE,
+        "screenshot_format": SCREENSHOT_FORMAT,
+        "startup_timings": browser.startup_timings
     }
 
 @app.get("/api/page-info")
@@ -233,11 +448,131 @@ async def get_page_html(username: str = Depends(get_current_username)):
     """Get the HTML source of the current page."""
     return browser.get_page_html()
 
+PAGE_HTML_CHUNK_SIZE = 64 * 1024
+
+def _stream_html(html: str, compress: bool):
+    """Yield the page HTML in chunks, gzip-compressed when the client accepts it."""
+    data = html.encode("utf-8")
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    for offset in range(0, len(data), PAGE_HTML_CHUNK_SIZE):
+        chunk = data[offset:offset + PAGE_HTML_CHUNK_SIZE]
+        if compressor:
+            chunk = compressor.compress(chunk)
+        if chunk:
+            yield chunk
+    if compressor:
+        yield compressor.flush()
+
+@app.get("/api/page-html/stream")
+async def stream_page_html(request: Request, username: str = Depends(get_current_username)):
+    """Stream the HTML source of the current page as text/html, gzip-compressed if accepted."""
+    result = await asyncio.to_thread(browser.get_page_html)
+    if result.get("status") != "success":
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content=result)
+
+    compress = "gzip" in request.headers.get("accept-encoding", "")
+    headers = {"Content-Encoding": "gzip", "Vary": "Accept-Encoding"} if compress else {"Vary": "Accept-Encoding"}
+    return StreamingResponse(_stream_html(result["html"], compress), media_type="text/html; charset=utf-8", headers=headers)
+
+async def _stream_batch(job: Dict[str, Any]):
+    async for result in batch_runner.run(job):
+        yield json.dumps(result) + "\n"
+
+@app.post("/api/batch")
+async def run_batch(job: Dict[str, Any], username: str = Depends(get_current_username)):
+    """
+    Load many URLs across the pool's batch browsers and stream one NDJSON result per URL as each completes.
+
+    Body: {"urls": [...], "extract": ["title", "url", "text", "html", "screenshot"], "selectors": [...],
+    "concurrency": 4, "timeout": 30, "retries": 1, "wait": "network_idle"}. The last line is a summary with "done": true.
+    """
+    try:
+        job = parse_batch_job(job)
+    except (ValueError, TypeError) as e:
+        return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content={"status": "error", "message": str(e)})
+    if pool.batch_capacity() == 0:
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            content={"status": "error", "pool": pool.status()["counts"],
+                                     "message": "No batch browsers ready (batch jobs need BROWSER_POOL_SIZE of 2 or more)"})
+    return StreamingResponse(_stream_batch(job), media_type="application/x-ndjson")
+
+async def _closing(chunks):
+    """Iterate a blocking generator in a thread and close it there, also when the client disconnects."""
+    try:
+        while True:
+            chunk = await asyncio.to_thread(next, chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        await asyncio.to_thread(chunks.close)
+
+def _ndjson(items):
+    for item in items:
+        yield json.dumps(item) + "\n"
+
+@app.get("/api/screenshot/full")
+async def full_page_screenshot(output: str = "tiles", format: str = "png", quality: int = 80,
+                               tile_height: int = DEFAULT_TILE_HEIGHT, username: str = Depends(get_current_username)):
+    """
+    Capture the whole page, beyond the viewport.
+
+    output=tiles streams NDJSON: a header line with the page size and tile count, then one line per
+    tile ({index, y, width, height, format, data}) as each is captured. output=png streams a single
+    stitched PNG that is encoded tile by tile.
+    """
+    if output not in ("tiles", "png") or format not in CAPTURE_FORMATS:
+        return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST,
+                            content={"status": "error", "message": f"output must be tiles or png, format one of {', '.join(CAPTURE_FORMATS)}"})
+    tile_height = min(max(tile_height, MIN_TILE_HEIGHT), MAX_TILE_HEIGHT)
+    size = await asyncio.to_thread(browser.get_capture_size)
+    if size["status"] != "success":
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content=size)
+    if output == "png":
+        return StreamingResponse(_closing(browser.iter_full_page_png(size, tile_height)), media_type="image/png")
+    header = {**size, "tiles": -(-size["height"] // tile_height), "tile_height": tile_height}
+    tiles = browser.iter_full_page_tiles(size, format, quality, tile_height)
+    return StreamingResponse(_closing(_ndjson(itertools.chain([header], tiles))), media_type="application/x-ndjson")
+
+@app.get("/api/export/pdf")
+async def export_pdf(landscape: bool = False, scale: float = 1.0, username: str = Depends(get_current_username)):
+    """Stream the current page as PDF, read from the browser in chunks."""
+    result = await asyncio.to_thread(browser.start_pdf_export, {"landscape": landscape, "scale": scale})
+    if result["status"] != "success":
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content=result)
+    return StreamingResponse(_closing(browser.iter_pdf(result["handle"])), media_type="application/pdf",
+                             headers={"Content-Disposition": 'inline; filename="page.pdf"'})
+
+@app.post("/api/execute-scripts")
+async def execute_scripts(scripts: List[Dict[str, Any]], stop_on_error: bool = False, username: str = Depends(get_current_username)):
+    """Run a list of {script, args} items in one driver call, returning a result or error per item."""
+    return await asyncio.to_thread(browser.execute_scripts, scripts, stop_on_error)
+
+@app.get("/api/dom-snapshot")
+async def get_dom_snapshot(filter: str = "all", username: str = Depends(get_current_username)):
+    """Get the page structure as interned strings plus flat node and layout arrays (filter: all, visible, interactive)."""
+    return await asyncio.to_thread(browser.get_dom_snapshot, filter)
+
+@app.get("/api/dom-diffs")
+async def get_dom_diffs(since: str = None, limit: int = 500, username: str = Depends(get_current_username)):
+    """Get DOM mutations since a cursor; reset=true means the full HTML must be fetched again."""
+    return await asyncio.to_thread(browser.get_dom_diffs, since, limit)
+
 @app.get("/api/history")
 async def get_history(limit: int = None, username: str = Depends(get_current_username)):
     """Get the browsing history."""
     return browser.get_history(limit)
 
+@app.get("/api/history/visits")
+async def get_history_visits(limit: int = 50, cursor: str = None, username: str = Depends(get_current_username)):
+    """Get persistent visit history, most recent first, paginated with a cursor."""
+    return await asyncio.to_thread(browser.get_history_visits, limit, cursor)
+
+@app.get("/api/history/search")
+async def search_history(q: str, limit: int = 50, username: str = Depends(get_current_username)):
+    """Full-text search over visited page titles and URLs."""
+    return await asyncio.to_thread(browser.search_history, q, limit)
+
 @app.post("/api/history/clear")
 async def clear_history(username: str = Depends(get_current_username)):
     """Clear browsing history."""
@@ -248,6 +583,11 @@ async def get_bookmarks(folder: str = None, username: str = Depends(get_current_
     """Get all bookmarks, optionally filtered by folder."""
     return browser.get_bookmarks(folder)
 
+@app.get("/api/bookmarks/search")
+async def search_bookmarks(q: str = "", folder: str = None, limit: int = 50, username: str = Depends(get_current_username)):
+    """Search bookmarks by title and URL (token and prefix matching)."""
+    return browser.search_bookmarks(q, folder, limit)
+
 @app.post("/api/bookmarks/add")
 async def add_bookmark(url: str = None, title: str = None, folder: str = None, username: str = Depends(get_current_username)):
     """Add a bookmark."""
@@ -268,6 +608,16 @@ async def clear_cookies(domain: str = None, username: str = Depends(get_current_
     """Clear cookies for a domain or all domains."""
     return browser.clear_cookies(domain)
 
+@app.get("/api/cookies/export")
+async def export_cookies(domain: str = None, username: str = Depends(get_current_username)):
+    """Export cookies (optionally for one domain) for import into another session."""
+    return browser.export_cookies(domain)
+
+@app.post("/api/cookies/import")
+async def import_cookies(cookies: List[Dict[str, Any]], username: str = Depends(get_current_username)):
+    """Import a list of cookies, e.g. from /api/cookies/export."""
+    return browser.import_cookies(cookies)
+
 @app.get("/api/form-data")
 async def get_form_data(field: str = None, username: str = Depends(get_current_username)):
     """Get stored form data."""
@@ -283,10 +633,77 @@ async def clear_form_data(field: str = None, username: str = Depends(get_current
     """Clear stored form data."""
     return browser.clear_form_data(field)
 
+@app.get("/api/form/mappings")
+async def get_autofill_mappings(domain: str = None, username: str = Depends(get_current_username)):
+    """Get the field mappings learned by fill_form, per domain and form signature."""
+    return browser.get_autofill_mappings(domain)
+
+@app.post("/api/form/mappings/clear")
+async def clear_autofill_mappings(domain: str = None, username: str = Depends(get_current_username)):
+    """Forget learned field mappings for a domain, or all of them."""
+    return browser.clear_autofill_mappings(domain)
+
 @app.post("/api/form/fill")
-async def fill_form(form_data: Dict[str, str] = None, submit: bool = False, username: str = Depends(get_current_username)):
-    """Fill a form on the current page."""
-    return browser.fill_form(form_data, submit)
+async def fill_form(form_data: Dict[str, str] = None, submit: bool = False, wait: str = None, username: str = Depends(get_current_username)):
+    """Fill a form on the current page. wait is a condition name or JSON spec applied after submitting."""
+    return await asyncio.to_thread(browser.fill_form, form_data, submit, wait=wait)
+
+@app.post("/api/navigate")
+async def navigate(url: str, wait: str = None, username: str = Depends(get_current_username)):
+    """Navigate to a URL, optionally waiting for a condition (name or JSON spec) afterwards."""
+    return await asyncio.to_thread(browser.navigate, url, wait)
+
+@app.post("/api/wait")
+async def wait_for(wait: str = "load", username: str = Depends(get_current_username)):
+    """Wait for a page condition, given as a name or a JSON spec, e.g. {"condition": "selector_visible", "selector": "#results"}."""
+    return await asyncio.to_thread(browser.wait_for, wait)
+
+@app.get("/api/http-cache")
+async def get_http_cache_stats(username: str = Depends(get_current_username)):
+    """Get hit ratios and size of the shared HTTP cache."""
+    if not http_proxy or not http_proxy.cache:
+        return {"status": "error", "message": "HTTP cache is disabled (set HTTP_CACHE=true)"}
+    return {"status": "success", **http_proxy.stats()}
+
+@app.post("/api/http-cache/clear")
+async def clear_http_cache(username: str = Depends(get_current_username)):
+    """Remove all entries from the shared HTTP cache."""
+    if not http_proxy or not http_proxy.cache:
+        return {"status": "error", "message": "HTTP cache is disabled (set HTTP_CACHE=true)"}
+    removed = await asyncio.to_thread(http_proxy.cache.clear)
+    return {"status": "success", "removed": removed}
+
+@app.get("/api/blocklist")
+async def get_blocklist_stats(username: str = Depends(get_current_username)):
+    """Get blocklist rule counts, matcher build time, match latency and blocked-request counts."""
+    if not url_filter:
+        return {"status": "error", "message": "URL filter is disabled (set BLOCKLISTS or URL_FILTER=true)"}
+    return {"status": "success", **url_filter.stats()}
+
+@app.post("/api/blocklist")
+async def update_blocklist(rules: List[str] = None, enabled: bool = True, reload: bool = False,
+                           username: str = Depends(get_current_username)):
+    """Enable or disable the blocklist, replace its custom rules (JSON list of rule lines) or re-read the list files."""
+    if not url_filter:
+        return {"status": "error", "message": "URL filter is disabled (set BLOCKLISTS or URL_FILTER=true)"}
+    url_filter.enabled = enabled
+    if rules is not None or reload:
+        await asyncio.to_thread(url_filter.load, None, rules)
+    return {"status": "success", **url_filter.stats()}
+
+@app.get("/api/lite-mode")
+async def get_lite_mode(username: str = Depends(get_current_username)):
+    """Get lite mode settings and bytes saved per page."""
+    return browser.get_lite_mode_stats()
+
+@app.post("/api/lite-mode")
+async def set_lite_mode(enabled: bool = True, block_types: str = None, patterns: str = None, username: str = Depends(get_current_username)):
+    """Enable or disable lite mode. block_types and patterns are comma-separated lists."""
+    return browser.set_lite_mode(
+        enabled,
+        block_types.split(",") if block_types else None,
+        patterns.split(",") if patterns else None
+    )
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
@@ -298,7 +715,9 @@ async def websocket_endpoint(websocket: WebSocket):
         await websocket.close(code=1008, reason="Rate limit exceeded")
         return
     
-    await manager.connect(websocket)
+    if not await manager.connect(websocket):
+        return
+    dom_diff_task = None
     try:
         while True:
             data = await websocket.receive_text()
@@ -309,7 +728,7 @@ async def websocket_endpoint(websocket: WebSocket):
                 # Process different message types
                 if action_type == "navigate":
                     url = message.get("url")
-                    result = browser.navigate(url)
+                    result = await asyncio.to_thread(browser.navigate, url, wait=message.get("wait"))
                     await websocket.send_text(json.dumps({
                         "type": "navigate_result",
                         "result": result
@@ -318,7 +737,7 @@ async def websocket_endpoint(websocket: WebSocket):
                 elif action_type == "click":
                     x = message.get("x")
                     y = message.get("y")
-                    result = browser.click(x, y)
+                    result = await asyncio.to_thread(browser.click, x, y, wait=message.get("wait"))
                     await websocket.send_text(json.dumps({
                         "type": "click_result",
                         "result": result
@@ -326,7 +745,7 @@ async def websocket_endpoint(websocket: WebSocket):
                 
                 elif action_type == "type":
                     text = message.get("text")
-                    result = browser.type_text(text)
+                    result = await asyncio.to_thread(browser.type_text, text, wait=message.get("wait"))
                     await websocket.send_text(json.dumps({
                         "type": "type_result",
                         "result": result
@@ -334,7 +753,7 @@ async def websocket_endpoint(websocket: WebSocket):
                 
                 elif action_type == "key":
                     key = message.get("key")
-                    result = browser.press_key(key)
+                    result = await asyncio.to_thread(browser.press_key, key, wait=message.get("wait"))
                     await websocket.send_text(json.dumps({
                         "type": "key_result",
                         "result": result
@@ -343,7 +762,7 @@ async def websocket_endpoint(websocket: WebSocket):
                 elif action_type == "scroll":
                     x = message.get("x", 0)
                     y = message.get("y", 0)
-                    result = browser.scroll(x, y)
+                    result = await asyncio.to_thread(browser.scroll, x, y, wait=message.get("wait"))
                     await websocket.send_text(json.dumps({
                         "type": "scroll_result",
                         "result": result
@@ -352,7 +771,7 @@ async def websocket_endpoint(websocket: WebSocket):
                 elif action_type == "scroll_to_position":
                     x = message.get("x", 0)
                     y = message.get("y", 0)
-                    result = browser.scroll_to_position(x, y)
+                    result = await asyncio.to_thread(browser.scroll_to_position, x, y, wait=message.get("wait"))
                     await websocket.send_text(json.dumps({
                         "type": "scroll_to_position_result",
                         "result": result
@@ -363,33 +782,40 @@ async def websocket_endpoint(websocket: WebSocket):
                     start_y = message.get("startY")
                     end_x = message.get("endX")
                     end_y = message.get("endY")
-                    result = browser.drag(start_x, start_y, end_x, end_y)
+                    result = await asyncio.to_thread(browser.drag, start_x, start_y, end_x, end_y, wait=message.get("wait"))
                     await websocket.send_text(json.dumps({
                         "type": "drag_result",
                         "result": result
                     }))
                 
                 elif action_type == "back":
-                    result = browser.go_back()
+                    result = await asyncio.to_thread(browser.go_back, wait=message.get("wait"))
                     await websocket.send_text(json.dumps({
                         "type": "back_result",
                         "result": result
                     }))
                 
                 elif action_type == "forward":
-                    result = browser.go_forward()
+                    result = await asyncio.to_thread(browser.go_forward, wait=message.get("wait"))
                     await websocket.send_text(json.dumps({
                         "type": "forward_result",
                         "result": result
                     }))
                 
                 elif action_type == "refresh":
-                    result = browser.refresh()
+                    result = await asyncio.to_thread(browser.refresh, wait=message.get("wait"))
                     await websocket.send_text(json.dumps({
                         "type": "refresh_result",
                         "result": result
                     }))
                 
+                elif action_type == "wait_for":
+                    result = await asyncio.to_thread(browser.wait_for, message.get("wait"))
+                    await websocket.send_text(json.dumps({
+                        "type": "wait_for_result",
+                        "result": result
+                    }))
+                
                 elif action_type == "execute_script":
                     script = message.get("script")
                     args = message.get("args", [])
@@ -399,6 +825,15 @@ async def websocket_endpoint(websocket: WebSocket):
                         "result": result
                     }))
                 
+                elif action_type == "execute_scripts":
+                    scripts = message.get("scripts", [])
+                    stop_on_error = message.get("stop_on_error", False)
+                    result = browser.execute_scripts(scripts, stop_on_error)
+                    await websocket.send_text(json.dumps({
+                        "type": "execute_scripts_result",
+                        "result": result
+                    }))
+                
                 elif action_type == "get_element_info":
                     x = message.get("x")
                     y = message.get("y")
@@ -410,11 +845,12 @@ async def websocket_endpoint(websocket: WebSocket):
                 
                 elif action_type == "get_screenshot":
                     force_new = message.get("forceNew", False)
-                    screenshot = browser.get_screenshot(force_new=force_new)
+                    screenshot = await asyncio.to_thread(browser.get_screenshot, force_new=force_new)
                     if screenshot:
                         await websocket.send_text(json.dumps({
                             "type": "screenshot_result",
-                            "data": screenshot
+                            "data": screenshot,
+                            "format": browser.last_screenshot_format
                         }))
                     else:
                         await websocket.send_text(json.dumps({
@@ -422,6 +858,37 @@ async def websocket_endpoint(websocket: WebSocket):
                             "error": "Failed to get screenshot"
                         }))
                 
+                elif action_type == "get_full_page_tiles":
+                    image_format = message.get("format", "png")
+                    tile_height = min(max(int(message.get("tile_height", DEFAULT_TILE_HEIGHT)), MIN_TILE_HEIGHT), MAX_TILE_HEIGHT)
+                    size = await asyncio.to_thread(browser.get_capture_size)
+                    if size["status"] != "success" or image_format not in CAPTURE_FORMATS:
+                        await websocket.send_text(json.dumps({
+                            "type": "full_page_tiles_done",
+                            "result": size if size["status"] != "success" else {"status": "error", "message": f"Unsupported format: {image_format}"}
+                        }))
+                        continue
+                    # Each tile is sent as soon as it is captured
+                    tiles = browser.iter_full_page_tiles(size, image_format, message.get("quality", 80), tile_height)
+                    count = 0
+                    result = {**size}
+                    try:
+                        while True:
+                            tile = await asyncio.to_thread(next, tiles, None)
+                            if tile is None:
+                                break
+                            if tile.get("status") == "error":
+                                result = {"status": "error", "message": tile["message"]}
+                                break
+                            count += 1
+                            await websocket.send_text(json.dumps({"type": "full_page_tile", **tile}))
+                    finally:
+                        await asyncio.to_thread(tiles.close)
+                    await websocket.send_text(json.dumps({
+                        "type": "full_page_tiles_done",
+                        "result": {**result, "tiles": count}
+                    }))
+                
                 elif action_type == "set_frame_rate":
                     fps = message.get("fps", 10)
                     # Limit fps to reasonable range (1-30)
@@ -460,6 +927,16 @@ async def websocket_endpoint(websocket: WebSocket):
                         "result": result
                     }))
                 
+                elif action_type == "search_bookmarks":
+                    query = message.get("query", "")
+                    folder = message.get("folder")
+                    limit = message.get("limit", 50)
+                    result = browser.search_bookmarks(query, folder, limit)
+                    await websocket.send_text(json.dumps({
+                        "type": "search_bookmarks_result",
+                        "result": result
+                    }))
+                
                 elif action_type == "get_cookies":
                     domain = message.get("domain")
                     result = browser.get_cookies(domain)
@@ -476,10 +953,29 @@ async def websocket_endpoint(websocket: WebSocket):
                         "result": result
                     }))
                 
+                elif action_type == "export_cookies":
+                    domain = message.get("domain")
+                    result = browser.export_cookies(domain)
+                    await websocket.send_text(json.dumps({
+                        "type": "export_cookies_result",
+                        "result": result
+                    }))
+                
+                elif action_type == "import_cookies":
+                    cookies = message.get("cookies", [])
+                    result = browser.import_cookies(cookies)
+                    await websocket.send_text(json.dumps({
+                        "type": "import_cookies_result",
+                        "result": result
+                    }))
+                
                 elif action_type == "add_form_data":
                     field = message.get("field")
                     value = message.get("value")
-                    result = browser.add_form_data(field, value)
+                    if isinstance(field, str) and isinstance(value, str):
+                        result = browser.add_form_data(field, value)
+                    else:
+                        result = {"status": "error", "message": "field and value must be strings"}
                     await websocket.send_text(json.dumps({
                         "type": "add_form_data_result",
                         "result": result
@@ -504,12 +1000,29 @@ async def websocket_endpoint(websocket: WebSocket):
                 elif action_type == "fill_form":
                     form_data = message.get("form_data")
                     submit = message.get("submit", False)
-                    result = browser.fill_form(form_data, submit)
+                    result = await asyncio.to_thread(browser.fill_form, form_data, submit, wait=message.get("wait"))
                     await websocket.send_text(json.dumps({
                         "type": "fill_form_result",
                         "result": result
                     }))
                 
+                elif action_type == "set_lite_mode":
+                    enabled = message.get("enabled", True)
+                    block_types = message.get("block_types")
+                    patterns = message.get("patterns")
+                    result = browser.set_lite_mode(enabled, block_types, patterns)
+                    await websocket.send_text(json.dumps({
+                        "type": "set_lite_mode_result",
+                        "result": result
+                    }))
+                
+                elif action_type == "get_lite_mode":
+                    result = browser.get_lite_mode_stats()
+                    await websocket.send_text(json.dumps({
+                        "type": "get_lite_mode_result",
+                        "result": result
+                    }))
+                
                 elif action_type == "get_history":
                     limit = message.get("limit")
                     result = browser.get_history(limit)
@@ -518,6 +1031,24 @@ async def websocket_endpoint(websocket: WebSocket):
                         "result": result
                     }))
                 
+                elif action_type == "get_history_visits":
+                    limit = message.get("limit", 50)
+                    cursor = message.get("cursor")
+                    result = await asyncio.to_thread(browser.get_history_visits, limit, cursor)
+                    await websocket.send_text(json.dumps({
+                        "type": "get_history_visits_result",
+                        "result": result
+                    }))
+                
+                elif action_type == "search_history":
+                    query = message.get("query", "")
+                    limit = message.get("limit", 50)
+                    result = await asyncio.to_thread(browser.search_history, query, limit)
+                    await websocket.send_text(json.dumps({
+                        "type": "search_history_result",
+                        "result": result
+                    }))
+                
                 elif action_type == "clear_history":
                     result = browser.clear_history()
                     await websocket.send_text(json.dumps({
@@ -525,6 +1056,35 @@ async def websocket_endpoint(websocket: WebSocket):
                         "result": result
                     }))
                 
+                elif action_type == "get_dom_snapshot":
+                    node_filter = message.get("filter", "all")
+                    result = await asyncio.to_thread(browser.get_dom_snapshot, node_filter)
+                    await websocket.send_text(json.dumps({
+                        "type": "dom_snapshot",
+                        "result": result
+                    }))
+                
+                elif action_type == "get_dom_diffs":
+                    since = message.get("since")
+                    limit = message.get("limit", 500)
+                    result = await asyncio.to_thread(browser.get_dom_diffs, since, limit)
+                    await websocket.send_text(json.dumps({
+                        "type": "dom_diffs",
+                        "result": result
+                    }))
+                
+                elif action_type == "subscribe_dom_diffs":
+                    if dom_diff_task:
+                        dom_diff_task.cancel()
+                        dom_diff_task = None
+                    if message.get("enabled", True):
+                        interval = max(0.1, float(message.get("interval", 1.0)))
+                        dom_diff_task = asyncio.create_task(stream_dom_diffs(websocket, interval))
+                    await websocket.send_text(json.dumps({
+                        "type": "subscribe_dom_diffs_result",
+                        "result": {"status": "success", "subscribed": dom_diff_task is not None}
+                    }))
+                
                 else:
                     logger.warning(f"Unknown action type: {action_type}")
                     await websocket.send_text(json.dumps({
@@ -550,6 +1110,53 @@ async def websocket_endpoint(websocket: WebSocket):
     except Exception as e:
         logger.error(f"WebSocket error: {str(e)}", exc_info=True)
         manager.disconnect(websocket)
+    finally:
+        if dom_diff_task:
+            dom_diff_task.cancel()
+
+async def stream_dom_diffs(websocket: WebSocket, interval: float):
+    """Push DOM mutation batches to a subscribed client; nothing is sent while the page is unchanged."""
+    cursor = None
+    try:
+        while True:
+            result = await asyncio.to_thread(browser.get_dom_diffs, cursor)
+            if result.get("status") == "success":
+                if result["reset"] or result["diffs"]:
+                    await websocket.send_text(json.dumps({"type": "dom_diffs", "result": result}))
+                cursor = result["cursor"]
+                if result["more"]:
+                    continue
+            await asyncio.sleep(interval)
+    except asyncio.CancelledError:
+        pass
+    except Exception as e:
+        logger.error(f"DOM diff subscription error: {str(e)}")
+
+@app.websocket("/ws/view")
+async def spectator_endpoint(websocket: WebSocket):
+    """Read-only WebSocket endpoint that only receives the shared screenshot stream."""
+    client_ip = websocket.client.host
+
+    if not check_rate_limit(client_ip, limit=100, window=60):
+        await websocket.close(code=1008, reason="Rate limit exceeded")
+        return
+
+    if not await manager.connect_spectator(websocket):
+        return
+    try:
+        while True:
+            # Spectators have no input rights; keep reading only to notice disconnects
+            await websocket.receive_text()
+            await manager.send_personal_message(json.dumps({
+                "type": "error",
+                "message": "Spectator connections are read-only"
+            }), websocket)
+    except WebSocketDisconnect:
+        logger.info(f"Spectator disconnected: {client_ip}")
+        manager.disconnect(websocket)
+    except Exception as e:
+        logger.error(f"Spectator WebSocket error: {str(e)}", exc_info=True)
+        manager.disconnect(websocket)
 
 def start_server(host="0.0.0.0", port=8001):
     """Start the FastAPI server."""
@@ -107,7 +107,10 @@ let detectedFormData = null;
 let currentUrl = "about:blank";
 let isCurrentPageBookmarked = false;
 let bookmarks = [];
+let bookmarkSearchResults = null;  // Server-side search results, null when not searching
+let bookmarkSearchTimer = null;
 let historyItems = [];
+const spectatorMode = new URLSearchParams(window.location.search).has('spectate');
 
 // Settings
 const settings = {
@@ -182,7 +185,9 @@ function connectWebSocket() {
     
     // Get WebSocket URL from the current page URL
     const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
-    const wsUrl = `${protocol}//${window.location.host}/ws`;
+    // ?spectate opens a read-only view of the shared session
+    const wsPath = spectatorMode ? '/ws/view' : '/ws';
+    const wsUrl = `${protocol}//${window.location.host}${wsPath}`;
     
     // Create WebSocket connection
     websocket = new WebSocket(wsUrl);
@@ -198,12 +203,14 @@ function connectWebSocket() {
         connectionStatus.classList.add('connected');
         loadingOverlay.style.display = 'none';
         
-        // Set initial FPS
-        sendFrameRateUpdate(currentFps);
-        
-        // Load initial bookmarks and history
-        loadBookmarks();
-        loadHistory();
+        if (!spectatorMode) {
+            // Set initial FPS
+            sendFrameRateUpdate(currentFps);
+            
+            // Load initial bookmarks and history
+            loadBookmarks();
+            loadHistory();
+        }
         
         // Update debug panel
         updateDebugPanel('Connected');
@@ -250,7 +257,7 @@ function connectWebSocket() {
             // Handle different message types
             switch(message.type) {
                 case 'screenshot':
-                    updateBrowserScreen(message.data);
+                    updateBrowserScreen(message.data, message.format);
                     updatePageInfo(message.page_info);
                     updateFpsCounter();
                     break;
@@ -305,6 +312,13 @@ function connectWebSocket() {
                     }
                     break;
                     
+                case 'search_bookmarks_result':
+                    if (message.result.status === 'success' && bookmarkSearch.value.trim()) {
+                        bookmarkSearchResults = message.result.bookmarks;
+                        renderBookmarks();
+                    }
+                    break;
+                    
                 case 'add_bookmark_result':
                     if (message.result.status === 'success') {
                         // Update bookmark button state
@@ -356,14 +370,14 @@ function connectWebSocket() {
 }
 
 // Update the browser screen with the received screenshot
-function updateBrowserScreen(base64Image) {
+function updateBrowserScreen(base64Image, format) {
     // Sometimes we receive duplicate frames, so we can skip rendering them
     if (lastScreenshot === base64Image) return;
     
     lastScreenshot = base64Image;
     
     // Apply the new screenshot
-    browserScreen.src = `data:image/png;base64,${base64Image}`;
+    browserScreen.src = `data:image/${format || 'png'};base64,${base64Image}`;
     
     // Hide loading indicator if it's showing
     if (isPageLoading) {
@@ -596,6 +610,26 @@ function toggleBookmark() {
     }
 }
 
+// Search bookmarks on the server (debounced while typing)
+function searchBookmarks() {
+    clearTimeout(bookmarkSearchTimer);
+    const query = bookmarkSearch.value.trim();
+    
+    if (!query) {
+        bookmarkSearchResults = null;
+        renderBookmarks();
+        return;
+    }
+    
+    bookmarkSearchTimer = setTimeout(() => {
+        if (!isConnected) return;
+        websocket.send(JSON.stringify({
+            type: 'search_bookmarks',
+            query: query
+        }));
+    }, 150);
+}
+
 // Render bookmarks list
 function renderBookmarks() {
     bookmarksList.innerHTML = '';
@@ -608,19 +642,12 @@ function renderBookmarks() {
         return;
     }
     
-    const searchTerm = bookmarkSearch.value.toLowerCase();
-    
-    // Sort bookmarks by creation date (newest first)
-    const sortedBookmarks = [...bookmarks].sort((a, b) => b.created - a.created);
+    // Search results arrive ranked from the server; otherwise sort by creation date (newest first)
+    const sortedBookmarks = bookmarkSearchResults !== null ?
+        bookmarkSearchResults :
+        [...bookmarks].sort((a, b) => b.created - a.created);
     
     for (const bookmark of sortedBookmarks) {
-        // Filter by search term if provided
-        if (searchTerm && 
-            !bookmark.title.toLowerCase().includes(searchTerm) && 
-            !bookmark.url.toLowerCase().includes(searchTerm)) {
-            continue;
-        }
-        
         const bookmarkItem = document.createElement('div');
         bookmarkItem.className = 'bookmark-item';
         
@@ -806,16 +833,19 @@ function attemptAutoFill() {
 function viewPageSource() {
     if (!isConnected) return;
     
-    // Request page HTML
-    fetch('/api/page-html')
-        .then(response => response.json())
-        .then(data => {
-            if (data.status === 'success') {
-                pageSourceCode.textContent = data.html;
-                sourcePanel.classList.remove('hidden');
-            } else {
-                showError('Failed to get page source: ' + (data.message || 'Unknown error'));
+    // Stream the page HTML (gzip-compressed on the wire) instead of a JSON-wrapped string
+    fetch('/api/page-html/stream')
+        .then(response => {
+            if (!response.ok) {
+                return response.json().then(data => {
+                    throw new Error(data.message || 'Unknown error');
+                });
             }
+            return response.text();
+        })
+        .then(html => {
+            pageSourceCode.textContent = html;
+            sourcePanel.classList.remove('hidden');
         })
         .catch(error => {
             showError('Failed to get page source: ' + error.message);
@@ -918,7 +948,7 @@ homeButton.addEventListener('click', () => {
 bookmarkButton.addEventListener('click', toggleBookmark);
 bookmarksListButton.addEventListener('click', toggleBookmarksPanel);
 closeBookmarksButton.addEventListener('click', toggleBookmarksPanel);
-bookmarkSearch.addEventListener('input', renderBookmarks);
+bookmarkSearch.addEventListener('input', searchBookmarks);
 
 // History actions
 clearHistoryButton.addEventListener('click', clearHistory);
@@ -0,0 +1,376 @@
+import json
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Any
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_NAME = "browser_state.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bookmarks (
+    namespace TEXT NOT NULL,
+    url TEXT NOT NULL,
+    title TEXT,
+    folder TEXT,
+    created REAL,
+    PRIMARY KEY (namespace, url)
+);
+CREATE INDEX IF NOT EXISTS bookmarks_folder ON bookmarks (namespace, folder);
+
+CREATE TABLE IF NOT EXISTS form_data (
+    namespace TEXT NOT NULL,
+    field TEXT NOT NULL,
+    value TEXT,
+    PRIMARY KEY (namespace, field)
+);
+
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    namespace TEXT NOT NULL,
+    url TEXT NOT NULL,
+    title TEXT,
+    visit_count INTEGER NOT NULL DEFAULT 1,
+    first_visit REAL,
+    last_visit REAL,
+    UNIQUE (namespace, url)
+);
+CREATE INDEX IF NOT EXISTS history_recent ON history (namespace, last_visit, id);
+
+CREATE TABLE IF NOT EXISTS autofill_mappings (
+    namespace TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    signature TEXT NOT NULL,
+    mapping TEXT NOT NULL,
+    updated REAL,
+    PRIMARY KEY (namespace, domain, signature)
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Full-text index over history titles and URLs, kept in sync by triggers (needs SQLite built with FTS5)
+HISTORY_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5(url, title, content='history', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS history_fts_insert AFTER INSERT ON history BEGIN
+    INSERT INTO history_fts (rowid, url, title) VALUES (new.id, new.url, new.title);
+END;
+CREATE TRIGGER IF NOT EXISTS history_fts_delete AFTER DELETE ON history BEGIN
+    INSERT INTO history_fts (history_fts, rowid, url, title) VALUES ('delete', old.id, old.url, old.title);
+END;
+CREATE TRIGGER IF NOT EXISTS history_fts_update AFTER UPDATE OF url, title ON history BEGIN
+    INSERT INTO history_fts (history_fts, rowid, url, title) VALUES ('delete', old.id, old.url, old.title);
+    INSERT INTO history_fts (rowid, url, title) VALUES (new.id, new.url, new.title);
+END;
+"""
+
+_SEARCH_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+class PersistentStore:
+    """
+    Transactional storage for bookmarks, form data, autofill mappings and history,
+    backed by SQLite in WAL mode.
+
+    Reads run directly on the calling thread. Mutations are queued and applied by a
+    single writer thread that groups everything queued within a short window into one
+    transaction, so callers (which may hold the browser lock) never wait on disk I/O
+    and each mutation costs a single-row write instead of rewriting all stored data.
+    Every row carries a namespace so several sessions can share one database file.
+    """
+
+    def __init__(self, path: str, batch_window: float = 0.05):
+        """
+        Initialize the store.
+
+        Args:
+            path: SQLite database file
+            batch_window: Seconds the writer waits to collect more mutations into one commit
+        """
+        self.path = path
+        self.batch_window = batch_window
+        self._local = threading.local()
+        self._queue = queue.Queue()
+        self._closed = False
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        try:
+            conn.executescript(HISTORY_FTS_SCHEMA)
+            self.fts_enabled = True
+        except sqlite3.OperationalError as e:
+            logger.warning(f"FTS5 unavailable, history search falls back to LIKE: {str(e)}")
+            self.fts_enabled = False
+        conn.commit()
+
+        self._writer = threading.Thread(target=self._write_loop, name="persistent-store-writer", daemon=True)
+        self._writer.start()
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; WAL lets readers proceed while the writer commits."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # Writer
+
+    def _submit(self, sql: str, params=()):
+        if self._closed:
+            raise RuntimeError("Store is closed")
+        self._queue.put((sql, params))
+
+    def _write_loop(self):
+        conn = self._connection()
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            # Collect whatever else arrives within the batch window into the same transaction
+            deadline = time.monotonic() + self.batch_window
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            stop = False
+            try:
+                conn.execute("BEGIN")
+                for entry in batch:
+                    if entry is None:
+                        stop = True
+                    elif isinstance(entry, threading.Event):
+                        continue
+                    else:
+                        self._apply(conn, entry)
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Persistent store write error: {str(e)}")
+
+            # Flush markers are released only after the transaction containing prior writes committed
+            for entry in batch:
+                if isinstance(entry, threading.Event):
+                    entry.set()
+            if stop:
+                conn.close()
+                return
+
+    @staticmethod
+    def _apply(conn: sqlite3.Connection, entry):
+        """Run one mutation in its own savepoint so a failing one doesn't roll back the rest of the batch."""
+        conn.execute("SAVEPOINT mutation")
+        try:
+            conn.execute(*entry)
+        except sqlite3.Error as e:
+            conn.execute("ROLLBACK TO mutation")
+            logger.error(f"Persistent store dropped a write: {str(e)}")
+        conn.execute("RELEASE mutation")
+
+    def flush(self, timeout: float = 10) -> bool:
+        """Block until every mutation queued so far has been committed."""
+        if self._closed:
+            return True
+        marker = threading.Event()
+        self._queue.put(marker)
+        return marker.wait(timeout)
+
+    def close(self):
+        """Commit pending mutations and stop the writer thread."""
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join(timeout=10)
+
+    # Bookmarks
+
+    def load_bookmarks(self, namespace: str) -> List[Dict[str, Any]]:
+        rows = self._connection().execute(
+            "SELECT url, title, folder, created FROM bookmarks WHERE namespace = ? ORDER BY created",
+            (namespace,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def put_bookmark(self, namespace: str, bookmark: Dict[str, Any]):
+        self._submit(
+            "INSERT OR REPLACE INTO bookmarks (namespace, url, title, folder, created) VALUES (?, ?, ?, ?, ?)",
+            (namespace, bookmark['url'], bookmark.get('title'), bookmark.get('folder'), bookmark.get('created'))
+        )
+
+    def delete_bookmark(self, namespace: str, url: str):
+        self._submit("DELETE FROM bookmarks WHERE namespace = ? AND url = ?", (namespace, url))
+
+    # Form data
+
+    def load_form_data(self, namespace: str) -> Dict[str, str]:
+        rows = self._connection().execute(
+            "SELECT field, value FROM form_data WHERE namespace = ?", (namespace,)
+        ).fetchall()
+        return {row['field']: row['value'] for row in rows}
+
+    def put_form_data(self, namespace: str, field: str, value: str):
+        if not isinstance(field, str) or not isinstance(value, str):
+            raise ValueError("Form data field and value must be strings")
+        self._submit(
+            "INSERT OR REPLACE INTO form_data (namespace, field, value) VALUES (?, ?, ?)",
+            (namespace, field, value)
+        )
+
+    def delete_form_data(self, namespace: str, field: Optional[str] = None):
+        if field is None:
+            self._submit("DELETE FROM form_data WHERE namespace = ?", (namespace,))
+        else:
+            self._submit("DELETE FROM form_data WHERE namespace = ? AND field = ?", (namespace, field))
+
+    # Autofill mappings
+
+    def load_autofill_mappings(self, namespace: str) -> Dict[tuple, Dict[str, str]]:
+        """Learned field mappings keyed by (domain, form signature)."""
+        rows = self._connection().execute(
+            "SELECT domain, signature, mapping FROM autofill_mappings WHERE namespace = ?", (namespace,)
+        ).fetchall()
+        return {(row['domain'], row['signature']): json.loads(row['mapping']) for row in rows}
+
+    def put_autofill_mapping(self, namespace: str, domain: str, signature: str, mapping: Dict[str, str]):
+        self._submit(
+            "INSERT OR REPLACE INTO autofill_mappings (namespace, domain, signature, mapping, updated) VALUES (?, ?, ?, ?, ?)",
+            (namespace, domain, signature, json.dumps(mapping), time.time())
+        )
+
+    def delete_autofill_mappings(self, namespace: str, domain: Optional[str] = None, signature: Optional[str] = None):
+        if domain is None:
+            self._submit("DELETE FROM autofill_mappings WHERE namespace = ?", (namespace,))
+        elif signature is None:
+            self._submit("DELETE FROM autofill_mappings WHERE namespace = ? AND domain = ?", (namespace, domain))
+        else:
+            self._submit(
+                "DELETE FROM autofill_mappings WHERE namespace = ? AND domain = ? AND signature = ?",
+                (namespace, domain, signature)
+            )
+
+    # History
+
+    def record_visit(self, namespace: str, url: str, title: Optional[str] = None, timestamp: Optional[float] = None):
+        """Add a visit, bumping the visit count if the URL was seen before."""
+        timestamp = timestamp or time.time()
+        self._submit(
+            "INSERT INTO history (namespace, url, title, visit_count, first_visit, last_visit) VALUES (?, ?, ?, 1, ?, ?) "
+            "ON CONFLICT (namespace, url) DO UPDATE SET visit_count = visit_count + 1, "
+            "last_visit = excluded.last_visit, title = COALESCE(excluded.title, title)",
+            (namespace, url, title, timestamp, timestamp)
+        )
+
+    def prune_history(self, namespace: str, max_entries: int):
+        """Drop the least recently visited entries beyond max_entries."""
+        self._submit(
+            "DELETE FROM history WHERE id IN (SELECT id FROM history WHERE namespace = ? "
+            "ORDER BY last_visit DESC, id DESC LIMIT -1 OFFSET ?)",
+            (namespace, max_entries)
+        )
+
+    def clear_history(self, namespace: str):
+        self._submit("DELETE FROM history WHERE namespace = ?", (namespace,))
+
+    def history_page(self, namespace: str, limit: int = 50, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Most recently visited entries first, paginated with an opaque cursor.
+
+        Returns:
+            Dictionary with entries and next_cursor (None on the last page)
+        """
+        params: List[Any] = [namespace]
+        where = "namespace = ?"
+        if cursor:
+            last_visit, last_id = cursor.split(":", 1)
+            where += " AND (last_visit < ? OR (last_visit = ? AND id < ?))"
+            params += [float(last_visit), float(last_visit), int(last_id)]
+        rows = self._connection().execute(
+            f"SELECT id, url, title, visit_count, first_visit, last_visit FROM history WHERE {where} "
+            "ORDER BY last_visit DESC, id DESC LIMIT ?",
+            params + [limit + 1]
+        ).fetchall()
+
+        entries = [dict(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = entries[-1]
+            next_cursor = f"{last['last_visit']!r}:{last['id']}"
+        return {'entries': entries, 'next_cursor': next_cursor}
+
+    def search_history(self, namespace: str, query: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """Full-text search over history titles and URLs; every query token must match as a prefix."""
+        tokens = _SEARCH_TOKEN_RE.findall((query or "").lower())
+        if not tokens:
+            return []
+        conn = self._connection()
+        if self.fts_enabled:
+            match = " ".join(f'"{token}"*' for token in tokens)
+            rows = conn.execute(
+                "SELECT h.id, h.url, h.title, h.visit_count, h.first_visit, h.last_visit "
+                "FROM history_fts JOIN history h ON h.id = history_fts.rowid "
+                "WHERE history_fts MATCH ? AND h.namespace = ? "
+                "ORDER BY bm25(history_fts), h.last_visit DESC LIMIT ?",
+                (match, namespace, limit)
+            ).fetchall()
+        else:
+            clauses = " AND ".join("(lower(url) LIKE ? OR lower(title) LIKE ?)" for _ in tokens)
+            params: List[Any] = [namespace]
+            for token in tokens:
+                params += [f"%{token}%", f"%{token}%"]
+            rows = conn.execute(
+                "SELECT id, url, title, visit_count, first_visit, last_visit FROM history "
+                f"WHERE namespace = ? AND {clauses} ORDER BY last_visit DESC LIMIT ?",
+                params + [limit]
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    # Migration
+
+    def import_legacy_json(self, namespace: str, directory: str):
+        """
+        One-time import of bookmarks.json and form_data.json written by older versions.
+
+        The files are left in place; a meta row records that the import happened.
+        """
+        marker = f"legacy_import:{namespace}"
+        conn = self._connection()
+        if conn.execute("SELECT 1 FROM meta WHERE key = ?", (marker,)).fetchone():
+            return
+
+        try:
+            bookmarks_file = os.path.join(directory, "bookmarks.json")
+            if os.path.exists(bookmarks_file):
+                with open(bookmarks_file, "r") as f:
+                    for bookmark in json.load(f):
+                        self.put_bookmark(namespace, bookmark)
+
+            form_data_file = os.path.join(directory, "form_data.json")
+            if os.path.exists(form_data_file):
+                with open(form_data_file, "r") as f:
+                    for field, value in json.load(f).items():
+                        self.put_form_data(namespace, field, value)
+        except Exception as e:
+            logger.error(f"Error importing legacy JSON data: {str(e)}")
+
+        self._submit("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (marker, str(time.time())))
+        self.flush()
@@ -13,6 +13,7 @@ from urllib.parse import urljoin
 # Test configuration
 TEST_HOST = os.environ.get("TEST_HOST", "http://localhost:8001")
 TEST_WS = os.environ.get("TEST_WS", "ws://localhost:8001/ws")
+TEST_WS_VIEW = os.environ.get("TEST_WS_VIEW", "ws://localhost:8001/ws/view")
 START_SERVER = os.environ.get("START_SERVER", "false").lower() == "true"
 SERVER_PROCESS = None
 
@@ -36,11 +37,11 @@ class HeadlessBrowserTestCase(unittest.TestCase):
     def setUpClass(cls):
         if START_SERVER:
             start_test_server()
-        # Wait for server to be fully up
-        max_retries = 10
+        # Wait for server to be fully up (browsers start in the background)
+        max_retries = 60
         for i in range(max_retries):
             try:
-                response = requests.get(urljoin(TEST_HOST, "/health"))
+                response = requests.get(urljoin(TEST_HOST, "/health/ready"))
                 if response.status_code == 200:
                     break
             except Exception:
@@ -63,6 +64,23 @@ class HeadlessBrowserTestCase(unittest.TestCase):
         self.assertEqual(data["status"], "ok")
         # The browser might be in fallback mode, so we don't assert on browser_running
 
+    def test_liveness_and_readiness(self):
+        """Test liveness and readiness probes."""
+        response = requests.get(urljoin(TEST_HOST, "/health/live"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], "ok")
+
+        response = requests.get(urljoin(TEST_HOST, "/health/ready"))
+        data = response.json()
+        if data["status"] == "failed":
+            self.assertEqual(response.status_code, 503)
+            self.assertIn("error", data)
+            self.skipTest("Browser failed to start")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data["status"], "ready")
+        self.assertIn("pool", data)
+        self.assertGreaterEqual(data["pool"]["size"], 1)
+
     def test_index_page(self):
         """Test index page loads."""
         response = requests.get(TEST_HOST)
@@ -76,6 +94,7 @@ class HeadlessBrowserTestCase(unittest.TestCase):
         data = response.json()
         self.assertIn("status", data)
         self.assertIn("url", data)
+        self.assertIn(data["engine"], ("selenium", "playwright"))
 
     def test_websocket_connection(self):
         """Test WebSocket connection."""
@@ -120,8 +139,27 @@ class HeadlessBrowserTestCase(unittest.TestCase):
         self.assertIn("type", messages[0])
         self.assertEqual(messages[0]["type"], "screenshot")
         self.assertIn("data", messages[0])
+        self.assertIn(messages[0]["format"], ("png", "jpeg"))
         self.assertIn("page_info", messages[0])
 
+    def test_spectator_connection(self):
+        """Test read-only spectator WebSocket connection."""
+        ws = websocket.create_connection(TEST_WS_VIEW, timeout=10)
+        try:
+            message = json.loads(ws.recv())
+            self.assertEqual(message["type"], "screenshot")
+            self.assertIn("data", message)
+
+            # Input from spectators is rejected
+            ws.send(json.dumps({"type": "navigate", "url": "https://example.com"}))
+            while True:
+                message = json.loads(ws.recv())
+                if message["type"] != "screenshot":
+                    break
+            self.assertEqual(message["type"], "error")
+        finally:
+            ws.close()
+
     def test_bookmarks_api(self):
         """Test bookmarks API endpoints."""
         # Get bookmarks
@@ -151,6 +189,16 @@ class HeadlessBrowserTestCase(unittest.TestCase):
         bookmark_urls = [b["url"] for b in data["bookmarks"]]
         self.assertIn("https://example.com", bookmark_urls)
         
+        # Search for it by title prefix and by URL token
+        response = requests.get(urljoin(TEST_HOST, "/api/bookmarks/search"), params={"q": "exam"})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["status"], "success")
+        self.assertIn("https://example.com", [b["url"] for b in data["bookmarks"]])
+
+        response = requests.get(urljoin(TEST_HOST, "/api/bookmarks/search"), params={"q": "example com"})
+        self.assertIn("https://example.com", [b["url"] for b in response.json()["bookmarks"]])
+
         # Remove the bookmark
         response = requests.post(
             urljoin(TEST_HOST, "/api/bookmarks/remove"),
@@ -225,5 +273,300 @@ class HeadlessBrowserTestCase(unittest.TestCase):
         self.assertEqual(data["status"], "success")
         self.assertEqual(len(data["history"]), 1)  # Should only have one item (current page)
 
+    def test_history_visits_api(self):
+        """Test paginated visit history and history search."""
+        response = requests.get(urljoin(TEST_HOST, "/api/history/visits"), params={"limit": 5})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["status"], "success")
+        self.assertIn("entries", data)
+        self.assertIn("next_cursor", data)
+        self.assertLessEqual(len(data["entries"]), 5)
+
+        response = requests.get(urljoin(TEST_HOST, "/api/history/search"), params={"q": "example"})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["status"], "success")
+        self.assertIn("entries", data)
+
+    def test_page_html_stream(self):
+        """Test streamed page source and DOM diff cursors."""
+        response = requests.get(urljoin(TEST_HOST, "/api/page-html/stream"))
+        if response.status_code == 503:
+            self.skipTest("Browser not available")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("text/html", response.headers["content-type"])
+        self.assertIn("<html", response.text.lower())
+
+        response = requests.get(urljoin(TEST_HOST, "/api/dom-diffs"))
+        data = response.json()
+        self.assertEqual(data["status"], "success")
+        self.assertTrue(data["reset"])
+
+        response = requests.get(urljoin(TEST_HOST, "/api/dom-diffs"), params={"since": data["cursor"]})
+        data = response.json()
+        self.assertEqual(data["status"], "success")
+        self.assertFalse(data["reset"])
+        self.assertIn("diffs", data)
+
+    def test_dom_snapshot(self):
+        """Test the compact DOM snapshot endpoint."""
+        response = requests.get(urljoin(TEST_HOST, "/api/dom-snapshot"), params={"filter": "bogus"})
+        self.assertEqual(response.json()["status"], "error")
+
+        response = requests.get(urljoin(TEST_HOST, "/api/dom-snapshot"), params={"filter": "visible"})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        if data["status"] == "error":
+            self.skipTest("Browser not available")
+        self.assertIn("strings", data)
+        for document in data["documents"]:
+            nodes = document["nodes"]
+            self.assertEqual(len(nodes["parent"]), len(nodes["name"]))
+            self.assertEqual(len(document["layout"]["node"]), len(document["layout"]["bounds"]))
+
+    def test_execute_scripts_batch(self):
+        """Test batched script execution with per-item errors."""
+        scripts = [
+            {"script": "return arguments[0] + arguments[1];", "args": [2, 3]},
+            {"script": "throw new Error('boom');"},
+            {"script": "return 'after';"}
+        ]
+        response = requests.post(urljoin(TEST_HOST, "/api/execute-scripts"), json=scripts)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        if data["status"] == "error":
+            self.skipTest("Browser not available")
+        self.assertEqual([r["status"] for r in data["results"]], ["success", "error", "success"])
+        self.assertEqual(data["results"][0]["result"], 5)
+
+        response = requests.post(urljoin(TEST_HOST, "/api/execute-scripts"), params={"stop_on_error": "true"}, json=scripts)
+        data = response.json()
+        self.assertEqual([r["status"] for r in data["results"]], ["success", "error", "skipped"])
+
+    def test_batch_api(self):
+        """Test streaming batch extraction over data: URLs."""
+        response = requests.post(urljoin(TEST_HOST, "/api/batch"), json={"urls": []})
+        self.assertEqual(response.status_code, 400)
+        for concurrency in (0, -2, "many"):
+            response = requests.post(urljoin(TEST_HOST, "/api/batch"), json={"urls": ["data:,x"], "concurrency": concurrency})
+            self.assertEqual(response.status_code, 400)
+
+        urls = ["data:text/html,<title>One</title><h1>first</h1>", "data:text/html,<title>Two</title><h1>second</h1>"]
+        job = {"urls": urls, "extract": ["title"], "selectors": ["h1"], "timeout": 10, "retries": 0}
+        response = requests.post(urljoin(TEST_HOST, "/api/batch"), json=job, stream=True)
+        if response.status_code == 503:
+            self.skipTest("No batch browsers ready")
+        self.assertEqual(response.status_code, 200)
+        lines = [json.loads(line) for line in response.iter_lines() if line]
+        self.assertTrue(lines[-1]["done"])
+        self.assertEqual(lines[-1]["total"], 2)
+        results = sorted(lines[:-1], key=lambda result: result["index"])
+        if results[0]["status"] == "error":
+            self.skipTest("Browser not available")
+        self.assertEqual([r["title"] for r in results], ["One", "Two"])
+        self.assertEqual(results[1]["selected"]["h1"], ["second"])
+
+    def test_full_page_capture(self):
+        """Test tiled full-page capture and the stitched PNG stream."""
+        response = requests.get(urljoin(TEST_HOST, "/api/screenshot/full"), params={"tile_height": 512}, stream=True)
+        if response.status_code == 503:
+            self.skipTest("Browser not available")
+        self.assertEqual(response.status_code, 200)
+        lines = [json.loads(line) for line in response.iter_lines() if line]
+        header, tiles = lines[0], lines[1:]
+        self.assertEqual(len(tiles), header["tiles"])
+        self.assertEqual(sum(tile["height"] for tile in tiles), header["height"])
+
+        response = requests.get(urljoin(TEST_HOST, "/api/screenshot/full"), params={"output": "png"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content.startswith(b"\x89PNG\r\n\x1a\n"))
+
+        response = requests.get(urljoin(TEST_HOST, "/api/screenshot/full"), params={"format": "gif"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_wait_conditions(self):
+        """Test the wait endpoint with valid and invalid conditions."""
+        response = requests.post(urljoin(TEST_HOST, "/api/wait"), params={"wait": "bogus"})
+        self.assertEqual(response.json()["status"], "error")
+
+        wait = json.dumps({"condition": "dom_stable", "quiet_ms": 100, "timeout": 5})
+        response = requests.post(urljoin(TEST_HOST, "/api/wait"), params={"wait": wait})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        if data["status"] == "error":
+            self.skipTest("Browser not available")
+        self.assertEqual(data["condition"], "dom_stable")
+        self.assertIn("elapsed", data)
+
+
+class HttpCacheProxyTestCase(unittest.TestCase):
+    """Runs the caching proxy against a local origin server; needs no browser or network."""
+
+    def setUp(self):
+        import tempfile
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        from http_cache import HttpDiskCache, CachingProxy
+
+        self.origin_requests = []
+        requests_seen = self.origin_requests
+
+        class Origin(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                requests_seen.append(self.path)
+                if self.path == "/validated" and self.headers.get("If-None-Match") == '"v1"':
+                    self.send_response(304)
+                    self.send_header("ETag", '"v1"')
+                    self.end_headers()
+                    return
+                if self.path == "/rotated" and self.headers.get("If-None-Match") == '"v2"':
+                    self.send_response(304)
+                    self.send_header("ETag", '"v2"')
+                    self.end_headers()
+                    return
+                body = b"x" * 100
+                self.send_response(200)
+                if self.path == "/rotated":
+                    # The first response carries "v1", every later one "v2"
+                    self.send_header("ETag", '"v1"' if requests_seen.count("/rotated") == 1 else '"v2"')
+                    self.send_header("Cache-Control", "no-cache")
+                elif self.path == "/validated":
+                    self.send_header("ETag", '"v1"')
+                    self.send_header("Cache-Control", "no-cache")
+                elif self.path == "/private":
+                    self.send_header("Cache-Control", "no-store")
+                else:
+                    self.send_header("Cache-Control", "max-age=60")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.origin = ThreadingHTTPServer(("127.0.0.1", 0), Origin)
+        threading.Thread(target=self.origin.serve_forever, daemon=True).start()
+        self.origin_url = f"http://127.0.0.1:{self.origin.server_address[1]}"
+        self.cache_dir = tempfile.mkdtemp()
+        self.proxy = CachingProxy(HttpDiskCache(self.cache_dir, max_bytes=250, max_entry_bytes=250))
+        self.proxy.start()
+        self.proxies = {"http": f"http://{self.proxy.address}"}
+
+    def tearDown(self):
+        import shutil
+        self.proxy.stop()
+        self.origin.shutdown()
+        self.origin.server_close()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def fetch(self, path):
+        response = requests.get(self.origin_url + path, proxies=self.proxies)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_cache_semantics(self):
+        """Fresh responses are served from disk, no-cache ones revalidated, no-store ones never stored."""
+        self.fetch("/static")
+        self.fetch("/static")
+        self.fetch("/validated")
+        self.fetch("/validated")
+        self.fetch("/private")
+        self.fetch("/private")
+        self.assertEqual(self.origin_requests, ["/static", "/validated", "/validated", "/private", "/private"])
+
+        stats = self.proxy.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["revalidated"], 1)
+        self.assertGreater(stats["hit_ratio"], 0)
+
+    def test_head_keeps_stored_body(self):
+        """A HEAD that revalidates a stale entry to a 200 leaves the stored body alone."""
+        self.fetch("/rotated")
+        response = requests.head(self.origin_url + "/rotated", proxies=self.proxies)
+        self.assertEqual(response.status_code, 200)
+        # The origin now answers the stored "v1" validator with a full response
+        self.assertEqual(len(self.fetch("/rotated").content), 100)
+        self.assertEqual(self.origin_requests, ["/rotated", "/rotated", "/rotated"])
+
+    def test_lru_eviction(self):
+        """Least recently used entries are evicted once the size bound is exceeded."""
+        self.fetch("/a")
+        self.fetch("/b")
+        self.fetch("/a")
+        self.fetch("/c")
+        self.fetch("/a")
+        self.fetch("/b")
+        self.assertEqual(self.origin_requests, ["/a", "/b", "/c", "/b"])
+        self.assertLessEqual(self.proxy.stats()["size_bytes"], 250)
+
+    def test_blocklist(self):
+        """Requests matching blocklist rules are refused before reaching the origin."""
+        from http_cache import CachingProxy
+        from url_filter import UrlFilter
+
+        url_filter = UrlFilter()
+        stats = url_filter.load(rules=["! list header", "||tracker.invalid^", "/ads/*", "@@/ads/allowed", "site.com##.banner"])
+        self.assertEqual(stats["rules"], 3)
+        self.assertEqual(stats["cosmetic_skipped"], 1)
+
+        proxy = CachingProxy(None, url_filter=url_filter)
+        proxy.start()
+        try:
+            proxies = {"http": f"http://{proxy.address}"}
+            self.assertEqual(requests.get(self.origin_url + "/ads/banner.js", proxies=proxies).status_code, 403)
+            self.assertEqual(requests.get(self.origin_url + "/ads/allowed", proxies=proxies).status_code, 200)
+            self.assertEqual(requests.get(self.origin_url + "/page", proxies=proxies).status_code, 200)
+        finally:
+            proxy.stop()
+        self.assertEqual(self.origin_requests, ["/ads/allowed", "/page"])
+        self.assertIsNotNone(url_filter.check("https://cdn.tracker.invalid/pixel.gif"))
+        self.assertEqual(url_filter.stats()["blocked"], 2)
+
+        # Rules for the same domain with different options, and $important against exceptions
+        url_filter.load(rules=["||x.com^$third-party", "||x.com^", "||y.com^$important", "@@||y.com^",
+                               "||z.com^", "@@||z.com^"])
+        self.assertIsNotNone(url_filter.check("http://x.com/a", "http://x.com/"))
+        self.assertIsNotNone(url_filter.check("http://y.com/a"))
+        self.assertIsNotNone(url_filter.check_host("y.com"))
+        self.assertIsNone(url_filter.check("http://z.com/a"))
+
+
+class CookieIndexTestCase(unittest.TestCase):
+    """Cookie index bookkeeping; needs no browser."""
+
+    def test_host_only_and_domain_cookies(self):
+        from cookie_jar import CookieIndex
+
+        host_only = {"name": "sid", "value": "a", "domain": "example.com", "path": "/"}
+        domain_wide = {"name": "sid", "value": "b", "domain": ".example.com", "path": "/"}
+        index = CookieIndex()
+        index.apply_snapshot([host_only, domain_wide])
+        self.assertEqual(len(index), 2)
+        self.assertEqual(len(index.for_domain("example.com")), 2)
+
+        changes = index.apply_snapshot([host_only])
+        self.assertEqual(changes["removed"], 1)
+        self.assertEqual(len(index), 1)
+        self.assertEqual(index.for_domain("example.com"), [host_only])
+        self.assertEqual(index.grouped(), {"example.com": [host_only]})
+
+
+class EngineTestCase(unittest.TestCase):
+    """Engine configuration helpers; needs no browser."""
+
+    def test_engine_configuration(self):
+        from engine import create_engine, screenshot_quality
+
+        self.assertEqual(screenshot_quality("medium"), 70)
+        self.assertEqual(screenshot_quality("HIGH"), 90)
+        self.assertEqual(screenshot_quality(150), 100)
+        with self.assertRaises(ValueError):
+            screenshot_quality("best")
+        with self.assertRaises(ValueError):
+            create_engine("webkit")
+
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,405 @@
+import logging
+import re
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Any
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# Options a rule may carry and still be enforced; rules with any other option are skipped
+SUPPORTED_OPTIONS = {'third-party', '~third-party', '3p', '1p', 'important'}
+
+# Hosts-file addresses that mean "block this domain"
+HOSTS_ADDRESSES = {'0.0.0.0', '127.0.0.1', '::', '::1'}
+
+DOMAIN_RE = re.compile(r'^[a-z0-9_-]+(\.[a-z0-9_-]+)+$')
+OPTIONS_RE = re.compile(r'\$([a-z0-9~,=_|.-]+)$')
+
+# Latency samples kept for the percentile in stats()
+LATENCY_SAMPLES = 1000
+
+
+def _site(host: str) -> str:
+    """Approximate registrable domain: the last two labels, or three under short second-level labels (co.uk)."""
+    labels = host.split('.')
+    if len(labels) >= 3 and len(labels[-1]) == 2 and len(labels[-2]) <= 3:
+        return '.'.join(labels[-3:])
+    return '.'.join(labels[-2:])
+
+
+class _Rule:
+    __slots__ = ('text', 'pattern', 'third_party', 'important', '_regex')
+
+    def __init__(self, text: str, pattern: str, third_party: Optional[bool], important: bool = False):
+        self.text = text
+        self.pattern = pattern
+        self.third_party = third_party
+        self.important = important
+        self._regex = None
+
+    def applies(self, third_party: Optional[bool]) -> bool:
+        return self.third_party is None or third_party is None or self.third_party == third_party
+
+    def matches(self, url: str) -> bool:
+        # Compiled on first use: only rules whose token occurs in a URL ever need a regex
+        if self._regex is None:
+            self._regex = re.compile(_pattern_regex(self.pattern))
+        return self._regex.search(url) is not None
+
+
+def _pattern_regex(pattern: str) -> str:
+    regex = ''
+    if pattern.startswith('||'):
+        regex = r'^[a-z][a-z0-9+.-]*://([^/?#]*\.)?'
+        pattern = pattern[2:]
+    elif pattern.startswith('|'):
+        regex = '^'
+        pattern = pattern[1:]
+    end_anchor = pattern.endswith('|')
+    if end_anchor:
+        pattern = pattern[:-1]
+    for char in pattern:
+        if char == '*':
+            regex += '.*'
+        elif char == '^':
+            regex += r'(?:[^\w\-.%]|$)'
+        else:
+            regex += re.escape(char)
+    return regex + ('$' if end_anchor else '')
+
+
+def _token(pattern: str) -> str:
+    """Longest literal run of a pattern, used as its Aho-Corasick key."""
+    return max(re.split(r'[*^|]+', pattern), key=len)
+
+
+class AhoCorasick:
+    """
+    Multi-pattern substring matcher.
+
+    All keys are compiled into one automaton (a trie with failure links), so a text is
+    scanned once regardless of the number of keys. Outputs of suffix states are merged
+    into each state while building, so matching needs no failure-chain walk per match.
+    """
+
+    def __init__(self):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[Any]] = [[]]
+
+    def add(self, key: str, value: Any):
+        state = 0
+        for char in key:
+            following = self.goto[state].get(char)
+            if following is None:
+                following = len(self.goto)
+                self.goto[state][char] = following
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            state = following
+        self.output[state].append(value)
+
+    def build(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, following in self.goto[state].items():
+                queue.append(following)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[following] = target if target != following else 0
+                if self.output[self.fail[following]]:
+                    self.output[following] = self.output[following] + self.output[self.fail[following]]
+
+    def search(self, text: str):
+        """Yield the values of all keys occurring in text."""
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                yield from output[state]
+
+    @property
+    def states(self) -> int:
+        return len(self.goto)
+
+
+class _RuleSet:
+    """Domain rules in a hash keyed by host suffix, all other rules in an Aho-Corasick automaton."""
+
+    def __init__(self):
+        self.domains: Dict[str, List[_Rule]] = {}
+        self.matcher = AhoCorasick()
+
+    def add(self, rule: _Rule, domain: Optional[str]):
+        if domain:
+            # Several rules may name the same domain with different options ($third-party or not)
+            self.domains.setdefault(domain, []).append(rule)
+        else:
+            self.matcher.add(_token(rule.pattern), rule)
+
+    def match_host(self, host: str, third_party: Optional[bool]) -> Optional[_Rule]:
+        position = 0
+        while True:
+            for rule in self.domains.get(host[position:], ()):
+                if rule.applies(third_party):
+                    return rule
+            position = host.find('.', position) + 1
+            if position == 0:
+                return None
+
+    def match_url(self, url: str, host: str, third_party: Optional[bool]) -> Optional[_Rule]:
+        rule = self.match_host(host, third_party)
+        if rule is not None:
+            return rule
+        checked = set()
+        for rule in self.matcher.search(url):
+            if id(rule) in checked:
+                continue
+            checked.add(id(rule))
+            if rule.applies(third_party) and rule.matches(url):
+                return rule
+        return None
+
+
+class UrlFilter:
+    """
+    Request blocklist for ad and tracker lists with tens of thousands of rules.
+
+    Understands the common subset of Adblock Plus syntax (`||domain^`, `|` anchors, `*`
+    and `^` wildcards, `@@` exceptions, `$third-party`, `$important`, which overrides
+    exceptions) as well as hosts files and plain domain lists. Rules that only name a
+    domain, which is most of such lists, go into a hash looked up once per host suffix. Every other rule is indexed by its longest
+    literal token in an Aho-Corasick automaton, so a URL is scanned once and only rules
+    whose token occurs in it are checked in full. Cosmetic rules and rules with options
+    that cannot be judged from a request URL (resource types, `domain=`) are skipped
+    and counted.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.lock = threading.Lock()
+        self.files: List[str] = []
+        self.custom_rules: List[str] = []
+        self._block = _RuleSet()
+        self._allow = _RuleSet()
+        self._important = _RuleSet()
+        self.build_stats: Dict[str, Any] = {'rules': 0, 'build_seconds': 0.0}
+        self._reset_counters()
+
+    def _reset_counters(self):
+        self.checks = 0
+        self.blocked = 0
+        self.excepted = 0
+        self.match_seconds = 0.0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.blocked_hosts: Dict[str, int] = {}
+
+    def load(self, files: Optional[List[str]] = None, rules: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Replace the blocklist files and/or the custom rules and rebuild the matcher.
+
+        Args:
+            files: Paths of list files; None keeps the current files
+            rules: Custom rule lines; None keeps the current custom rules
+
+        Returns:
+            Build statistics
+        """
+        if files is not None:
+            self.files = list(files)
+        if rules is not None:
+            self.custom_rules = [rule for rule in rules if rule]
+
+        lines: List[str] = []
+        for path in self.files:
+            try:
+                with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                    lines.extend(f.read().splitlines())
+            except OSError as e:
+                logger.error(f"Error reading blocklist {path}: {str(e)}")
+        lines.extend(self.custom_rules)
+        return self._build(lines)
+
+    def _build(self, lines: Iterable[str]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        block, allow, important = _RuleSet(), _RuleSet(), _RuleSet()
+        counts = {'rules': 0, 'domain_rules': 0, 'pattern_rules': 0, 'exception_rules': 0, 'important_rules': 0,
+                  'cosmetic_skipped': 0, 'unsupported_skipped': 0}
+        for line in lines:
+            parsed = self._parse(line.strip(), counts)
+            if parsed is None:
+                continue
+            exception, rule, domain = parsed
+            if exception:
+                allow.add(rule, domain)
+            elif rule.important:
+                important.add(rule, domain)
+                counts['important_rules'] += 1
+            else:
+                block.add(rule, domain)
+            counts['rules'] += 1
+            counts['exception_rules' if exception else 'domain_rules' if domain else 'pattern_rules'] += 1
+        for rule_set in (block, allow, important):
+            rule_set.matcher.build()
+        counts['automaton_states'] = block.matcher.states + allow.matcher.states + important.matcher.states
+        counts['build_seconds'] = round(time.perf_counter() - started, 4)
+
+        # Swapped in as a whole, so requests being matched concurrently see one ruleset or the other
+        with self.lock:
+            self._block, self._allow, self._important = block, allow, important
+            self.build_stats = counts
+            self._reset_counters()
+        logger.info(f"URL filter built: {counts['rules']} rules in {counts['build_seconds']}s")
+        return dict(counts)
+
+    @staticmethod
+    def _parse(line: str, counts: Dict[str, int]):
+        """Parse one list line into (is_exception, rule, domain or None), or None to skip it."""
+        if not line or line[0] in '![' or line.startswith('#') and not line.startswith('##'):
+            return None
+        if '##' in line or '#@#' in line or '#?#' in line or '#$#' in line:
+            counts['cosmetic_skipped'] += 1
+            return None
+
+        lowered = line.lower()
+        parts = lowered.split()
+        if len(parts) >= 2 and parts[0] in HOSTS_ADDRESSES:
+            domain = parts[1]
+            if domain in ('localhost', 'localhost.localdomain', 'local', 'broadcasthost', '0.0.0.0'):
+                return None
+            return False, _Rule(line, '||' + domain + '^', None), domain
+        if DOMAIN_RE.match(lowered):
+            return False, _Rule(line, '||' + lowered + '^', None), lowered
+
+        exception = lowered.startswith('@@')
+        pattern = lowered[2:] if exception else lowered
+        third_party = None
+        important = False
+        options = OPTIONS_RE.search(pattern)
+        if options:
+            pattern = pattern[:options.start()]
+            for option in options.group(1).split(','):
+                if option not in SUPPORTED_OPTIONS:
+                    counts['unsupported_skipped'] += 1
+                    return None
+                if option in ('third-party', '3p'):
+                    third_party = True
+                elif option in ('~third-party', '1p'):
+                    third_party = False
+                elif option == 'important':
+                    important = True
+        if pattern.startswith('/') and pattern.endswith('/') and len(pattern) > 2:
+            # Regular expression rules defeat token indexing
+            counts['unsupported_skipped'] += 1
+            return None
+        if len(_token(pattern)) < 3:
+            # Too generic to index (and to be a sensible rule)
+            counts['unsupported_skipped'] += 1
+            return None
+
+        rule = _Rule(line, pattern, third_party, important and not exception)
+        domain = None
+        if pattern.startswith('||'):
+            body = pattern[2:].rstrip('^')
+            if DOMAIN_RE.match(body) and pattern[2:] in (body, body + '^'):
+                domain = body
+        return exception, rule, domain
+
+    def check(self, url: str, referrer: Optional[str] = None) -> Optional[str]:
+        """
+        Match a request URL.
+
+        Args:
+            url: Full request URL
+            referrer: URL of the page making the request, for $third-party rules
+
+        Returns:
+            The text of the blocking rule, or None when the request is allowed
+        """
+        if not self.enabled:
+            return None
+        started = time.perf_counter()
+        parts = urlsplit(url)
+        host = (parts.hostname or '').lower()
+        rule = self._match(url.lower(), host, self._third_party(host, referrer))
+        self._record(started, host, rule)
+        return rule
+
+    def check_host(self, host: str, referrer: Optional[str] = None) -> Optional[str]:
+        """Match a bare host, for tunnelled connections whose URL is not visible; only domain rules apply."""
+        if not self.enabled:
+            return None
+        started = time.perf_counter()
+        host = host.lower()
+        third_party = self._third_party(host, referrer)
+        block, allow, important = self._block, self._allow, self._important
+        rule = important.match_host(host, third_party)
+        if rule is not None:
+            self._record(started, host, rule.text)
+            return rule.text
+        rule = block.match_host(host, third_party)
+        if rule is not None and allow.match_host(host, third_party) is not None:
+            with self.lock:
+                self.excepted += 1
+            rule = None
+        self._record(started, host, rule.text if rule else None)
+        return rule.text if rule else None
+
+    def _match(self, url: str, host: str, third_party: Optional[bool]) -> Optional[str]:
+        block, allow, important = self._block, self._allow, self._important
+        # Important rules are not subject to exceptions
+        rule = important.match_url(url, host, third_party)
+        if rule is not None:
+            return rule.text
+        rule = block.match_url(url, host, third_party)
+        if rule is None:
+            return None
+        if allow.match_url(url, host, third_party) is not None:
+            with self.lock:
+                self.excepted += 1
+            return None
+        return rule.text
+
+    @staticmethod
+    def _third_party(host: str, referrer: Optional[str]) -> Optional[bool]:
+        if not referrer:
+            return None
+        referrer_host = (urlsplit(referrer).hostname or '').lower()
+        return _site(referrer_host) != _site(host) if referrer_host else None
+
+    def _record(self, started: float, host: str, rule: Optional[str]):
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            self.checks += 1
+            self.match_seconds += elapsed
+            self.latencies.append(elapsed)
+            if rule is not None:
+                self.blocked += 1
+                self.blocked_hosts[host] = self.blocked_hosts.get(host, 0) + 1
+
+    def stats(self, top: int = 10) -> Dict[str, Any]:
+        """Build statistics, match latency and blocked-request counts."""
+        with self.lock:
+            latencies = sorted(self.latencies)
+            top_hosts = sorted(self.blocked_hosts.items(), key=lambda item: item[1], reverse=True)[:top]
+            return {
+                'enabled': self.enabled,
+                'files': list(self.files),
+                'custom_rules': len(self.custom_rules),
+                **self.build_stats,
+                'checks': self.checks,
+                'blocked': self.blocked,
+                'excepted': self.excepted,
+                'avg_match_us': round(self.match_seconds / self.checks * 1e6, 2) if self.checks else 0.0,
+                'p99_match_us': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e6, 2) if latencies else 0.0,
+                'top_blocked_hosts': [{'host': host, 'blocked': count} for host, count in top_hosts]
+            }
@@ -0,0 +1,376 @@
+import json
+import logging
+import re
+import time
+from typing import Dict, Optional, Any, Union
+
+logger = logging.getLogger(__name__)
+
+# Conditions an action can wait for before it reports back
+WAIT_CONDITIONS = ('load', 'network_idle', 'dom_stable', 'selector_present', 'selector_visible', 'url_matches')
+DEFAULT_WAIT_TIMEOUT = 10.0
+DEFAULT_IDLE_MS = 500
+DEFAULT_QUIET_MS = 300
+
+# The in-page waits are promise-returning functions shared by the Selenium and Playwright
+# stacks. Each resolves to true once its condition holds and to false when timeoutMs passes.
+
+LOAD_FUNCTION = """
+function(timeoutMs) {
+    return new Promise(function(resolve) {
+        if (document.readyState === 'complete') {
+            return resolve(true);
+        }
+        var timer = setTimeout(function() { resolve(false); }, timeoutMs);
+        window.addEventListener('load', function() { clearTimeout(timer); resolve(true); }, {once: true});
+    });
+}
+"""
+
+DOM_STABLE_FUNCTION = """
+function(quietMs, timeoutMs) {
+    return new Promise(function(resolve) {
+        var quietTimer = null;
+        var observer = new MutationObserver(function() { arm(); });
+        var finish = function(result) {
+            observer.disconnect();
+            clearTimeout(quietTimer);
+            clearTimeout(deadline);
+            resolve(result);
+        };
+        var arm = function() {
+            clearTimeout(quietTimer);
+            quietTimer = setTimeout(function() { finish(true); }, quietMs);
+        };
+        var deadline = setTimeout(function() { finish(false); }, timeoutMs);
+        observer.observe(document.documentElement, {childList: true, subtree: true, attributes: true, characterData: true});
+        arm();
+    });
+}
+"""
+
+SELECTOR_FUNCTION = """
+function(selector, visible, timeoutMs) {
+    return new Promise(function(resolve) {
+        var find = function() {
+            if (selector.indexOf('//') === 0) {
+                return document.evaluate(selector, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+            }
+            return document.querySelector(selector);
+        };
+        var matches = function() {
+            var el = find();
+            if (!el || !visible) {
+                return !!el;
+            }
+            var style = window.getComputedStyle(el);
+            return el.getClientRects().length > 0 && style.visibility !== 'hidden' && style.display !== 'none';
+        };
+        if (matches()) {
+            return resolve(true);
+        }
+        var finish = function(result) {
+            observer.disconnect();
+            clearInterval(layoutCheck);
+            clearTimeout(deadline);
+            resolve(result);
+        };
+        var observer = new MutationObserver(function() {
+            if (matches()) { finish(true); }
+        });
+        observer.observe(document.documentElement, {childList: true, subtree: true, attributes: true});
+        // Visibility can also change through layout alone (e.g. animations), which no mutation reports
+        var layoutCheck = visible ? setInterval(function() { if (matches()) { finish(true); } }, 100) : null;
+        var deadline = setTimeout(function() { finish(false); }, timeoutMs);
+    });
+}
+"""
+
+URL_FUNCTION = """
+function(pattern, timeoutMs) {
+    return new Promise(function(resolve) {
+        var regex = new RegExp(pattern);
+        if (regex.test(location.href)) {
+            return resolve(true);
+        }
+        var listeners = window.__urlWaitListeners;
+        if (!listeners) {
+            listeners = window.__urlWaitListeners = [];
+            var notify = function() {
+                listeners.slice().forEach(function(listener) { listener(); });
+            };
+            ['pushState', 'replaceState'].forEach(function(name) {
+                var original = history[name];
+                history[name] = function() {
+                    var result = original.apply(this, arguments);
+                    notify();
+                    return result;
+                };
+            });
+            window.addEventListener('popstate', notify);
+            window.addEventListener('hashchange', notify);
+        }
+        var finish = function(result) {
+            var index = listeners.indexOf(check);
+            if (index !== -1) {
+                listeners.splice(index, 1);
+            }
+            clearTimeout(deadline);
+            resolve(result);
+        };
+        var check = function() {
+            if (regex.test(location.href)) { finish(true); }
+        };
+        listeners.push(check);
+        var deadline = setTimeout(function() { finish(false); }, timeoutMs);
+    });
+}
+"""
+
+
+def _async_script(function: str) -> str:
+    """Wrap a promise-returning function for WebDriver's execute_async_script."""
+    return (
+        "var done = arguments[arguments.length - 1];"
+        f"({function}).apply(null, Array.prototype.slice.call(arguments, 0, -1))"
+        ".then(done, function() { done(false); });"
+    )
+
+
+SELENIUM_SCRIPTS = {
+    'load': _async_script(LOAD_FUNCTION),
+    'dom_stable': _async_script(DOM_STABLE_FUNCTION),
+    'selector': _async_script(SELECTOR_FUNCTION),
+    'url_matches': _async_script(URL_FUNCTION),
+}
+
+
+def parse_wait_spec(wait: Union[None, str, Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Normalize a wait specification.
+
+    Accepts a condition name ('network_idle'), a JSON object string or a dict such as
+    {'condition': 'selector_visible', 'selector': '#results', 'timeout': 5}.
+
+    Returns:
+        Dictionary with at least 'condition' and 'timeout', or None for no wait
+
+    Raises:
+        ValueError: For unknown conditions or missing parameters
+    """
+    if not wait:
+        return None
+    if isinstance(wait, str):
+        wait = wait.strip()
+        spec = json.loads(wait) if wait.startswith('{') else {'condition': wait}
+    else:
+        spec = dict(wait)
+
+    condition = spec.get('condition')
+    if condition not in WAIT_CONDITIONS:
+        raise ValueError(f"Unknown wait condition: {condition}. Supported: {', '.join(WAIT_CONDITIONS)}")
+    if condition.startswith('selector_') and not spec.get('selector'):
+        raise ValueError(f"Wait condition {condition} needs a selector")
+    if condition == 'url_matches':
+        if not spec.get('pattern'):
+            raise ValueError("Wait condition url_matches needs a pattern")
+        try:
+            re.compile(spec['pattern'])
+        except re.error as e:
+            raise ValueError(f"Invalid url_matches pattern: {e}")
+    spec['timeout'] = float(spec.get('timeout', DEFAULT_WAIT_TIMEOUT))
+    return spec
+
+
+class NetworkActivity:
+    """Tracks in-flight requests from CDP Network events."""
+
+    def __init__(self):
+        self.inflight: Dict[str, float] = {}
+        self.last_change = time.monotonic()
+
+    def attach(self, event_log):
+        event_log.subscribe('Network.requestWillBeSent', self._on_request)
+        event_log.subscribe('Network.loadingFinished', self._on_done)
+        event_log.subscribe('Network.loadingFailed', self._on_done)
+
+    def _on_request(self, params):
+        self.inflight[params.get('requestId')] = time.monotonic()
+        self.last_change = time.monotonic()
+
+    def _on_done(self, params):
+        if self.inflight.pop(params.get('requestId'), None) is not None:
+            self.last_change = time.monotonic()
+
+    def is_idle(self, max_inflight: int, idle_seconds: float) -> bool:
+        return len(self.inflight) <= max_inflight and time.monotonic() - self.last_change >= idle_seconds
+
+
+class PageWaiter:
+    """
+    Waits for page conditions in a Selenium-driven browser.
+
+    DOM, selector, URL and load conditions run as one asynchronous in-page script that
+    resolves on the browser event (mutation, history change, load) instead of being
+    polled over the driver. If the page navigates away while such a script runs, the
+    wait continues on the new document. Network idle is judged from the CDP Network
+    events, which Selenium can only read from the performance log; the log is drained
+    in short batches until the in-flight count has stayed low for the idle period.
+    """
+
+    def __init__(self, driver, event_log=None, network: Optional[NetworkActivity] = None):
+        self.driver = driver
+        self.event_log = event_log
+        self.network = network
+        self._script_timeout = None
+
+    def wait(self, spec: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Wait for a condition from parse_wait_spec().
+
+        Returns:
+            Dictionary with condition, satisfied (False on timeout) and elapsed seconds
+        """
+        condition = spec['condition']
+        started = time.monotonic()
+        deadline = started + spec['timeout']
+
+        if condition == 'network_idle':
+            satisfied = self._wait_network_idle(spec, deadline)
+        elif condition == 'dom_stable':
+            satisfied = self._in_page('dom_stable', [int(spec.get('quiet_ms', DEFAULT_QUIET_MS))], deadline)
+        elif condition in ('selector_present', 'selector_visible'):
+            satisfied = self._in_page('selector', [spec['selector'], condition == 'selector_visible'], deadline)
+        elif condition == 'url_matches':
+            satisfied = self._wait_url(spec['pattern'], deadline)
+        else:
+            satisfied = self._in_page('load', [], deadline)
+
+        return {'condition': condition, 'satisfied': satisfied, 'elapsed': round(time.monotonic() - started, 3)}
+
+    def _in_page(self, script: str, args, deadline: float) -> bool:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self._ensure_script_timeout(remaining)
+            try:
+                return bool(self.driver.execute_async_script(SELENIUM_SCRIPTS[script], *args, int(remaining * 1000)))
+            except Exception as e:
+                # The document was replaced while waiting; continue on the new one once it has loaded
+                logger.debug(f"In-page wait interrupted, retrying: {str(e)}")
+                if script != 'load':
+                    self._in_page('load', [], deadline)
+                else:
+                    time.sleep(0.05)
+
+    def _wait_url(self, pattern: str, deadline: float) -> bool:
+        regex = re.compile(pattern)
+        while time.monotonic() < deadline:
+            if regex.search(self.driver.current_url):
+                return True
+            # Resolves on history API changes; a full navigation interrupts it and the URL is checked again
+            if self._in_page('url_matches', [pattern], deadline):
+                return True
+        return bool(regex.search(self.driver.current_url))
+
+    def _wait_network_idle(self, spec: Dict[str, Any], deadline: float) -> bool:
+        if not self.event_log or not self.network or not self.event_log.available:
+            logger.warning("Network idle wait needs the CDP event log; waiting for a quiet DOM instead")
+            return self._in_page('dom_stable', [int(spec.get('idle_ms', DEFAULT_IDLE_MS))], deadline)
+
+        max_inflight = int(spec.get('max_inflight', 0))
+        idle_seconds = int(spec.get('idle_ms', DEFAULT_IDLE_MS)) / 1000
+        while True:
+            self.event_log.drain()
+            if self.network.is_idle(max_inflight, idle_seconds):
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(0.05, remaining))
+
+    def _ensure_script_timeout(self, remaining: float):
+        needed = remaining + 5
+        if self._script_timeout is None or self._script_timeout < needed:
+            self._script_timeout = max(needed, 30)
+            self.driver.set_script_timeout(self._script_timeout)
+
+
+def playwright_wait(page, spec: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Wait for a condition from parse_wait_spec() on a Playwright page (sync API).
+
+    Uses Playwright's own event-driven waits where they exist and the shared in-page
+    functions for DOM stability; a navigation during an in-page wait continues on the
+    new document.
+
+    Returns:
+        Dictionary with condition, satisfied (False on timeout) and elapsed seconds
+    """
+    condition = spec['condition']
+    started = time.monotonic()
+    deadline = started + spec['timeout']
+    remaining_ms = lambda: max(0, int((deadline - time.monotonic()) * 1000))
+    satisfied = False
+
+    try:
+        if condition == 'load':
+            page.wait_for_load_state('load', timeout=remaining_ms())
+            satisfied = True
+        elif condition == 'network_idle':
+            satisfied = _playwright_network_idle(page, spec, deadline)
+        elif condition in ('selector_present', 'selector_visible'):
+            state = 'visible' if condition == 'selector_visible' else 'attached'
+            selector = spec['selector']
+            if selector.startswith('//'):
+                selector = f"xpath={selector}"
+            page.wait_for_selector(selector, state=state, timeout=remaining_ms())
+            satisfied = True
+        elif condition == 'url_matches':
+            page.wait_for_url(re.compile(spec['pattern']), timeout=remaining_ms(), wait_until='commit')
+            satisfied = True
+        else:
+            quiet_ms = int(spec.get('quiet_ms', DEFAULT_QUIET_MS))
+            while remaining_ms() > 0:
+                try:
+                    satisfied = bool(page.evaluate(
+                        f"([quietMs, timeoutMs]) => ({DOM_STABLE_FUNCTION})(quietMs, timeoutMs)",
+                        [quiet_ms, remaining_ms()]
+                    ))
+                    break
+                except Exception:
+                    # Execution context destroyed by a navigation; wait for the new document
+                    page.wait_for_load_state('domcontentloaded', timeout=max(1, remaining_ms()))
+    except Exception as e:
+        logger.debug(f"Wait for {condition} ended without success: {str(e)}")
+
+    return {'condition': condition, 'satisfied': satisfied, 'elapsed': round(time.monotonic() - started, 3)}
+
+
+def _playwright_network_idle(page, spec: Dict[str, Any], deadline: float) -> bool:
+    max_inflight = int(spec.get('max_inflight', 0))
+    idle_ms = int(spec.get('idle_ms', DEFAULT_IDLE_MS))
+    if max_inflight == 0 and idle_ms == DEFAULT_IDLE_MS:
+        page.wait_for_load_state('networkidle', timeout=max(1, int((deadline - time.monotonic()) * 1000)))
+        return True
+
+    activity = NetworkActivity()
+    on_request = lambda request: activity._on_request({'requestId': id(request)})
+    on_done = lambda request: activity._on_done({'requestId': id(request)})
+    page.on('request', on_request)
+    page.on('requestfinished', on_done)
+    page.on('requestfailed', on_done)
+    try:
+        while True:
+            if activity.is_idle(max_inflight, idle_ms / 1000):
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            # wait_for_timeout lets the sync API dispatch request events meanwhile
+            page.wait_for_timeout(min(50, remaining * 1000))
+    finally:
+        page.remove_listener('request', on_request)
+        page.remove_listener('requestfinished', on_done)
+        page.remove_listener('requestfailed', on_done)